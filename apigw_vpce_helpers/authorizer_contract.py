@@ -0,0 +1,168 @@
+"""Contract between the HTTP API and the Lambda authorizer.
+
+This module deliberately does not import aws_cdk, so that the stacks (vpce_helpers) and the offline
+tools (tools.ingress_emulator) share one definition of what API Gateway sends to the authorizer, how it
+caches the result and how the authorizer context reaches the backends.
+
+The authorizer is a REQUEST authorizer with payload format 2.0 and SIMPLE responses:
+
+    {"isAuthorized": true, "context": {"cn": "...", "serial": "...", "tenant": "...", "rule": "..."}}
+
+API Gateway caches the response per combination of identity source values for RESULT_CACHE_TTL_SECONDS
+and rejects a request with 401, without invoking the authorizer, when an identity source is missing.
+https://docs.aws.amazon.com/apigateway/latest/developerguide/http-api-lambda-authorizer.html
+"""
+import time
+
+from utils.truststore_builder import TruststoreBuilder
+from utils.utils import Utility
+
+# Identity sources of the authorizer, in the order of event['identitySource'] and of the cache key
+IDENTITY_SOURCES = [
+    "$context.identity.sourceIp",
+    "$context.identity.clientCert.clientCertPem",
+]
+
+# Authorizer result cache TTL of the HTTP API (the HttpLambdaAuthorizer default)
+RESULT_CACHE_TTL_SECONDS = 300
+
+# Authorizer context (see client_identity.py in the authorizer) forwarded to the backends as headers
+AUTHORIZER_CONTEXT_HEADERS = {
+    'x-idmz-client-cn': 'cn',
+    'x-idmz-client-serial': 'serial',
+    'x-idmz-tenant-id': 'tenant',
+    'x-idmz-rule-id': 'rule',
+}
+
+
+def authorizer_environment(cdk_custom_configs: dict) -> dict:
+    """
+    Environment of the authorizer function for a region configuration: certificate pinning and the
+    optional external allow-lists.
+
+    @param cdk_custom_configs: Merged [cdk_settings] and region configuration.
+    @return: dict of environment variable -> value
+    @raise ValueError: for inconsistent authorizer settings
+    """
+    environment = {}
+    if Utility.get_bool(cdk_custom_configs, 'authorizer_cert_pinning', False):
+        # Pin the client certificates by the SHA-256 fingerprint of their DER encoding, computed here
+        # at synth time so that the authorizer only hashes each distinct PEM once and does a set lookup
+        pins = TruststoreBuilder.fingerprints(TruststoreBuilder.resolve_paths(
+            cdk_custom_configs.get('authorizer_pinned_certs_path', 'certs')))
+        if not pins:
+            raise ValueError("Configuration error: 'authorizer_cert_pinning' is enabled but "
+                             "'authorizer_pinned_certs_path' contains no certificate")
+        environment.update({
+            'CERT_PINNING': 'True',
+            'PINNED_CERT_SHA256': ",".join(pins),
+        })
+        print(f"Authorizer certificate pinning: {len(pins)} pinned fingerprints")
+
+    # Optional external allow-lists, refreshed by the authorizer in the background
+    rules_ssm_parameter = cdk_custom_configs.get('authorizer_rules_ssm_parameter', '').strip()
+    rules_s3_uri = cdk_custom_configs.get('authorizer_rules_s3_uri', '').strip()
+    if rules_ssm_parameter and rules_s3_uri:
+        raise ValueError("Configuration error: set either 'authorizer_rules_ssm_parameter' or "
+                         "'authorizer_rules_s3_uri', not both")
+    if rules_ssm_parameter:
+        environment['RULES_SSM_PARAMETER'] = rules_ssm_parameter
+    elif rules_s3_uri:
+        if not rules_s3_uri.startswith("s3://") or "/" not in rules_s3_uri[5:]:
+            raise ValueError(f"Configuration error: 'authorizer_rules_s3_uri' must be s3://<bucket>/<key>, "
+                             f"got '{rules_s3_uri}'")
+        bucket, key = rules_s3_uri[5:].split("/", 1)
+        environment.update({'RULES_S3_BUCKET': bucket, 'RULES_S3_KEY': key})
+    if rules_ssm_parameter or rules_s3_uri:
+        environment['RULES_REFRESH_SECONDS'] = cdk_custom_configs.get('authorizer_rules_refresh_seconds', '60')
+    return environment
+
+
+def identity_source_values(source_ip: str, client_cert: dict) -> list:
+    """Values of IDENTITY_SOURCES for a request; None for a missing source."""
+    variables = {
+        "$context.identity.sourceIp": source_ip or None,
+        "$context.identity.clientCert.clientCertPem": (client_cert or {}).get('clientCertPem') or None,
+    }
+    return [variables[source] for source in IDENTITY_SOURCES]
+
+
+def build_event(method: str, raw_path: str, raw_query_string: str, headers: dict, source_ip: str,
+                client_cert: dict, route_key: str, api_id: str, domain_name: str, request_id: str,
+                account_id: str = '000000000000', region: str = 'eu-central-1', now: float = None) -> dict:
+    """
+    Authorizer event (payload format 2.0) for a request, as API Gateway builds it.
+
+    @param headers: Request headers with lower-case names.
+    @param client_cert: requestContext.authentication.clientCert: clientCertPem, subjectDN, issuerDN,
+                        serialNumber and validity {notBefore, notAfter}.
+    @param route_key: Matched route key, e.g. 'GET /orders' or '$default'.
+    """
+    now = time.time() if now is None else now
+    method_and_path = route_key.replace(' ', '', 1) if route_key != '$default' else '$default'
+    query = {}
+    for pair in filter(None, raw_query_string.split('&')):
+        name, _, value = pair.partition('=')
+        query[name] = f"{query[name]},{value}" if name in query else value
+    event = {
+        'version': '2.0',
+        'type': 'REQUEST',
+        'routeArn': f"arn:aws:execute-api:{region}:{account_id}:{api_id}/$default/{method_and_path}",
+        'identitySource': identity_source_values(source_ip, client_cert),
+        'routeKey': route_key,
+        'rawPath': raw_path,
+        'rawQueryString': raw_query_string,
+        'headers': {name: value for name, value in headers.items() if name != 'cookie'},
+        'requestContext': {
+            'accountId': account_id,
+            'apiId': api_id,
+            'authentication': {'clientCert': client_cert},
+            'domainName': domain_name,
+            'domainPrefix': domain_name.split('.')[0],
+            'http': {
+                'method': method,
+                'path': raw_path,
+                'protocol': 'HTTP/1.1',
+                'sourceIp': source_ip,
+                'userAgent': headers.get('user-agent', ''),
+            },
+            'requestId': request_id,
+            'routeKey': route_key,
+            'stage': '$default',
+            'time': time.strftime('%d/%b/%Y:%H:%M:%S +0000', time.gmtime(now)),
+            'timeEpoch': int(now * 1000),
+        },
+        'pathParameters': {},
+        'stageVariables': {},
+    }
+    if 'cookie' in headers:
+        event['cookies'] = [cookie.strip() for cookie in headers['cookie'].split(';')]
+    if query:
+        event['queryStringParameters'] = query
+    return event
+
+
+def simple_response(result) -> tuple:
+    """
+    Interpret a SIMPLE authorizer response.
+
+    @return: (authorized, context)
+    @raise ValueError: when the response is not a valid simple response (API Gateway answers 500)
+    """
+    if not isinstance(result, dict) or not isinstance(result.get('isAuthorized'), bool):
+        raise ValueError(f"authorizer response must be an object with a boolean 'isAuthorized': {result!r}")
+    context = result.get('context') or {}
+    if not isinstance(context, dict):
+        raise ValueError(f"authorizer 'context' must be an object: {context!r}")
+    return result['isAuthorized'], context
+
+
+def context_headers(context: dict, authorized: bool = True) -> dict:
+    """
+    Headers that the NLB integration sets from the authorizer context (see
+    vpce_helpers.authorizer_context_parameter_mapping): overwritten on routes behind the authorizer,
+    removed (None) on routes without it.
+    """
+    if not authorized:
+        return dict.fromkeys(AUTHORIZER_CONTEXT_HEADERS)
+    return {header: str(context.get(key, '')) for header, key in AUTHORIZER_CONTEXT_HEADERS.items()}
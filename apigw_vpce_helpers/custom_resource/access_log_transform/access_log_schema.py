@@ -0,0 +1,86 @@
+"""Columnar schema of the API Gateway access logs.
+
+Maps the JSON access log format of GlobalAPIGWStack._create_apigw_log_group to flat, typed columns.
+The Firehose transform (handler.py), the Glue table that Firehose converts to Parquet with and the
+local batch converter tools.access_log_parquet all use it, so every Parquet file has the same schema.
+
+API Gateway writes every value as a string and '-' when a variable does not apply to a request;
+normalize() turns those into None and parses the numbers and the request time.
+"""
+import calendar
+import time
+
+# (column, access log field, Glue type)
+COLUMNS = [
+    ('request_id', 'requestId', 'string'),
+    ('request_time', 'requestTime', 'timestamp'),
+    ('ip', 'ip', 'string'),
+    ('http_method', 'httpMethod', 'string'),
+    ('path', 'path', 'string'),
+    ('route_key', 'routeKey', 'string'),
+    ('status', 'status', 'int'),
+    ('protocol', 'protocol', 'string'),
+    ('response_length', 'responseLength', 'bigint'),
+    ('response_latency', 'responseLatency', 'int'),
+    ('integration_latency', 'integrationLatency', 'int'),
+    ('authorizer_latency', 'authorizerLatency', 'int'),
+    ('authorizer_status', 'authorizerStatus', 'int'),
+    ('integration_status', 'integrationStatus', 'int'),
+    ('client_subject_dn', 'clientcert.subjectDN', 'string'),
+    ('client_issuer_dn', 'clientcert.issuerDN', 'string'),
+    ('client_serial_number', 'clientcert.serialNumber', 'string'),
+    ('authorizer_error', 'authorizerError', 'string'),
+    ('apigw_error', 'apigwError', 'string'),
+    ('integration_error', 'integrationError', 'string'),
+    ('integration_error_message', 'integrationErrorMessage', 'string'),
+]
+
+# Hive-style partitions of the archive: region=<region>/date=<yyyy-MM-dd>/hour=<HH>/
+PARTITION_KEYS = ['region', 'date', 'hour']
+
+_MONTHS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], start=1)}
+
+
+def parse_request_time(value: str):
+    """
+    $context.requestTime, e.g. '19/Oct/2026:10:15:30 +0000', as epoch milliseconds.
+
+    Parsed by hand rather than with strptime('%b'), which depends on the locale.
+    """
+    try:
+        day, month, rest = value.split('/', 2)
+        year, hour, minute, rest = rest.split(':', 3)
+        second, offset = rest.split(' ')
+        sign = -1 if offset[0] == '-' else 1
+        offset_seconds = sign * (int(offset[1:3]) * 3600 + int(offset[3:5]) * 60)
+        epoch = calendar.timegm((int(year), _MONTHS[month], int(day), int(hour), int(minute), int(second)))
+    except (AttributeError, ValueError, KeyError, IndexError):
+        return None
+    return (epoch - offset_seconds) * 1000
+
+
+def _value(value, glue_type: str):
+    if value is None or value in ('-', ''):
+        return None
+    if glue_type in ('int', 'bigint'):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if glue_type == 'timestamp':
+        return parse_request_time(value)
+    return str(value)
+
+
+def normalize(record: dict) -> dict:
+    """Access log record -> row with the COLUMNS names and types (timestamps as epoch milliseconds)."""
+    return {column: _value(record.get(field), glue_type) for column, field, glue_type in COLUMNS}
+
+
+def partition(row: dict, region: str) -> tuple:
+    """(region, date, hour) partition values of a normalized row, in UTC; None without a request time."""
+    if row.get('request_time') is None:
+        return None
+    year, month, day, hour = time.gmtime(row['request_time'] // 1000)[:4]
+    return region, f"{year:04d}-{month:02d}-{day:02d}", f"{hour:02d}"
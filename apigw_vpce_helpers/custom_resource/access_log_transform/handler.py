@@ -0,0 +1,50 @@
+"""Firehose record transformation for the access log archive.
+
+The subscription filter delivers gzip-compressed CloudWatch Logs envelopes. Every envelope is
+turned into newline-delimited JSON rows of access_log_schema, which Firehose then converts to
+Parquet with the Glue table. Control messages (sent when the subscription is created) are dropped.
+https://docs.aws.amazon.com/firehose/latest/dev/data-transformation.html
+"""
+import base64
+import gzip
+import json
+
+import access_log_schema
+
+
+def transform(data: bytes):
+    """
+    Rows of one Firehose record.
+
+    @param data: Decoded record data, a gzip-compressed subscription filter envelope.
+    @return: (result, data) with result 'Ok' or 'Dropped'
+    @raise ValueError: when the record is not a valid envelope
+    """
+    try:
+        envelope = json.loads(gzip.decompress(data))
+    except OSError as e:
+        raise ValueError(f"record is not gzip-compressed: {e}")
+    if envelope.get('messageType') != 'DATA_MESSAGE':
+        return 'Dropped', b''
+    rows = []
+    for log_event in envelope['logEvents']:
+        try:
+            record = json.loads(log_event['message'])
+        except ValueError:
+            # Not an access log record, e.g. a message written by API Gateway itself
+            continue
+        rows.append(json.dumps(access_log_schema.normalize(record), separators=(',', ':')))
+    return 'Ok', ''.join(row + '\n' for row in rows).encode()
+
+
+def lambda_handler(event, context):
+    records = []
+    for record in event['records']:
+        try:
+            result, data = transform(base64.b64decode(record['data']))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Record {record['recordId']} failed: {e}")
+            result, data = 'ProcessingFailed', base64.b64decode(record['data'])
+        records.append({'recordId': record['recordId'], 'result': result,
+                        'data': base64.b64encode(data).decode()})
+    return {'records': records}
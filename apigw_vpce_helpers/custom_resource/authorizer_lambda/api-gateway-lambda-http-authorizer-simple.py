@@ -1,31 +1,97 @@
+import hashlib
 import json
 import logging
+import os
+import ssl
+from collections import OrderedDict
+
+import idmz_metrics
+import authorizer_rules
+import client_identity
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+metrics = idmz_metrics.MetricsLogger('authorizer')
+
+# Certificate pinning: when enabled, the client certificate must have one of the SHA-256 fingerprints
+# (hex of the DER encoding) computed at synth time, instead of matching the issuer and subject DNs
+CERT_PINNING = os.environ.get('CERT_PINNING', 'False') == 'True'
+PINNED_CERT_SHA256 = frozenset(p for p in os.environ.get('PINNED_CERT_SHA256', '').split(',') if p)
+
+# PEM -> SHA-256 fingerprint, kept for the lifetime of the container. Bounded so that a flood of
+# distinct certificates cannot grow the memory of the function; least recently used entries go first.
+FINGERPRINT_MEMO_SIZE = int(os.environ.get('FINGERPRINT_MEMO_SIZE', '1024'))
+fingerprint_memo = OrderedDict()
+
+
+def cert_fingerprint(client_cert_pem: str) -> str:
+    fingerprint = fingerprint_memo.get(client_cert_pem)
+    if fingerprint is not None:
+        fingerprint_memo.move_to_end(client_cert_pem)
+        return fingerprint
+
+    fingerprint = hashlib.sha256(ssl.PEM_cert_to_DER_cert(client_cert_pem.strip())).hexdigest()
+    fingerprint_memo[client_cert_pem] = fingerprint
+    if len(fingerprint_memo) > FINGERPRINT_MEMO_SIZE:
+        fingerprint_memo.popitem(last=False)
+    return fingerprint
+
+
+# Built-in rules, used when no rules source is configured and until the source has been read once
+issuerList = ['C=BE,O=GlobalSign nv-sa,CN=GlobalSign RSA OV SSL CA 2018']
+subjectList = [
+    'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox.swift.com',
+    'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox-test.swift.com',
+    'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox-qa.swift.com',
+    'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox-dev.swift.com'
+]
+#serialNumberList = [
+# sandbox.swift.com
+#   '34123369145486558420654644119',
+# sandbox-test.swift.com
+#  '38073806676561326546943885306'
+#]
+sourceIpList = [
+    '35.189.89.201', '35.234.131.166', '35.241.130.95', '35.240.37.178',
+    '23.194.131.216', '23.194.131.152'
+]
+BUILTIN_RULES = authorizer_rules.RuleSnapshot(frozenset(issuerList), frozenset(subjectList),
+                                              frozenset(sourceIpList), PINNED_CERT_SHA256, 'builtin')
 
+
+def build_rule_store(ssm_client=None, s3_client=None):
+    """Rule store for the rules source configured in the environment, or None for the built-in rules."""
+    if os.environ.get('RULES_SSM_PARAMETER'):
+        if ssm_client is None:
+            import boto3
+            ssm_client = boto3.client('ssm')
+        source = authorizer_rules.SsmRuleSource(ssm_client, os.environ['RULES_SSM_PARAMETER'])
+    elif os.environ.get('RULES_S3_BUCKET'):
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3')
+        source = authorizer_rules.S3RuleSource(s3_client, os.environ['RULES_S3_BUCKET'], os.environ['RULES_S3_KEY'])
+    else:
+        return None
+
+    store = authorizer_rules.RuleStore(source, BUILTIN_RULES, float(os.environ.get('RULES_REFRESH_SECONDS', '60')))
+    # Load synchronously during the init phase, so the first request already uses the external rules
+    store.refresh()
+    return store
+
+
+rule_store = build_rule_store()
+
+
+@metrics.instrument
 def lambda_handler(event, context):
 
-    issuerList = ['C=BE,O=GlobalSign nv-sa,CN=GlobalSign RSA OV SSL CA 2018']
-    subjectList = [
-        'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox.swift.com',
-        'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox-test.swift.com',
-        'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox-qa.swift.com',
-        'C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=sandbox-dev.swift.com'
-    ]
-    #serialNumberList = [
-    # sandbox.swift.com
-    #   '34123369145486558420654644119',
-    # sandbox-test.swift.com
-    #  '38073806676561326546943885306'
-    #]
-    sourceIpList = [
-        '35.189.89.201', '35.234.131.166', '35.241.130.95', '35.240.37.178',
-        '23.194.131.216', '23.194.131.152'
-    ]
+    rules = rule_store.current() if rule_store else BUILTIN_RULES
+    metrics.set_property('RulesVersion', rules.version)
 
     authResponse = {'isAuthorized': False}
+    reason = 'no_client_certificate'
 
     try:
         logger.info(json.dumps(event))
@@ -40,16 +106,40 @@ def lambda_handler(event, context):
             #  'serialNumber'] in serialNumberList and http[
             # 'sourceIp'] in sourceIpList:
 
-            if clientCert['issuerDN'] in issuerList and clientCert[
-                'subjectDN'] in subjectList and http[
-                'sourceIp'] in sourceIpList:
-                authResponse = {'isAuthorized': True}
+            with metrics.timer('RuleEvaluationTime'):
+                if CERT_PINNING:
+                    metrics.put_metric('CacheHit', int(clientCert['clientCertPem'] in fingerprint_memo),
+                                       Cache='fingerprint')
+                    fingerprint = cert_fingerprint(clientCert['clientCertPem'])
+                    certAllowed = fingerprint in rules.pins
+                    ruleId = 'pin:' + fingerprint[:16]
+                else:
+                    certAllowed = clientCert['issuerDN'] in rules.issuers and clientCert[
+                        'subjectDN'] in rules.subjects
+                    ruleId = 'dn'
+                sourceIpAllowed = http['sourceIp'] in rules.source_ips
+
+            if not certAllowed:
+                reason = 'certificate_denied'
+            elif not sourceIpAllowed:
+                reason = 'source_ip_denied'
+            else:
+                reason = 'allowed'
+                metrics.put_metric('CacheHit', int(client_identity.is_memoized(clientCert, rules.version)),
+                                   Cache='identity')
+                # Cached by API Gateway with the decision and forwarded to the backends as x-idmz-* headers
+                authResponse = {
+                    'isAuthorized': True,
+                    'context': client_identity.identity_context(clientCert, ruleId, rules.tenants, rules.version),
+                }
 
+        metrics.put_metric('Decision', 1, Reason=reason)
         return authResponse
 
     except Exception as e:
         logger.error('Caught Exception:')
         logger.error(e)
         logger.error(json.dumps(event))
+        metrics.put_metric('Decision', 1, Reason='error')
         authResponse = {'isAuthorized': False}
         return authResponse
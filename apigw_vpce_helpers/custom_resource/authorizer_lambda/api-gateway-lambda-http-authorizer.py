@@ -1,6 +1,8 @@
 import re
 import ast
 
+import client_identity
+
 
 def lambda_handler(event, context):
     print("Request Context: " + str(event['requestContext']))
@@ -84,18 +86,11 @@ def lambda_handler(event, context):
     # Finally, build the policy
     authResponse = policy.build()
 
-    # new! -- add additional key-value pairs associated with the authenticated principal
-    # these are made available by APIGW like so: $context.authorizer.<key>
-    # additional context is cached
-    # context = {
-    #     'key': 'value',  # $context.authorizer.key -> value
-    #     'number': 1,
-    #     'bool': True
-    # }
-    # # context['arr'] = ['foo'] <- this is invalid, APIGW will not accept it
-    # # context['obj'] = {'foo':'bar'} <- also invalid
-
-    # authResponse['context'] = context
+    # Additional key-value pairs associated with the authenticated principal, made available by APIGW
+    # as $context.authorizer.<key> and cached with the policy. Values must be strings, numbers or booleans.
+    if permisionType == 'Allow':
+        authResponse['context'] = client_identity.identity_context(
+            requestContext['authentication']['clientCert'], 'serial')
 
     return authResponse
 
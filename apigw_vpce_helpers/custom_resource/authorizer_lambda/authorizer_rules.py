@@ -0,0 +1,133 @@
+"""Authorizer allow-lists loaded from SSM Parameter Store or S3, refreshed in the background.
+
+The rules document is JSON; lists left out keep their built-in value:
+
+    {"issuerList": [...], "subjectList": [...], "sourceIpList": [...], "pinnedCertSha256": [...],
+     "tenants": {"<client CN>": "<tenant id>", ...}}
+
+Requests are always served from the current in-memory RuleSnapshot. Once the snapshot is older than the
+refresh interval, the next request starts one background refresh (stale-while-revalidate) and is still
+answered from the current snapshot. The refresh replaces the snapshot with a single attribute assignment,
+so readers never take a lock. When the source cannot be read or the document is invalid, the last good
+snapshot stays in use.
+
+Lambda freezes the execution environment once the handler returns; a refresh started by a request
+continues when the environment is thawed for the next request, which keeps being served meanwhile.
+"""
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger()
+
+# tenants maps a lower-case client CN to the tenant id returned in the authorizer context
+RuleSnapshot = namedtuple('RuleSnapshot', ['issuers', 'subjects', 'source_ips', 'pins', 'version', 'tenants'],
+                          defaults=({},))
+
+
+# Document key -> RuleSnapshot field
+DOCUMENT_KEYS = {'issuerList': 'issuers', 'subjectList': 'subjects', 'sourceIpList': 'source_ips',
+                 'pinnedCertSha256': 'pins'}
+
+
+def parse_rules(document: str, version=None, defaults: RuleSnapshot = None) -> RuleSnapshot:
+    """Parse a rules document; lists missing from the document are taken from defaults (or empty)."""
+    rules = json.loads(document)
+    if not isinstance(rules, dict):
+        raise ValueError("rules document must be a JSON object")
+    fields = {'version': version}
+    tenants = rules.get('tenants', defaults.tenants if defaults else {})
+    if not isinstance(tenants, dict) or not all(isinstance(v, str) for v in tenants.values()):
+        raise ValueError("'tenants' must map client CNs to tenant ids")
+    fields['tenants'] = {cn.lower(): tenant for cn, tenant in tenants.items()}
+    for key, field in DOCUMENT_KEYS.items():
+        if key not in rules:
+            fields[field] = getattr(defaults, field) if defaults else frozenset()
+            continue
+        values = rules[key]
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"'{key}' must be a list of strings")
+        fields[field] = frozenset(v.lower() for v in values) if field == 'pins' else frozenset(values)
+    return RuleSnapshot(**fields)
+
+
+class SsmRuleSource:
+    """Rules document in an SSM String parameter; the parameter version identifies a change."""
+
+    def __init__(self, client, parameter_name: str):
+        self.client = client
+        self.parameter_name = parameter_name
+
+    def fetch(self):
+        parameter = self.client.get_parameter(Name=self.parameter_name)['Parameter']
+        return parameter['Value'], parameter['Version']
+
+
+class S3RuleSource:
+    """Rules document in an S3 object; the ETag identifies a change."""
+
+    def __init__(self, client, bucket: str, key: str):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+
+    def fetch(self):
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        return response['Body'].read().decode('utf-8'), response['ETag']
+
+
+class RuleStore:
+
+    def __init__(self, source, fallback: RuleSnapshot, refresh_seconds: float = 60, clock=time.monotonic):
+        """
+        @param source: Object with fetch() -> (document, version), e.g. SsmRuleSource or S3RuleSource.
+        @param fallback: Snapshot served until the source has been read successfully once.
+        @param refresh_seconds: Age after which a request triggers a background refresh.
+        @param clock: Monotonic clock, injectable for tests.
+        """
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.fallback = fallback
+        self.snapshot = fallback
+        self.refreshed_at = clock()
+        self.last_error = None
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Read the source and swap in the new snapshot. Returns False (keeping the snapshot) on failure."""
+        try:
+            document, version = self.source.fetch()
+            if version is None or version != self.snapshot.version:
+                snapshot = parse_rules(document, version, self.fallback)
+                # Single reference assignment: readers see either the old or the new snapshot
+                self.snapshot = snapshot
+                logger.info(f"Authorizer rules version {version} loaded")
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = e
+            logger.error(f"Authorizer rules refresh failed, serving version {self.snapshot.version}: {e}")
+            return False
+        finally:
+            self.refreshed_at = self.clock()
+
+    def current(self) -> RuleSnapshot:
+        """Current snapshot; starts a background refresh when it is stale. Never blocks on the source."""
+        if self.clock() - self.refreshed_at >= self.refresh_seconds and self._refresh_lock.acquire(blocking=False):
+            thread = threading.Thread(target=self._refresh_in_background, name="rules-refresh", daemon=True)
+            try:
+                thread.start()
+            except Exception as e:
+                # Without the thread nobody would release the lock and the store would never refresh again
+                self._refresh_lock.release()
+                logger.error(f"Authorizer rules refresh could not be started: {e}")
+        return self.snapshot
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            self._refresh_lock.release()
@@ -0,0 +1,68 @@
+"""Compact client identity returned as authorizer context.
+
+API Gateway caches the context together with the authorization decision and the NLB integration
+forwards it to the backends as x-idmz-* headers, so backends do not need to parse the client
+certificate themselves.
+"""
+from collections import OrderedDict
+
+# (subjectDN, serialNumber, tenants version) -> parsed identity, bounded like the fingerprint memo
+IDENTITY_MEMO_SIZE = 1024
+identity_memo = OrderedDict()
+
+
+def parse_dn(dn: str) -> dict:
+    """Attributes of a DN such as 'C=BE,O=SWIFT,CN=sandbox.swift.com' (escaped commas are kept)."""
+    attributes, current, escaped = {}, [], False
+    for char in dn + ',':
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == ',':
+            name, _, value = ''.join(current).partition('=')
+            if value:
+                attributes.setdefault(name.strip().upper(), value.strip())
+            current = []
+        else:
+            current.append(char)
+    return attributes
+
+
+def _memo_key(client_cert: dict, tenants_version) -> tuple:
+    return client_cert.get('subjectDN', ''), str(client_cert.get('serialNumber', '')), tenants_version
+
+
+def is_memoized(client_cert: dict, tenants_version=None) -> bool:
+    """Whether identity_context is answered from the memo for this certificate (for the cache hit metric)."""
+    return _memo_key(client_cert, tenants_version) in identity_memo
+
+
+def identity_context(client_cert: dict, rule_id: str, tenants=None, tenants_version=None) -> dict:
+    """
+    Authorizer context for an authorized client certificate.
+
+    @param client_cert: requestContext.authentication.clientCert of the authorizer event.
+    @param rule_id: Identifier of the rule that authorized the request.
+    @param tenants: Optional mapping of normalized CN -> tenant id; defaults to the subject's O attribute.
+    @param tenants_version: Identifies the tenants mapping in the memo key (e.g. the rules version).
+    @return: {'cn', 'serial', 'tenant', 'rule'}, all strings
+    """
+    key = _memo_key(client_cert, tenants_version)
+    subject_dn, serial, _ = key
+    identity = identity_memo.get(key)
+    if identity is None:
+        subject = parse_dn(subject_dn)
+        cn = subject.get('CN', '').lower()
+        identity = {
+            'cn': cn,
+            'serial': serial.replace(':', '').lower(),
+            'tenant': (tenants or {}).get(cn) or subject.get('O', '').lower(),
+        }
+        identity_memo[key] = identity
+        if len(identity_memo) > IDENTITY_MEMO_SIZE:
+            identity_memo.popitem(last=False)
+    else:
+        identity_memo.move_to_end(key)
+    return {**identity, 'rule': rule_id}
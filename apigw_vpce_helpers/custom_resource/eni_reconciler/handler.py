@@ -0,0 +1,98 @@
+"""Keep the NLB target group in line with the private IPs of the VPC endpoint ENIs.
+
+The targets of the target group are the IPs the ENIPrivateIPResource custom resource read once at
+deploy time. This function runs on a schedule: it describes the current ENIs of the endpoint in one
+batch, diffs their IPs against the registered targets, registers the missing IPs and deregisters the
+stale ones. Registering a registered target and deregistering an unknown one are no-ops in ELBv2, so
+a run can safely be repeated or overlap with a deploy.
+
+When the endpoint has no ENI in use (e.g. while it is being replaced) nothing is deregistered, so a
+transient describe result cannot empty the target group.
+"""
+import logging as log
+import os
+
+import idmz_metrics
+
+log.getLogger().setLevel(log.INFO)
+
+# Targets in these states are already on their way out
+LEAVING_STATES = ('draining',)
+
+metrics = idmz_metrics.MetricsLogger('eni-reconciler')
+
+
+def endpoint_ips(ec2, vpc_endpoint_id: str) -> dict:
+    """private IP -> AZ of the in-use ENIs of a VPC endpoint."""
+    endpoints = ec2.describe_vpc_endpoints(VpcEndpointIds=[vpc_endpoint_id])['VpcEndpoints']
+    eni_ids = [eni_id for endpoint in endpoints for eni_id in endpoint.get('NetworkInterfaceIds', [])]
+    if not eni_ids:
+        return {}
+    ips = {}
+    request = {'NetworkInterfaceIds': eni_ids}
+    while True:
+        response = ec2.describe_network_interfaces(**request)
+        for eni in response['NetworkInterfaces']:
+            if eni.get('Status') == 'in-use' and eni.get('PrivateIpAddress'):
+                ips[eni['PrivateIpAddress']] = eni.get('AvailabilityZone')
+        if not response.get('NextToken'):
+            return ips
+        request['NextToken'] = response['NextToken']
+
+
+def registered_targets(elbv2, target_group_arn: str) -> dict:
+    """target IP -> state of the targets registered in the target group."""
+    descriptions = elbv2.describe_target_health(TargetGroupArn=target_group_arn)['TargetHealthDescriptions']
+    return {description['Target']['Id']: description.get('TargetHealth', {}).get('State')
+            for description in descriptions}
+
+
+def reconcile(ec2, elbv2, vpc_endpoint_id: str, target_group_arn: str, port: int) -> dict:
+    """
+    Register the missing and deregister the stale endpoint IPs of the target group.
+
+    @param ec2: EC2 client.
+    @param elbv2: Elastic Load Balancing v2 client.
+    @return: dict with the endpoint IPs and the registered and deregistered targets
+    """
+    with metrics.timer('DescribeLatency'):
+        current = endpoint_ips(ec2, vpc_endpoint_id)
+        registered = registered_targets(elbv2, target_group_arn)
+
+    to_register = sorted(set(current) - set(registered))
+    if current:
+        to_deregister = sorted(ip for ip, state in registered.items()
+                               if ip not in current and state not in LEAVING_STATES)
+    else:
+        log.warning('VPC endpoint %s has no ENI in use, keeping the registered targets', vpc_endpoint_id)
+        to_deregister = []
+        metrics.put_metric('ReconcileSkipped', 1)
+
+    if to_register:
+        log.info('Registering %s', to_register)
+        elbv2.register_targets(TargetGroupArn=target_group_arn,
+                               Targets=[{'Id': ip, 'Port': port} for ip in to_register])
+    if to_deregister:
+        log.info('Deregistering %s', to_deregister)
+        elbv2.deregister_targets(TargetGroupArn=target_group_arn,
+                                 Targets=[{'Id': ip, 'Port': port} for ip in to_deregister])
+
+    metrics.put_metric('EndpointIps', len(current))
+    metrics.put_metric('TargetsRegistered', len(to_register))
+    metrics.put_metric('TargetsDeregistered', len(to_deregister))
+    return {'endpoint_ips': sorted(current), 'registered': to_register, 'deregistered': to_deregister}
+
+
+def _clients():
+    # Imported here so that reconcile can be used with stubbed clients where boto3 is not installed
+    import boto3
+    return boto3.client('ec2'), boto3.client('elbv2')
+
+
+@metrics.instrument
+def lambda_handler(event, context):
+    ec2, elbv2 = _clients()
+    result = reconcile(ec2, elbv2, os.environ['VPC_ENDPOINT_ID'], os.environ['TARGET_GROUP_ARN'],
+                       int(os.environ.get('TARGET_PORT', '443')))
+    log.info('Reconciled: %s', result)
+    return result
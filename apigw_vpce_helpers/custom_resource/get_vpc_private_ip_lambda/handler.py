@@ -1,3 +1,4 @@
+import idmz_metrics
 import cfnresponse
 import boto3
 
@@ -8,7 +9,10 @@ log.getLogger().setLevel(log.INFO)
 # Note, there is a tight coupling between this name and what's in the todo_service_stack.
 PHYSICAL_ID = 'ENIPrivateIPResource'
 
+metrics = idmz_metrics.MetricsLogger('vpce-private-ip')
 
+
+@metrics.instrument
 def main_handler(event, context):
     log.info('Input event: %s', event)
     request_type = event['RequestType']
@@ -35,7 +39,9 @@ def _handle_create(event, context):
 
         for i, eni in enumerate(enis):
             network_interface = ec2.NetworkInterface(eni)
-            response_data[f"IP{str(i)}"] = network_interface.private_ip_address
+            # The resource loads the ENI (DescribeNetworkInterfaces) on first attribute access
+            with metrics.timer('EniLookupLatency'):
+                response_data[f"IP{str(i)}"] = network_interface.private_ip_address
             ips.append(network_interface.private_ip_address)
 
         response_data["IPS"] = ips
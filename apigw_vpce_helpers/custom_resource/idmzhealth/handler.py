@@ -1,6 +1,11 @@
 import json
 
+import idmz_metrics
 
+metrics = idmz_metrics.MetricsLogger('idmzhealth')
+
+
+@metrics.instrument
 def lambda_handler(event, context):
     response = {
         "statusCode": 200,
@@ -0,0 +1,125 @@
+"""CloudWatch embedded metric format (EMF) for the IDMZ Lambda functions.
+
+Shipped as a Lambda layer (python/ is on sys.path in the function). Metrics are buffered in memory
+during an invocation and written to stdout as EMF JSON lines once, when the handler returns; CloudWatch
+Logs extracts the metrics from the log stream, so no PutMetricData call is made.
+
+    metrics = idmz_metrics.MetricsLogger('authorizer')
+
+    @metrics.instrument
+    def lambda_handler(event, context):
+        metrics.put_metric('Decision', 1, Reason='allowed')
+        with metrics.timer('RuleEvaluationTime'):
+            ...
+
+Every record has the dimension Service; metrics put with extra dimensions (e.g. Reason) go to a record of
+their own. https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+"""
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'IDMZ')
+
+# EMF accepts at most 100 values per metric in a record; older values are dropped
+MAX_VALUES = 100
+
+# Imported at the top of the handler modules, so this is close to the start of their init phase
+INIT_STARTED = time.perf_counter()
+
+
+class MetricsLogger:
+
+    def __init__(self, service: str, namespace: str = NAMESPACE, stream=None):
+        """
+        @param service: Value of the Service dimension, e.g. 'authorizer'.
+        @param namespace: CloudWatch namespace of the metrics.
+        @param stream: Where the records are written, defaults to stdout (the function's log stream).
+        """
+        self.service = service
+        self.namespace = namespace
+        self.stream = stream
+        self.properties = {}
+        self.cold_start = True
+        self.init_duration = None
+        # Sorted dimension items -> {metric name: (unit, [values])}
+        self._buffer = {}
+
+    def put_metric(self, name: str, value: float, unit: str = 'Count', **dimensions):
+        """Buffer one value of a metric; dimensions are added to the Service dimension."""
+        metrics = self._buffer.setdefault(tuple(sorted(dimensions.items())), {})
+        metrics.setdefault(name, (unit, []))[1].append(value)
+
+    def set_property(self, key: str, value):
+        """Searchable, non-metric field of the records of this invocation (e.g. the rules version)."""
+        self.properties[key] = value
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **dimensions):
+        """Put the time spent in the block as a Milliseconds metric."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put_metric(name, (time.perf_counter() - start) * 1000, 'Milliseconds', **dimensions)
+
+    def records(self, timestamp: int = None) -> list:
+        """The buffered metrics as EMF records (dicts), one per distinct set of dimensions."""
+        timestamp = timestamp if timestamp is not None else int(time.time() * 1000)
+        records = []
+        for dimensions, metrics in self._buffer.items():
+            record = {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [['Service'] + [key for key, _ in dimensions]],
+                        'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, _) in metrics.items()],
+                    }],
+                },
+                **self.properties,
+                'Service': self.service,
+                **dict(dimensions),
+            }
+            for name, (_, values) in metrics.items():
+                values = values[-MAX_VALUES:]
+                record[name] = values[0] if len(values) == 1 else values
+            records.append(record)
+        return records
+
+    def flush(self) -> list:
+        """Write the buffered metrics in a single write and clear the buffer. Returns the records written."""
+        records = self.records()
+        if records:
+            stream = self.stream or sys.stdout
+            stream.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+            stream.flush()
+        self._buffer = {}
+        self.properties = {}
+        return records
+
+    def instrument(self, handler):
+        """
+        Decorate a Lambda handler: put ColdStart (1 on the first invocation of the execution environment,
+        0 afterwards) and, on a cold start, InitDuration, and flush once when the handler returns or raises.
+
+        InitDuration is the time from importing this module to decorating the handler, i.e. the module-level
+        initialization of the handler module (imports, clients, rules loaded during init). It excludes the
+        runtime bootstrap, which Lambda reports as Init Duration in the REPORT line.
+        """
+        self.init_duration = (time.perf_counter() - INIT_STARTED) * 1000
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            self.put_metric('ColdStart', 1 if self.cold_start else 0)
+            if self.cold_start:
+                self.put_metric('InitDuration', self.init_duration, 'Milliseconds')
+                self.cold_start = False
+            try:
+                return handler(event, context)
+            finally:
+                self.flush()
+        return wrapper
@@ -0,0 +1,158 @@
+"""Compile the `routes` property into the smallest equivalent set of HTTP API routes.
+
+This module deliberately does not import aws_cdk so that it can be used to validate the
+configuration without starting the JSII runtime.
+
+All configured routes share the NLB integration, and the HTTP API's $default route already sends
+any unmatched request to that integration through the Lambda authorizer. Explicit routes therefore
+only matter for their route key (logs, metrics), throttling and authorization settings. For routes
+with the default settings (Lambda authorizer, no limits of their own) this is what makes it safe to
+drop routes that are covered by a broader route, and to merge siblings into one `{proxy+}` greedy
+route: every path the greedy route adds already reached the integration through the authorizer.
+
+Routes with `authorization: "none"` or their own rate/burst limits are never widened. A greedy route
+would skip the authorizer for paths nobody configured as public, and would share one throttling
+bucket between paths that were limited separately.
+"""
+from collections import namedtuple
+from typing import List
+
+HTTP_METHODS = ('ANY', 'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS')
+AUTHORIZATION_TYPES = ('lambda', 'none')
+GREEDY_SEGMENT = '{proxy+}'
+
+# A single HTTP API route. `settings` is (rate_limit, burst_limit, authorization): routes can only be
+# merged when their settings are identical, and only when these are DEFAULT_SETTINGS.
+Route = namedtuple('Route', ['method', 'path', 'rate_limit', 'burst_limit', 'authorization'])
+Route.settings = property(lambda self: (self.rate_limit, self.burst_limit, self.authorization))
+Route.route_key = property(lambda self: f"{self.method} {self.path}")
+
+# Settings of a route without limits of its own behind the Lambda authorizer, like the $default route
+DEFAULT_SETTINGS = (None, None, 'lambda')
+
+RouteTable = namedtuple('RouteTable', ['routes', 'configured_count'])
+
+
+def normalize_path(path: str) -> str:
+    """Return the canonical form of a route path: leading slash, no empty or trailing segments."""
+    if not isinstance(path, str) or not path.strip():
+        raise ValueError(f"Configuration error: invalid route path {path!r}.")
+    segments = [segment for segment in path.strip().split('/') if segment]
+    for segment in segments[:-1]:
+        if segment.endswith('+}'):
+            raise ValueError(f"Configuration error: greedy path variable must be the last segment in '{path}'.")
+    return '/' + '/'.join(segments)
+
+
+def parse_route_entry(route_entry) -> List[Route]:
+    """Expand an entry of the `routes` property into one Route per method.
+
+    Entries are either a string (a path, or a route key such as "GET /orders") or an object such as
+    {"path": "/orders", "method": "GET", "rate_limit": 50, "burst_limit": 100}. `method` may also be a
+    list of methods, and `authorization` may be "lambda" (default) or "none".
+    """
+    if isinstance(route_entry, str):
+        method, _, path = route_entry.strip().rpartition(' ')
+        route_entry = {'path': path, 'method': method or 'ANY'}
+    if not isinstance(route_entry, dict) or not route_entry.get('path'):
+        raise ValueError(f"Configuration error: invalid entry in 'routes': {route_entry!r}. "
+                         "Expected a path string or an object with at least a 'path' key.")
+
+    path = normalize_path(route_entry['path'])
+    methods = route_entry.get('method', 'ANY')
+    if isinstance(methods, str):
+        methods = [methods]
+    methods = [method.upper() for method in methods]
+    for method in methods:
+        if method not in HTTP_METHODS:
+            raise ValueError(f"Configuration error: invalid method '{method}' for route '{path}'.")
+
+    authorization = route_entry.get('authorization', 'lambda').lower()
+    if authorization not in AUTHORIZATION_TYPES:
+        raise ValueError(f"Configuration error: invalid authorization '{authorization}' for route '{path}'. "
+                         f"Expected one of {', '.join(AUTHORIZATION_TYPES)}.")
+
+    rate_limit = route_entry.get('rate_limit')
+    burst_limit = route_entry.get('burst_limit')
+    return [
+        Route(method, path,
+              float(rate_limit) if rate_limit is not None else None,
+              int(burst_limit) if burst_limit is not None else None,
+              authorization)
+        for method in methods
+    ]
+
+
+def _covers(broader: Route, route: Route) -> bool:
+    """True if every request matching `route` also matches `broader` with the same settings."""
+    if broader == route or broader.settings != route.settings or route.settings != DEFAULT_SETTINGS:
+        return False
+    if broader.method not in ('ANY', route.method):
+        return False
+    if broader.path == route.path:
+        return broader.method == 'ANY'
+    if broader.path.endswith('/' + GREEDY_SEGMENT):
+        prefix = broader.path[:-len(GREEDY_SEGMENT)]
+        return route.path.startswith(prefix) and route.path != broader.path
+    return False
+
+
+def _parent(path: str) -> str:
+    """Parent path used to group siblings; a greedy route is a sibling of its own prefix."""
+    if path.endswith('/' + GREEDY_SEGMENT):
+        path = path[:-len(GREEDY_SEGMENT) - 1]
+    return path.rsplit('/', 1)[0] or '/'
+
+
+def _drop_covered(routes: set) -> set:
+    return {route for route in routes if not any(_covers(other, route) for other in routes)}
+
+
+def compile_routes(route_entries: list, collapse_threshold: int = 0) -> RouteTable:
+    """Normalise, dedupe and collapse the configured routes.
+
+    - Duplicate route keys are removed; duplicates with different settings are a configuration error.
+    - Routes with the default settings covered by an ANY route on the same path, or by a `{proxy+}`
+      route on a parent path, with the default settings are removed.
+    - When `collapse_threshold` (>= 2) or more routes with identical method and the default settings
+      share a parent path (other than the root), they are replaced by a single `<parent>/{proxy+}`
+      route. 0 (the default) disables collapsing.
+    """
+    if not isinstance(route_entries, list):
+        raise ValueError(f"Configuration error: 'routes' must be a JSON list, got {type(route_entries).__name__}.")
+
+    configured = [route for entry in route_entries for route in parse_route_entry(entry)]
+
+    by_key = {}
+    for route in configured:
+        existing = by_key.setdefault(route.route_key, route)
+        if existing.settings != route.settings:
+            raise ValueError(f"Configuration error: route '{route.route_key}' is configured more than once "
+                             "with different throttling or authorization settings.")
+
+    routes = _drop_covered(set(by_key.values()))
+
+    while collapse_threshold >= 2:
+        groups = {}
+        for route in routes:
+            parent = _parent(route.path)
+            # Never collapse into /{proxy+}: that is what the $default route already does. Public and
+            # throttled routes keep their exact paths.
+            if parent != '/' and route.settings == DEFAULT_SETTINGS:
+                groups.setdefault((parent, route.method, route.settings), []).append(route)
+
+        merged = False
+        for (parent, method, _), siblings in groups.items():
+            if len(siblings) < collapse_threshold:
+                continue
+            greedy_path = parent + '/' + GREEDY_SEGMENT
+            if any(sibling.path == greedy_path for sibling in siblings):
+                continue
+            routes.difference_update(siblings)
+            routes.add(siblings[0]._replace(path=greedy_path))
+            merged = True
+        if not merged:
+            break
+        routes = _drop_covered(routes)
+
+    return RouteTable(sorted(routes, key=lambda r: (r.path, r.method)), len(configured))
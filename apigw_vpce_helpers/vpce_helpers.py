@@ -3,9 +3,9 @@ import pathlib
 import aws_cdk as core
 from typing import List
 from aws_cdk.aws_apigatewayv2_authorizers import HttpLambdaAuthorizer, HttpLambdaResponseType
-from aws_cdk import Tags
 from cdk_nag import NagSuppressions
 from utils.utils import Utility
+from apigw_vpce_helpers import authorizer_contract, route_compiler
 from aws_cdk import (
     aws_apigatewayv2 as apigwv2,
     aws_apigatewayv2_integrations as apigwv2_integrations,
@@ -13,10 +13,32 @@ from aws_cdk import (
     aws_ec2 as ec2,
     aws_elasticloadbalancingv2 as elbv2,
     aws_elasticloadbalancingv2_targets as elbv2_targets,
+    aws_events as events,
+    aws_events_targets as events_targets,
     aws_iam as iam,
     aws_lambda as lambda_,
+    aws_s3 as s3,
 )
 
+# Authorizer context headers forwarded to the backends, see authorizer_contract
+AUTHORIZER_CONTEXT_HEADERS = authorizer_contract.AUTHORIZER_CONTEXT_HEADERS
+
+
+def authorizer_context_parameter_mapping(authorized: bool = True) -> apigwv2.ParameterMapping:
+    """Parameter mapping of the NLB integration for the authorizer context headers.
+
+    Routes behind the Lambda authorizer overwrite the headers with $context.authorizer.<key>, so a
+    client cannot set them itself. Routes without authorizer have no context and remove the headers.
+    """
+    parameter_mapping = apigwv2.ParameterMapping()
+    for header, context_key in AUTHORIZER_CONTEXT_HEADERS.items():
+        if authorized:
+            parameter_mapping.overwrite_header(
+                header, apigwv2.MappingValue.context_variable(f"authorizer.{context_key}"))
+        else:
+            parameter_mapping.remove_header(header)
+    return parameter_mapping
+
 
 def setup_vpce_integration(stack, name: str, vpc: ec2.IVpc,
                            vpc_link: apigwv2.VpcLink,
@@ -70,16 +92,18 @@ def setup_vpce_integration(stack, name: str, vpc: ec2.IVpc,
     listener = _create_nlb(stack, name, vpc, target_group, sg_nlb,
                            cdk_custom_configs, nlb_subnets)
 
-    lambda_authorizer = _lambda_authorizer(stack, "lambda-auth")
+    # The target IPs are read once at deploy time; optionally keep them in line with the ENIs
+    if Utility.get_bool(cdk_custom_configs, 'eni_reconciler_enabled', False):
+        _create_eni_reconciler(stack, name, vpc_endpoint, target_group, cdk_custom_configs)
+
+    lambda_authorizer = _lambda_authorizer(stack, "lambda-auth", cdk_custom_configs)
 
     # For Simple authorizer
     authorizer = HttpLambdaAuthorizer(
         "idmz-httpappi-lambdaAuthorizer",
         lambda_authorizer,
-        identity_source=[
-            "$context.identity.sourceIp",
-            "$context.identity.clientCert.clientCertPem",
-        ],
+        identity_source=authorizer_contract.IDENTITY_SOURCES,
+        results_cache_ttl=core.Duration.seconds(authorizer_contract.RESULT_CACHE_TTL_SECONDS),
         response_types=[HttpLambdaResponseType.SIMPLE])
 
     # For IAM based Authorizer - Uncomment this if you want to use this feature.
@@ -112,7 +136,7 @@ def _createvpc_endpoint(stack, name: str, vpc: ec2.IVpc,
         security_groups=[sg_vpce],
         subnets=ec2.SubnetSelection(subnets=vpce_subnets))
 
-    if eval(cdk_custom_configs['interface_vpce_policy_allowed']):
+    if Utility.get_bool(cdk_custom_configs, 'interface_vpce_policy_allowed'):
         interface_vpc_endpoint.add_to_policy(
             iam.PolicyStatement.from_json({
                 "Effect":
@@ -128,6 +152,24 @@ def _createvpc_endpoint(stack, name: str, vpc: ec2.IVpc,
     return interface_vpc_endpoint
 
 
+def _metrics_layer(stack) -> lambda_.LayerVersion:
+    """Layer with the shared EMF module (idmz_metrics), created once per stack for all functions."""
+    layer = stack.node.try_find_child("idmz-metrics-layer")
+    if layer is None:
+        parent_dir = pathlib.Path(__file__).parent
+        layer = lambda_.LayerVersion(
+            stack,
+            "idmz-metrics-layer",
+            code=lambda_.Code.from_asset(str(parent_dir.joinpath('custom_resource/metrics_layer'))),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+            description="CloudWatch embedded metric format helper of the IDMZ functions")
+    return layer
+
+
+def _metrics_environment() -> dict:
+    return {'METRICS_NAMESPACE': Utility.cdk_custom_configs.get('lambda_metrics_namespace', 'IDMZ')}
+
+
 def _create_custom_resource(stack, name: str, **kwargs) -> core.CustomResource:
     parent_dir = pathlib.Path(__file__).parent
     code_dir = str(
@@ -141,6 +183,8 @@ def _create_custom_resource(stack, name: str, **kwargs) -> core.CustomResource:
         handler="handler.main_handler",
         timeout=core.Duration.seconds(15),
         runtime=lambda_.Runtime.PYTHON_3_12,
+        layers=[_metrics_layer(stack)],
+        environment=_metrics_environment(),
     )
     custom_resource_func.add_to_role_policy(
         iam.PolicyStatement(
@@ -180,6 +224,75 @@ def _create_custom_resource(stack, name: str, **kwargs) -> core.CustomResource:
     )
 
 
+def _create_eni_reconciler(stack, name: str, vpc_endpoint: ec2.InterfaceVpcEndpoint,
+                           target_group: elbv2.NetworkTargetGroup, cdk_custom_configs: dict) -> lambda_.Function:
+    """Scheduled function registering the current VPC endpoint ENI IPs in the NLB target group.
+
+    Replaced endpoint ENIs would otherwise leave stale targets until the next deploy. Targets
+    registered by the function are drift to CloudFormation; the next update of the custom resource
+    IPs brings the template back in line.
+    """
+    schedule_minutes = int(cdk_custom_configs.get('eni_reconciler_schedule_minutes', '5'))
+    if schedule_minutes < 1:
+        raise ValueError("Configuration error: 'eni_reconciler_schedule_minutes' must be at least 1, "
+                         f"got {schedule_minutes}.")
+    parent_dir = pathlib.Path(__file__).parent
+
+    reconciler_func = lambda_.Function(
+        stack,
+        f"{name}-EniReconcilerFunction",
+        code=lambda_.Code.from_asset(str(parent_dir.joinpath('custom_resource/eni_reconciler'))),
+        handler="handler.lambda_handler",
+        timeout=core.Duration.seconds(30),
+        runtime=lambda_.Runtime.PYTHON_3_12,
+        log_retention=logs.RetentionDays.TWO_WEEKS,
+        layers=[_metrics_layer(stack)],
+        environment={
+            **_metrics_environment(),
+            'VPC_ENDPOINT_ID': vpc_endpoint.vpc_endpoint_id,
+            'TARGET_GROUP_ARN': target_group.target_group_arn,
+            'TARGET_PORT': '443',
+        },
+    )
+    # Describe calls do not support resource-level permissions
+    reconciler_func.add_to_role_policy(iam.PolicyStatement(
+        actions=["ec2:DescribeVpcEndpoints", "ec2:DescribeNetworkInterfaces",
+                 "elasticloadbalancing:DescribeTargetHealth"],
+        resources=['*']))
+    reconciler_func.add_to_role_policy(iam.PolicyStatement(
+        actions=["elasticloadbalancing:RegisterTargets", "elasticloadbalancing:DeregisterTargets"],
+        resources=[target_group.target_group_arn]))
+
+    events.Rule(
+        stack,
+        f"{name}-EniReconcilerSchedule",
+        schedule=events.Schedule.rate(core.Duration.minutes(schedule_minutes)),
+        targets=[events_targets.LambdaFunction(reconciler_func, retry_attempts=0)])
+
+    NagSuppressions.add_resource_suppressions(reconciler_func, [{
+        "id":
+            "AwsSolutions-IAM5",
+        "reason":
+            "Resource star for the Describe calls, which do not support resource-level permissions",
+    }, {
+        "id":
+            "AwsSolutions-IAM4",
+        "reason":
+            "Role policy selected by use of Function construct uses AWSLambdaBasicExecutionRole",
+        "appliesTo": [
+            "Policy::arn:<AWS::Partition>:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole",
+        ]
+    }, {
+        "id":
+            "AwsSolutions-L1",
+        "reason":
+            "Using the latest available Python runtime (3.12). CDK-nag may not recognize this as the latest.",
+    }],
+                                              apply_to_children=True)
+
+    return reconciler_func
+
+
 def _create_network_target_group(
         stack, name: str, vpc: ec2.IVpc, vpc_endpoint_ips: List[str],
         cdk_custom_configs: dict) -> elbv2.NetworkTargetGroup:
@@ -203,10 +316,10 @@ def _create_network_target_group(
         "idmz-nlb-targetgroup",
         # port=int(cdk_custom_configs['integration_port']),
         port=443,
-        connection_termination=eval(
-            cdk_custom_configs['nw_targetgroup_connection_termination']),
-        preserve_client_ip=eval(cdk_custom_configs['nw_preserve_client_ip']),
-        protocol=elbv2.Protocol.TCP,
+        connection_termination=Utility.get_bool(cdk_custom_configs, 'nw_targetgroup_connection_termination'),
+        preserve_client_ip=Utility.get_bool(cdk_custom_configs, 'nw_preserve_client_ip'),
+        # A TLS listener re-encrypts towards the VPC endpoint
+        protocol=elbv2.Protocol.TLS if _nlb_certificate_arn(cdk_custom_configs) else elbv2.Protocol.TCP,
         targets=targets,
         vpc=vpc,
     )
@@ -227,37 +340,95 @@ def _create_nlb(stack, name: str, vpc: ec2.IVpc,
         internet_facing=False,
         vpc_subnets=ec2.SubnetSelection(subnets=nlb_subnets),
     )
-    Tags.of(nlb).add(
-        "Name",
-        f"sw-{cdk_custom_configs['workload']}-{cdk_custom_configs['appenvironment']}-idmz-sg-nlb-{cdk_custom_configs['idmzregion']}-{cdk_custom_configs['lzenv']}-aws")
-    Tags.of(nlb).add("sw:application", f"{cdk_custom_configs['workload']}")
-
     # Add SG to NLB using Override because CDK Construct does not support it yet
     (nlb.node.default_child).add_property_override("SecurityGroups",
                                                    [sg_nlb.security_group_id])
-    # Suppress cdk_nag finding on ELB Access Logs
-    NagSuppressions.add_resource_suppressions(nlb, [{
-        'id': 'AwsSolutions-ELB2',
-        'reason': 'Access Logs TBD'
-    }])
-
+    if Utility.get_bool(cdk_custom_configs, 'nlb_access_logs_enabled', False):
+        _enable_nlb_access_logs(stack, nlb, cdk_custom_configs)
+    else:
+        # Suppress cdk_nag finding on ELB Access Logs
+        NagSuppressions.add_resource_suppressions(nlb, [{
+            'id': 'AwsSolutions-ELB2',
+            'reason': "Access logs are optional, see 'nlb_access_logs_enabled'"
+        }])
+
+    # With a certificate the NLB terminates TLS (and can log the handshakes), otherwise the TLS
+    # connection of API Gateway is passed through to the VPC endpoint
+    certificate_arn = _nlb_certificate_arn(cdk_custom_configs)
     nlb_listener = nlb.add_listener(
         'idmz-nlb-listener',
         port=int(cdk_custom_configs['integration_port']),
         default_action=elbv2.NetworkListenerAction.forward(
             target_groups=[target_group]),
-        protocol=elbv2.Protocol.TCP,
+        protocol=elbv2.Protocol.TLS if certificate_arn else elbv2.Protocol.TCP,
+        certificates=[elbv2.ListenerCertificate.from_arn(certificate_arn)] if certificate_arn else None,
+        ssl_policy=elbv2.SslPolicy.RECOMMENDED_TLS if certificate_arn else None,
     )
 
     return nlb_listener
 
 
-def _lambda_authorizer(stack, name: str, **kwargs) -> lambda_.Function:
+def _nlb_certificate_arn(cdk_custom_configs: dict) -> str:
+    """ACM certificate of a TLS listener on the NLB (for vpce_service_tls_fqdn), empty for TCP."""
+    return cdk_custom_configs.get('nlb_tls_certificate_arn', '').strip()
+
+
+def _enable_nlb_access_logs(stack, nlb: elbv2.NetworkLoadBalancer, cdk_custom_configs: dict) -> s3.Bucket:
+    """Write the NLB access logs to a dedicated bucket, moved to Infrequent Access and then expired.
+
+    NLB access logs only cover TLS listeners: they record the TLS handshake time, connection duration
+    and bytes of every connection (analyzed with tools.nlb_log_analyzer).
+    https://docs.aws.amazon.com/elasticloadbalancing/latest/network/load-balancer-access-logs.html
+    """
+    retention_days = int(cdk_custom_configs.get('nlb_access_logs_retention_days', '90'))
+    if retention_days <= 30:
+        raise ValueError("Configuration error: 'nlb_access_logs_retention_days' must be greater than 30 (objects "
+                         f"move to Infrequent Access after 30 days), got {retention_days}")
+    if not _nlb_certificate_arn(cdk_custom_configs):
+        raise ValueError("Configuration error: 'nlb_access_logs_enabled' is True but 'nlb_tls_certificate_arn' is "
+                         "not set. NLB only logs TLS listeners, a TCP listener would leave the bucket empty.")
+
+    bucket = s3.Bucket(
+        stack,
+        "idmz-nlb-access-logs",
+        # NLB log delivery supports SSE-S3
+        encryption=s3.BucketEncryption.S3_MANAGED,
+        block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+        enforce_ssl=True,
+        removal_policy=core.RemovalPolicy.RETAIN,
+        lifecycle_rules=[s3.LifecycleRule(
+            abort_incomplete_multipart_upload_after=core.Duration.days(1),
+            transitions=[s3.Transition(storage_class=s3.StorageClass.INFREQUENT_ACCESS,
+                                       transition_after=core.Duration.days(30))],
+            expiration=core.Duration.days(retention_days))])
+    NagSuppressions.add_resource_suppressions(bucket, [{
+        'id': 'AwsSolutions-S1',
+        'reason': "Bucket only receives NLB access logs from the log delivery service",
+    }])
+    nlb.log_access_logs(bucket, prefix=f"nlb/{cdk_custom_configs['ingress_name']}")
+    return bucket
+
+
+def _lambda_authorizer(stack, name: str, cdk_custom_configs: dict, **kwargs) -> lambda_.Function:
 
     parent_dir = pathlib.Path(__file__).parent
     code_dir = str(parent_dir.joinpath('custom_resource/authorizer_lambda'))
     code = lambda_.Code.from_asset(code_dir)
 
+    environment = {**_metrics_environment(), **authorizer_contract.authorizer_environment(cdk_custom_configs)}
+
+    # The authorizer reads its external allow-lists itself
+    rules_policy = None
+    if 'RULES_SSM_PARAMETER' in environment:
+        rules_policy = iam.PolicyStatement(
+            actions=["ssm:GetParameter"],
+            resources=[stack.format_arn(service="ssm", resource="parameter",
+                                        resource_name=environment['RULES_SSM_PARAMETER'].lstrip('/'))])
+    elif 'RULES_S3_BUCKET' in environment:
+        rules_policy = iam.PolicyStatement(
+            actions=["s3:GetObject"],
+            resources=[f"arn:{stack.partition}:s3:::{environment['RULES_S3_BUCKET']}/{environment['RULES_S3_KEY']}"])
+
     authorizer_lambda = lambda_.Function(
         stack,
         "LambdaAuthorizer",
@@ -265,7 +436,11 @@ def _lambda_authorizer(stack, name: str, **kwargs) -> lambda_.Function:
         runtime=lambda_.Runtime.PYTHON_3_12,
         log_retention=logs.RetentionDays.TWO_WEEKS,
         timeout=core.Duration.seconds(300),
+        environment=environment,
+        layers=[_metrics_layer(stack)],
         code=code)
+    if rules_policy:
+        authorizer_lambda.add_to_role_policy(rules_policy)
 
     NagSuppressions.add_resource_suppressions(stack, [{
         "id":
@@ -295,7 +470,7 @@ def _lambda_authorizer(stack, name: str, **kwargs) -> lambda_.Function:
 def add_http_api_routes(stack, name: str,
                         http_api: apigwv2.HttpApi,
                         listener: elbv2.NetworkListener,
-                        vpc_link: apigwv2.VpcLink, routes: List[str],
+                        vpc_link: apigwv2.VpcLink, routes: List,
                         authorizer: HttpLambdaAuthorizer,
                         integration: apigwv2_integrations.HttpNlbIntegration,
                         vpce_service_tls_fqdn: str) -> List:
@@ -311,10 +486,10 @@ def add_http_api_routes(stack, name: str,
         runtime=lambda_.Runtime.PYTHON_3_12,
         log_retention=logs.RetentionDays.TWO_WEEKS,
         timeout=core.Duration.seconds(300),
+        environment=_metrics_environment(),
+        layers=[_metrics_layer(stack)],
         code=code)
 
-    Tags.of(idmzhealth_lambda).add("sw:application", "idmz")
-
     NagSuppressions.add_resource_suppressions(idmzhealth_lambda, [{
         "id":
             "AwsSolutions-IAM4",
@@ -343,18 +518,52 @@ def add_http_api_routes(stack, name: str,
             payload_format_version=apigwv2.PayloadFormatVersion.
             VERSION_2_0))
 
+    # Collapse the configured routes into the smallest equivalent route table
+    route_table = route_compiler.compile_routes(
+        routes,
+        collapse_threshold=int(Utility.cdk_custom_configs.get('routes_collapse_threshold', '0')))
+    print(f"Route compiler: {route_table.configured_count} configured route keys -> "
+          f"{len(route_table.routes)} HTTP API routes")
+
+    # Routes without authorizer get their own NLB integration that strips the authorizer context headers
+    unauthenticated_integration = None
+    if any(route_config.authorization == 'none' for route_config in route_table.routes):
+        unauthenticated_integration = apigwv2_integrations.HttpNlbIntegration(
+            f"{name}-http-nlb-integration-noauth",
+            listener=listener,
+            method=apigwv2.HttpMethod.ANY,
+            secure_server_name=vpce_service_tls_fqdn,
+            vpc_link=vpc_link,
+            parameter_mapping=authorizer_context_parameter_mapping(authorized=False),
+        )
+
     # API does not allow to create default route $default. It expects / in the path.
+    # The integration is bound to the API once by the first route and reused by the others.
     route = []
-    for i, route_key in enumerate(routes):
+    route_settings = {}
+    for i, route_config in enumerate(route_table.routes):
         route = apigwv2.HttpRoute(
             stack,
             f"{name}-route-{i+1}",
             http_api=http_api,
-            integration=integration,
+            integration=integration if route_config.authorization == 'lambda' else unauthenticated_integration,
             route_key=apigwv2.HttpRouteKey.with_(
-                route_key, apigwv2.HttpMethod.ANY),
-            authorizer=authorizer,
+                route_config.path, getattr(apigwv2.HttpMethod, route_config.method)),
+            authorizer=authorizer if route_config.authorization == 'lambda' else apigwv2.HttpNoneAuthorizer(),
         )
-        integration.bind(route=route, scope=stack)
+
+        throttling = {}
+        if route_config.rate_limit is not None:
+            throttling['ThrottlingRateLimit'] = route_config.rate_limit
+        if route_config.burst_limit is not None:
+            throttling['ThrottlingBurstLimit'] = route_config.burst_limit
+        if throttling:
+            route_settings[route_config.route_key] = throttling
+            # Route settings can only reference route keys which already exist on the API
+            http_api.default_stage.node.add_dependency(route)
+
+    if route_settings:
+        # update route settings on default stage via L1 construct since there is no method for it in L2
+        http_api.default_stage.node.default_child.route_settings = route_settings
 
     return route
@@ -3,97 +3,157 @@
 import aws_cdk as cdk
 from cdk_nag import AwsSolutionsChecks # NagSuppressions can be added if needed
 from utils.utils import Utility
+from utils.subnet_planner import SubnetPlanner
+from utils.stack_tags import StackTags
 from synth.CustomSynthesizer import CustomSynthesizer
+from synth.TemplateBudgetReport import TemplateBudgetReport
 from global_apigw.global_apigw_stack import GlobalAPIGWStack
+from global_apigw.global_accelerator_stack import GlobalAcceleratorStack
 from global_apigw.idmz_network_stack import IDMZNetworkStack
 import os
 
-app = cdk.App()
-
-# Determine the environment profile (e.g., "develop", "qa", "live")
-# Prioritize CDK_ENV_PROFILE, then SRC_BRANCH, default to "develop"
-env_profile = os.getenv("CDK_ENV_PROFILE")
-if not env_profile:
-    src_branch_env = os.getenv("SRC_BRANCH")
-    if src_branch_env in ["qa", "live"]: # Explicitly map known branch names to profiles
-        env_profile = src_branch_env
-    else: # Default for "develop", feature branches, or undefined SRC_BRANCH
-        env_profile = "develop"
-print(f"Deployment Environment Profile: {env_profile}")
-
-# Load all properties for the determined environment profile
-properties_file_path = f"resources/application.{env_profile}.properties"
-all_props = Utility.load_properties(properties_file_path)
-
-if not all_props or 'cdk_settings' not in all_props:
-    raise ValueError(f"Failed to load properties or [cdk_settings] missing in {properties_file_path}")
-
-cdk_global_settings = all_props['cdk_settings']
-
-# Get target regions from cdk_settings
-target_regions_str = cdk_global_settings.get('target_regions')
-if not target_regions_str:
-    raise ValueError(f"'target_regions' not defined in [cdk_settings] in {properties_file_path}")
-
-target_regions = [region.strip() for region in target_regions_str.split(',') if region.strip()]
-if not target_regions:
-    raise ValueError(f"'target_regions' is empty or invalid in [cdk_settings] in {properties_file_path}")
-
-print(f"Target regions for deployment: {target_regions}")
-
-for region in target_regions:
-    print(f"--- Synthesizing for region: {region} ---")
-    # Build synthesizer for the current target region.
-    # This call is crucial as it sets Utility.cdk_custom_configs for the current region.
-    aws_environment, custom_cdk_synthesizer = CustomSynthesizer.build_synthesizer(
-        env_profile, region
-    )
-    
-    # Utility.cdk_custom_configs is now populated by build_synthesizer with merged
-    # global and region-specific settings for the current 'region'.
-
-    idmz_network_stack_id = f"IDMZ-Network-Stack-{region}"
-    idmz_network_stack = IDMZNetworkStack(app,
-                                          idmz_network_stack_id,
-                                          synthesizer=custom_cdk_synthesizer,
-                                          env=aws_environment)
-
-    global_apigw_stack_id = f"iDMZ-APIGateway-HTTP-API-{region}"
-    GlobalAPIGWStack(app,
-                     global_apigw_stack_id,
-                     synthesizer=custom_cdk_synthesizer,
-                     env=aws_environment,
-                     vpc=idmz_network_stack.vpc,
-                     sg_vpclink=idmz_network_stack.sg_vpclink,
-                     sg_vpce=idmz_network_stack.sg_vpce,
-                     sg_nlb=idmz_network_stack.sg_nlb,
-                     vpce_subnets=idmz_network_stack.vpce_subnets,
-                     nlb_subnets=idmz_network_stack.nlb_subnets,
-                     vpclink_subnets=idmz_network_stack.vpclink_subnets)
-    
-    # Region-specific tags can be applied here if needed, using Utility.cdk_custom_configs
-    # For example:
-    # current_region_config = Utility.cdk_custom_configs
-    # cdk.Tags.of(idmz_network_stack).add('sw:region_specific_tag', current_region_config.get('some_regional_value'))
-    # cdk.Tags.of(GlobalAPIGWStack_instance).add('sw:region_specific_tag', current_region_config.get('some_regional_value'))
-
-# Apply global tags to all stacks in the app
-# These tags should ideally come from non-region-specific settings (e.g., [cdk_settings])
-# or be truly global.
-global_tags = {
-    'sw:owner': cdk_global_settings.get('owner', 'default-owner'), # Use .get for safety
-    'sw:application': cdk_global_settings.get('workload', 'default-workload'), # Use .get for safety
-    'sw:environment_profile': env_profile
-}
-for key, value in global_tags.items():
-    if value: # Ensure value is not None or empty before adding tag
-        cdk.Tags.of(app).add(key, value)
-
-# Inspect all stacks with cdk-nag before synth
-cdk.Aspects.of(app).add(AwsSolutionsChecks(verbose=True)) # Added verbose for more detailed output
-
-# Add NagSuppressions if needed, for example:
-# NagSuppressions.add_stack_suppressions(idmz_network_stack_instance_for_region_A, [{"id": "AwsSolutions-VPC7", "reason": "Description"}])
-# NagSuppressions.add_resource_suppressions_by_path(stack, path_to_resource, [{"id": "RuleID", "reason": "Reason"}])
-
-app.synth()
+
+def get_env_profile() -> str:
+    # Determine the environment profile (e.g., "develop", "qa", "live")
+    # Prioritize CDK_ENV_PROFILE, then SRC_BRANCH, default to "develop"
+    env_profile = os.getenv("CDK_ENV_PROFILE")
+    if not env_profile:
+        src_branch_env = os.getenv("SRC_BRANCH")
+        if src_branch_env in ["qa", "live"]: # Explicitly map known branch names to profiles
+            env_profile = src_branch_env
+        else: # Default for "develop", feature branches, or undefined SRC_BRANCH
+            env_profile = "develop"
+    print(f"Deployment Environment Profile: {env_profile}")
+    return env_profile
+
+
+def build_app(env_profile: str, properties_file_path: str = None, outdir: str = None):
+    """
+    Build the CDK app with the network and API Gateway stacks for every target region.
+
+    @param env_profile: The environment profile (e.g., "develop") to load properties for.
+    @param properties_file_path: Optional properties file overriding "resources/application.{env_profile}.properties".
+    @param outdir: Optional cloud assembly output directory (defaults to the CDK CLI / cdk.out).
+    @return: app (cdk.App), cdk_global_settings (the [cdk_settings] section)
+    """
+    # Load all properties for the determined environment profile
+    properties_file_path = properties_file_path or f"resources/application.{env_profile}.properties"
+    all_props = Utility.load_properties(properties_file_path)
+
+    if not all_props or 'cdk_settings' not in all_props:
+        raise ValueError(f"Failed to load properties or [cdk_settings] missing in {properties_file_path}")
+
+    cdk_global_settings = all_props['cdk_settings']
+
+    app = cdk.App(outdir=outdir, **TemplateBudgetReport.app_options(cdk_global_settings))
+
+    # Get target regions from cdk_settings
+    target_regions_str = cdk_global_settings.get('target_regions')
+    if not target_regions_str:
+        raise ValueError(f"'target_regions' not defined in [cdk_settings] in {properties_file_path}")
+
+    target_regions = [region.strip() for region in target_regions_str.split(',') if region.strip()]
+    if not target_regions:
+        raise ValueError(f"'target_regions' is empty or invalid in [cdk_settings] in {properties_file_path}")
+
+    print(f"Target regions for deployment: {target_regions}")
+
+    # Global tags for every taggable construct of every stack, applied by StackTags
+    # These tags should ideally come from non-region-specific settings (e.g., [cdk_settings])
+    # or be truly global.
+    global_tags = {
+        'sw:owner': cdk_global_settings.get('owner', 'default-owner'), # Use .get for safety
+        'sw:application': cdk_global_settings.get('workload', 'default-workload'), # Use .get for safety
+        'sw:environment_profile': env_profile
+    }
+
+    # Validate the subnet plan of all regions up front (no constructs involved), so that overlapping
+    # or out-of-VPC subnets fail in milliseconds instead of at deploy time
+    SubnetPlanner.validate_profile(all_props, target_regions)
+
+    api_stacks = []
+    for region in target_regions:
+        print(f"--- Synthesizing for region: {region} ---")
+        # Build synthesizer for the current target region.
+        # This call is crucial as it sets Utility.cdk_custom_configs for the current region.
+        aws_environment, custom_cdk_synthesizer = CustomSynthesizer.build_synthesizer(
+            env_profile, region, properties_file_path
+        )
+
+        # Utility.cdk_custom_configs is now populated by build_synthesizer with merged
+        # global and region-specific settings for the current 'region'.
+
+        idmz_network_stack_id = Utility.network_stack_id(region)
+        idmz_network_stack = IDMZNetworkStack(app,
+                                              idmz_network_stack_id,
+                                              synthesizer=custom_cdk_synthesizer,
+                                              env=aws_environment)
+
+        global_apigw_stack_id = Utility.api_stack_id(region)
+        if Utility.get_bool(Utility.cdk_custom_configs, 'decouple_network_stack', False):
+            # Decoupled: the API stack resolves the network IDs from SSM at deploy time, so there are no
+            # CloudFormation exports between the stacks and API-only changes can be deployed with
+            # `cdk deploy --exclusively <api stack>`. The dependency only keeps the deploy order.
+            global_apigw_stack = GlobalAPIGWStack(app,
+                                                  global_apigw_stack_id,
+                                                  synthesizer=custom_cdk_synthesizer,
+                                                  env=aws_environment)
+            global_apigw_stack.add_dependency(idmz_network_stack, "Network IDs are published to SSM")
+        else:
+            global_apigw_stack = GlobalAPIGWStack(app,
+                                                  global_apigw_stack_id,
+                                                  synthesizer=custom_cdk_synthesizer,
+                                                  env=aws_environment,
+                                                  vpc=idmz_network_stack.vpc,
+                                                  sg_vpclink=idmz_network_stack.sg_vpclink,
+                                                  sg_vpce=idmz_network_stack.sg_vpce,
+                                                  sg_nlb=idmz_network_stack.sg_nlb,
+                                                  vpce_subnets=idmz_network_stack.vpce_subnets,
+                                                  nlb_subnets=idmz_network_stack.nlb_subnets,
+                                                  vpclink_subnets=idmz_network_stack.vpclink_subnets)
+
+        # All tags (global and per construct) are declared in StackTags and applied in one place
+        for stack in (idmz_network_stack, global_apigw_stack):
+            StackTags.apply(stack, Utility.cdk_custom_configs, global_tags)
+        api_stacks.append(global_apigw_stack)
+
+    if Utility.get_bool(cdk_global_settings, 'global_accelerator_enabled', False):
+        # One accelerator for all regions, deployed with the bootstrap of its home region
+        home_region = cdk_global_settings.get('global_accelerator_stack_region', '').strip() or target_regions[0]
+        print(f"--- Synthesizing the Global Accelerator stack in {home_region} ---")
+        aws_environment, custom_cdk_synthesizer = CustomSynthesizer.build_synthesizer(
+            env_profile, home_region, properties_file_path
+        )
+        region_configs = {region: {**cdk_global_settings, **all_props.get(region, {})} for region in target_regions}
+        accelerator_stack = GlobalAcceleratorStack(app,
+                                                   Utility.accelerator_stack_id(),
+                                                   region_configs,
+                                                   synthesizer=custom_cdk_synthesizer,
+                                                   env=aws_environment)
+        StackTags.apply(accelerator_stack, Utility.cdk_custom_configs, global_tags)
+
+    # Inspect all stacks with cdk-nag before synth
+    cdk.Aspects.of(app).add(AwsSolutionsChecks(verbose=True)) # Added verbose for more detailed output
+
+    # Add NagSuppressions if needed, for example:
+    # NagSuppressions.add_stack_suppressions(idmz_network_stack_instance_for_region_A, [{"id": "AwsSolutions-VPC7", "reason": "Description"}])
+    # NagSuppressions.add_resource_suppressions_by_path(stack, path_to_resource, [{"id": "RuleID", "reason": "Reason"}])
+
+    return app, cdk_global_settings
+
+
+def main():
+    env_profile = get_env_profile()
+    app, cdk_global_settings = build_app(env_profile)
+
+    cloud_assembly = app.synth()
+
+    # Report template size / resource counts per stack and fail the build when a budget is exceeded
+    budget_report, budget_violations = TemplateBudgetReport.build_report(cloud_assembly, cdk_global_settings)
+    TemplateBudgetReport.write_report(cloud_assembly, budget_report)
+    if budget_violations:
+        raise SystemExit("Template budget exceeded:\n  " + "\n  ".join(budget_violations))
+
+
+if __name__ == "__main__":
+    main()
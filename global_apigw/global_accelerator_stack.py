@@ -0,0 +1,75 @@
+import aws_cdk as core
+import aws_cdk.aws_globalaccelerator as ga
+from constructs import Construct
+
+
+class GlobalAcceleratorStack(core.Stack):
+    """Experimental, optional Global Accelerator in front of endpoints brought by every region.
+
+    Clients connect to the two static anycast IPs of the accelerator; TCP is terminated at the AWS
+    edge location closest to them and the connection crosses the AWS backbone to the endpoint group
+    of the closest healthy region. The listener passes TCP 443 through.
+
+    Global Accelerator endpoints are load balancers, EC2 instances or Elastic IPs; neither the API
+    Gateway custom domain nor the internal NLB of GlobalAPIGWStack can be one. This stack does not
+    create the endpoints: every region names an existing internet-facing endpoint that fronts its
+    ingress in 'global_accelerator_endpoint_id' (load balancer ARN or EIP allocation id), deployed
+    and owned outside this app.
+
+    The health checks are TCP: the ingress requires mTLS and health_check_path is behind the Lambda
+    authorizer, so an HTTPS check could never pass. They apply to EC2 and EIP endpoints; load
+    balancer endpoints report the health of their own targets.
+    """
+
+    def __init__(self, scope: Construct, id: str, region_configs: dict, **kwargs) -> None:
+        """
+        @param region_configs: Target region -> merged [cdk_settings] and region configuration.
+        """
+        super().__init__(scope, id, **kwargs)
+
+        settings = next(iter(region_configs.values()))
+        client_affinity = settings.get('global_accelerator_client_affinity', 'NONE').upper()
+        interval = int(settings.get('global_accelerator_health_check_interval', '30'))
+        threshold = int(settings.get('global_accelerator_health_check_threshold', '3'))
+        if client_affinity not in ('NONE', 'SOURCE_IP'):
+            raise ValueError("Configuration error: 'global_accelerator_client_affinity' must be NONE or SOURCE_IP, "
+                             f"got '{client_affinity}'.")
+        if interval not in (10, 30):
+            raise ValueError("Configuration error: 'global_accelerator_health_check_interval' must be 10 or 30 "
+                             f"seconds, got {interval}.")
+        if not 1 <= threshold <= 10:
+            raise ValueError("Configuration error: 'global_accelerator_health_check_threshold' must be between 1 "
+                             f"and 10, got {threshold}.")
+
+        accelerator = ga.Accelerator(
+            self,
+            "idmz-accelerator",
+            accelerator_name=f"{settings['ingress_name']}-{settings['vpc_instance']}-{settings['lzenv']}",
+            enabled=True)
+        listener = accelerator.add_listener(
+            "idmz-accelerator-listener",
+            port_ranges=[ga.PortRange(from_port=443)],
+            protocol=ga.ConnectionProtocol.TCP,
+            client_affinity=ga.ClientAffinity[client_affinity])
+
+        for region, region_config in region_configs.items():
+            endpoint_id = region_config.get('global_accelerator_endpoint_id', '').strip()
+            if not endpoint_id:
+                raise ValueError(f"Configuration error: 'global_accelerator_endpoint_id' is not set for region "
+                                 f"'{region}' (load balancer ARN or EIP allocation id fronting its ingress).")
+            traffic_dial = float(region_config.get('global_accelerator_traffic_dial', '100'))
+            if not 0 <= traffic_dial <= 100:
+                raise ValueError(f"Configuration error: 'global_accelerator_traffic_dial' of region '{region}' "
+                                 f"must be between 0 and 100, got {traffic_dial}.")
+            listener.add_endpoint_group(
+                f"idmz-endpoint-group-{region}",
+                region=region,
+                endpoints=[ga.RawEndpoint(endpoint_id=endpoint_id)],
+                traffic_dial_percentage=traffic_dial,
+                health_check_protocol=ga.HealthCheckProtocol.TCP,
+                health_check_port=443,
+                health_check_interval=core.Duration.seconds(interval),
+                health_check_threshold=threshold)
+
+        core.CfnOutput(self, "AcceleratorDnsName", value=accelerator.dns_name)
+        core.CfnOutput(self, "AcceleratorStaticIps", value=core.Fn.join(",", accelerator.ipv4_addresses))
@@ -1,4 +1,5 @@
 import json
+import os
 import aws_cdk as core
 import aws_cdk.aws_apigatewayv2 as apigwv2
 import aws_cdk.aws_route53 as r53
@@ -6,11 +7,22 @@ import aws_cdk.aws_route53_targets as r53_targets
 import aws_cdk.aws_s3_assets as s3assets
 import aws_cdk.aws_ssm as ssm
 import aws_cdk.aws_logs as logs
+import aws_cdk.aws_cloudwatch as cloudwatch
+import aws_cdk.aws_cloudwatch_actions as cloudwatch_actions
+import aws_cdk.aws_sns as sns
+import aws_cdk.aws_s3 as s3
+import aws_cdk.aws_glue as glue
+import aws_cdk.aws_iam as iam
+import aws_cdk.aws_lambda as lambda_
+import aws_cdk.aws_kinesisfirehose as firehose
+import aws_cdk.aws_logs_destinations as logs_destinations
 from constructs import Construct
-from aws_cdk import Tags
+from cdk_nag import NagSuppressions
 from aws_cdk import CfnTag
 from utils.utils import Utility
+from utils.truststore_builder import TruststoreBuilder
 from apigw_vpce_helpers import vpce_helpers, helpers
+from apigw_vpce_helpers.custom_resource.access_log_transform import access_log_schema
 from typing import List
 from aws_cdk import (
     aws_apigatewayv2 as http_api,
@@ -23,10 +35,10 @@ from aws_cdk import (
 
 class GlobalAPIGWStack(core.Stack):
 
-    def __init__(self, scope: Construct, id: str, vpc: ec2.Vpc,
-                 sg_vpclink: ec2.SecurityGroup, sg_vpce: ec2.SecurityGroup,
-                 sg_nlb: ec2.SecurityGroup, vpce_subnets: List[ec2.ISubnet],
-                 nlb_subnets: List[ec2.ISubnet], vpclink_subnets: List[ec2.ISubnet],
+    def __init__(self, scope: Construct, id: str, vpc: ec2.Vpc = None,
+                 sg_vpclink: ec2.SecurityGroup = None, sg_vpce: ec2.SecurityGroup = None,
+                 sg_nlb: ec2.SecurityGroup = None, vpce_subnets: List[ec2.ISubnet] = None,
+                 nlb_subnets: List[ec2.ISubnet] = None, vpclink_subnets: List[ec2.ISubnet] = None,
                  **kwargs) -> None:
         super().__init__(scope, id, **kwargs)
 
@@ -41,6 +53,12 @@ class GlobalAPIGWStack(core.Stack):
         self.vpce_service_tls_fqdn = self.cdk_custom_configs[
             'vpce_service_tls_fqdn']
 
+        # Decoupled mode: the network constructs are not passed in, they are resolved from the SSM
+        # parameters published by the network stack at deploy time.
+        if Utility.get_bool(self.cdk_custom_configs, 'decouple_network_stack', False):
+            vpc, sg_vpclink, sg_vpce, sg_nlb, vpce_subnets, nlb_subnets, vpclink_subnets = \
+                self._import_network_from_ssm()
+
         apidomain = self._create_custom_domain()
         vpc_link = self._create_vpc_link(vpc, sg_vpclink, vpclink_subnets)
         authorizer, listener = vpce_helpers.setup_vpce_integration(
@@ -60,6 +78,8 @@ class GlobalAPIGWStack(core.Stack):
             method=apigwv2.HttpMethod.ANY,
             secure_server_name=self.vpce_service_tls_fqdn,
             vpc_link=vpc_link,
+            # Forward the authorizer context (client CN, serial, tenant, matched rule) as x-idmz-* headers
+            parameter_mapping=vpce_helpers.authorizer_context_parameter_mapping(),
         )
 
         # Create HTTP Api  Gateway resource
@@ -72,6 +92,55 @@ class GlobalAPIGWStack(core.Stack):
             json.loads(self.cdk_custom_configs['routes']), authorizer,
             nlb_integration, self.vpce_service_tls_fqdn)
 
+        # Per-region performance dashboard and p99 latency alarms
+        self._create_dashboard(_http_api)
+
+        # Latency records of the ingress name, created last: the health check watches the API and the NLB
+        self._create_dns_records(apidomain, _http_api)
+
+    def _import_network_from_ssm(self):
+        az_names = self.cdk_custom_configs['azs'].split(',')
+        num_azs = len(az_names)
+
+        def network_value(name):
+            # Rendered as a CloudFormation parameter of type AWS::SSM::Parameter::Value<String>
+            return ssm.StringParameter.value_for_string_parameter(
+                self, Utility.network_ssm_parameter_name(name))
+
+        def network_list(name):
+            return core.Fn.split(",", network_value(name), num_azs)
+
+        route_table_ids = network_list('route-table-ids')
+        subnets = {}
+        for tier in ('vpce', 'nlb', 'vpclink'):
+            subnets[tier] = [
+                ec2.Subnet.from_subnet_attributes(
+                    self, f"{tier}-subnet-ssm-{i}",
+                    subnet_id=subnet_id,
+                    availability_zone=az_names[i],
+                    route_table_id=route_table_ids[i])
+                for i, subnet_id in enumerate(network_list(f'{tier}-subnet-ids'))
+            ]
+
+        all_subnets = subnets['vpce'] + subnets['nlb'] + subnets['vpclink']
+        vpc = ec2.Vpc.from_vpc_attributes(
+            self, "idmz-vpc-ssm",
+            vpc_id=network_value('vpc-id'),
+            availability_zones=az_names,
+            vpc_cidr_block=network_value('vpc-cidr-block'),
+            isolated_subnet_ids=[subnet.subnet_id for subnet in all_subnets],
+            isolated_subnet_route_table_ids=[subnet.route_table.route_table_id for subnet in all_subnets],
+        )
+
+        # Imported as immutable: the rules between these groups are owned by the network stack
+        sg_vpclink, sg_vpce, sg_nlb = [
+            ec2.SecurityGroup.from_security_group_id(
+                self, f"{name}-ssm", network_value(f"{name}-id"), mutable=False, allow_all_outbound=False)
+            for name in ('sg-vpclink', 'sg-vpce', 'sg-nlb')
+        ]
+
+        return vpc, sg_vpclink, sg_vpce, sg_nlb, subnets['vpce'], subnets['nlb'], subnets['vpclink']
+
     def _create_custom_domain(self):
         #
         # ACM Cert used for API Custom Domain
@@ -104,35 +173,13 @@ class GlobalAPIGWStack(core.Stack):
             self, "idmz-l2acmcert", certificate_arn=l1acmcert.ref)
 
         #
-        #upload PEM Certs to S3 for MTLS
+        # mTLS truststore: the PEM files of mtls_certs_path merged into one bundle
         #
-        sandboxcertasset = s3assets.Asset(
-            self,
-            "sandboxcert",
-            path="./certs/sandbox-cert.pem",  #relative to git repository root
-            deploy_time=False,
-        )
-        sandboxtestcertasset = s3assets.Asset(
-            self,
-            "sandboxtestcert",
-            path=
-            "./certs/sandboxtest-cert.pem",  #relative to git repository root
-            deploy_time=False,
-        )
-
-        sandboxtestcertasset = s3assets.Asset(
-            self,
-            "sandboxqacert",
-            path=
-            "./certs/sandboxqa.pem",  #relative to git repository root
-            deploy_time=False,
-        )
-
-        sandboxtestcertasset = s3assets.Asset(
+        truststore = self._build_truststore()
+        truststoreasset = s3assets.Asset(
             self,
-            "sandboxdevcert",
-            path=
-            "./certs/sandboxdev.pem",  #relative to git repository root
+            "idmz-mtls-truststore",
+            path=truststore['path'],
             deploy_time=False,
         )
         #
@@ -143,15 +190,21 @@ class GlobalAPIGWStack(core.Stack):
             "idmz-apicustomdomain",
             domain_name=ingress_external_fqdn,
             mtls=http_api.MTLSConfig(
-                bucket=sandboxtestcertasset.bucket,
-                key=sandboxtestcertasset.s3_object_key,
+                bucket=truststoreasset.bucket,
+                key=truststoreasset.s3_object_key,
             ),
             certificate=acmcert,
             endpoint_type=http_api.EndpointType.REGIONAL,
             security_policy=http_api.SecurityPolicy.TLS_1_2)
 
-        Tags.of(apidomain).add("sw:application",
-                               self.cdk_custom_configs["workload"])
+        return apidomain
+
+    def _create_dns_records(self, apidomain, apigw_http_api):
+        ingress_external_fqdn = self.cdk_custom_configs[
+                                    "ingress_name"] + "." + self.cdk_custom_configs[
+                                    "idmz_external_zone_name"]
+        idmz_external_zone_id = self.cdk_custom_configs[
+            "idmz_external_zone_id"]
 
         # Create HostedZone object. Passing public_zone obejct does not work
         hostedzone = r53.HostedZone.from_hosted_zone_attributes(
@@ -160,17 +213,35 @@ class GlobalAPIGWStack(core.Stack):
             hosted_zone_id=idmz_external_zone_id,
             zone_name=self.cdk_custom_configs['idmz_external_zone_name'])
 
+        # Optional Route 53 health check for this region's ingress. When it fails, Route 53 stops
+        # answering with this region's latency record and clients drain to the next-closest region.
+        health_check = None
+        if Utility.get_bool(self.cdk_custom_configs, 'r53_health_check_enabled', False):
+            health_check = self._create_health_check(apidomain, apigw_http_api)
+
+        # With a designated failover region, the latency records move to a dedicated name and the
+        # ingress name becomes a PRIMARY/SECONDARY failover pair owned by the failover region's stack.
+        # Must be set in [cdk_settings] so that every region agrees on the record layout.
+        failover_region = self.cdk_custom_configs.get('r53_failover_region', '').strip()
+        target_regions = [region.strip() for region in self.cdk_custom_configs.get('target_regions', '').split(',')]
+        if failover_region and failover_region not in target_regions:
+            # No region would own the PRIMARY record of the ingress name
+            raise ValueError(f"Configuration error: 'r53_failover_region' '{failover_region}' is not one of the "
+                             f"target_regions ({', '.join(target_regions)}).")
+        latency_record_name = f"latency.{ingress_external_fqdn}" if failover_region else ingress_external_fqdn
+
         # Add DNS record pointing to API Gateway Custom Domain using Latency-based routing.
         # We use the L1 CfnRecordSet construct here to get access to the `region` and `set_identifier`
         # properties required for latency-based routing, which aren't available in the L2 ARecord construct for alias targets.
-        r53.CfnRecordSet(
+        latency_record = r53.CfnRecordSet(
             self,
             f"r53record-{self.cdk_custom_configs['ingress_name']}",
-            name=ingress_external_fqdn,
+            name=latency_record_name,
             type='A',
             hosted_zone_id=hostedzone.hosted_zone_id,
             region=self.region,
             set_identifier=f"{self.cdk_custom_configs['ingress_name']}-{self.region}",
+            health_check_id=health_check.attr_health_check_id if health_check else None,
             alias_target=r53.CfnRecordSet.AliasTargetProperty(
                 dns_name=apidomain.regional_domain_name,
                 hosted_zone_id=apidomain.regional_hosted_zone_id,
@@ -178,7 +249,173 @@ class GlobalAPIGWStack(core.Stack):
             )
         )
 
-        return apidomain
+        if failover_region == self.region:
+            # PRIMARY: follow the latency records. Evaluating target health makes the primary
+            # unhealthy only once every latency record behind it has failed its health check.
+            primary_record = r53.CfnRecordSet(
+                self,
+                f"r53record-{self.cdk_custom_configs['ingress_name']}-primary",
+                name=ingress_external_fqdn,
+                type='A',
+                hosted_zone_id=hostedzone.hosted_zone_id,
+                failover="PRIMARY",
+                set_identifier=f"{self.cdk_custom_configs['ingress_name']}-primary",
+                alias_target=r53.CfnRecordSet.AliasTargetProperty(
+                    dns_name=latency_record_name,
+                    hosted_zone_id=hostedzone.hosted_zone_id,
+                    evaluate_target_health=True
+                )
+            )
+            # The alias target has to exist before the record pointing at it
+            primary_record.add_dependency(latency_record)
+            # SECONDARY: pin to this region. No health check, so Route 53 always has an answer.
+            r53.CfnRecordSet(
+                self,
+                f"r53record-{self.cdk_custom_configs['ingress_name']}-secondary",
+                name=ingress_external_fqdn,
+                type='A',
+                hosted_zone_id=hostedzone.hosted_zone_id,
+                failover="SECONDARY",
+                set_identifier=f"{self.cdk_custom_configs['ingress_name']}-secondary",
+                alias_target=r53.CfnRecordSet.AliasTargetProperty(
+                    dns_name=apidomain.regional_domain_name,
+                    hosted_zone_id=apidomain.regional_hosted_zone_id,
+                    evaluate_target_health=False
+                )
+            )
+
+    def _build_truststore(self) -> dict:
+        # The asset hash is the content hash of the bundle: an unchanged truststore keeps its S3 key and is
+        # not uploaded again, a changed one gets a new key and the custom domain switches over in one update
+        truststore = TruststoreBuilder.build(
+            TruststoreBuilder.resolve_paths(self.cdk_custom_configs['mtls_certs_path']),
+            os.path.join(core.Stage.of(self).outdir, "truststore"),
+            int(self.cdk_custom_configs.get('mtls_truststore_expiry_warning_days',
+                                            TruststoreBuilder.DEFAULT_EXPIRY_WARNING_DAYS)))
+        for warning in truststore['warnings']:
+            print(f"WARNING mTLS truststore: {warning}")
+        print(f"mTLS truststore {truststore['sha256'][:12]}: {len(truststore['certificates'])} certificates")
+        core.CfnOutput(self, "MtlsTruststoreSha256", value=truststore['sha256'])
+        return truststore
+
+    def _create_health_check(self, apidomain, apigw_http_api) -> r53.CfnHealthCheck:
+        """Route 53 health check of this region, attached to its latency record.
+
+        TCP probes the regional endpoint of the custom domain (the ingress FQDN resolves through the
+        latency records and would not necessarily reach this region). It only verifies that the endpoint
+        accepts connections: an HTTPS check can never pass, because the custom domain requires mTLS and
+        Route 53 health checkers cannot present a client certificate.
+        CALCULATED (default) also fails a degraded region: it is healthy only while the TCP check and the
+        CLOUDWATCH_METRIC checks of the API 5xx rate, IntegrationLatency p99 and NLB UnHealthyHostCount
+        alarms (see _create_health_alarms) are all healthy.
+        """
+        check_type = self.cdk_custom_configs.get('r53_health_check_type', 'CALCULATED').strip().upper()
+        interval = int(self.cdk_custom_configs.get('r53_health_check_interval', '10'))
+        failure_threshold = int(self.cdk_custom_configs.get('r53_health_check_failure_threshold', '2'))
+
+        if check_type not in ('TCP', 'CALCULATED'):
+            raise ValueError(f"Configuration error: 'r53_health_check_type' must be TCP or CALCULATED, got "
+                             f"'{check_type}'. The custom domain requires mTLS, which Route 53 health checkers "
+                             "cannot present.")
+        if interval not in (10, 30):
+            raise ValueError(f"Configuration error: 'r53_health_check_interval' must be 10 or 30 seconds, got {interval}.")
+        if not 1 <= failure_threshold <= 10:
+            raise ValueError(
+                f"Configuration error: 'r53_health_check_failure_threshold' must be between 1 and 10, got {failure_threshold}.")
+
+        def tags(suffix=''):
+            return [
+                r53.CfnHealthCheck.HealthCheckTagProperty(
+                    key="Name",
+                    value=f"{self.cdk_custom_configs['ingress_name']}-{self.region}{suffix}"),
+                r53.CfnHealthCheck.HealthCheckTagProperty(
+                    key="sw:application",
+                    value=self.cdk_custom_configs["workload"]),
+            ]
+
+        health_check = r53.CfnHealthCheck(
+            self,
+            "idmz-r53-healthcheck",
+            health_check_config=r53.CfnHealthCheck.HealthCheckConfigProperty(
+                type='TCP',
+                fully_qualified_domain_name=apidomain.regional_domain_name,
+                port=443,
+                request_interval=interval,
+                failure_threshold=failure_threshold),
+            health_check_tags=tags('-tcp' if check_type == 'CALCULATED' else ''))
+
+        if check_type == 'CALCULATED':
+            child_checks = [health_check]
+            for key, alarm in self._create_health_alarms(apigw_http_api).items():
+                child_checks.append(r53.CfnHealthCheck(
+                    self,
+                    f"idmz-r53-healthcheck-{key}",
+                    health_check_config=r53.CfnHealthCheck.HealthCheckConfigProperty(
+                        type='CLOUDWATCH_METRIC',
+                        alarm_identifier=r53.CfnHealthCheck.AlarmIdentifierProperty(
+                            name=alarm.alarm_name, region=self.region),
+                        # No data yet (e.g. a new alarm) keeps the region in service
+                        insufficient_data_health_status='LastKnownStatus'),
+                    health_check_tags=tags(f"-{key}")))
+            # Healthy only while every child is healthy
+            health_check = r53.CfnHealthCheck(
+                self,
+                "idmz-r53-healthcheck-calculated",
+                health_check_config=r53.CfnHealthCheck.HealthCheckConfigProperty(
+                    type='CALCULATED',
+                    child_health_checks=[child.attr_health_check_id for child in child_checks],
+                    health_threshold=len(child_checks)),
+                health_check_tags=tags())
+
+        core.CfnOutput(self, "Route53HealthCheckId", value=health_check.attr_health_check_id)
+
+        return health_check
+
+    def _create_health_alarms(self, apigw_http_api) -> dict:
+        """
+        Alarms of the alarm-based Route 53 health check: API 5xx rate (the HTTP API 5xx metric is 0 or 1
+        per request, so its average is the error rate), IntegrationLatency p99 (ms) and UnHealthyHostCount
+        of the NLB target group (the VPC endpoint ENIs). Route 53 only reads the alarm state, so the alarms
+        have no actions; they alarm when all 'alarm_evaluation_periods' one-minute periods breach.
+
+        @param apigw_http_api: HTTP API of this region.
+        @return: dict of check name -> cloudwatch.Alarm
+        """
+        period = core.Duration.minutes(1)
+        evaluation_periods = int(self.cdk_custom_configs.get('alarm_evaluation_periods', '5'))
+        target_group = self.node.find_child("idmz-nlb-targetgroup")
+        # No metric labels: a labelled metric is rendered as a metric query, which Route 53 cannot read
+        checks = {
+            '5xx-rate': (
+                "API 5xx rate", apigw_http_api.metric("5xx", statistic="Average", period=period),
+                float(self.cdk_custom_configs.get('r53_health_alarm_5xx_rate', '0.05')),
+                cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD),
+            'integration-latency': (
+                "IntegrationLatency p99 (ms)",
+                apigw_http_api.metric("IntegrationLatency", statistic="p99", period=period),
+                float(self.cdk_custom_configs.get('r53_health_alarm_integration_latency_p99_ms', '2500')),
+                cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD),
+            'unhealthy-hosts': (
+                "NLB UnHealthyHostCount",
+                target_group.metrics.un_healthy_host_count(statistic="Maximum", period=period),
+                float(self.cdk_custom_configs.get('r53_health_alarm_unhealthy_hosts', '1')),
+                cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD),
+        }
+
+        alarms = {}
+        for key, (description, metric, threshold, comparison_operator) in checks.items():
+            alarms[key] = cloudwatch.Alarm(
+                self,
+                f"idmz-r53-health-{key}",
+                alarm_name=f"{self.cdk_custom_configs['ingress_name']}-{self.region}-r53-health-{key}",
+                alarm_description=f"Route 53 health check of {self.region}: {description}, threshold {threshold:g}",
+                metric=metric,
+                threshold=threshold,
+                comparison_operator=comparison_operator,
+                evaluation_periods=evaluation_periods,
+                # No requests means no errors and no latency: the region stays healthy
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING)
+        return alarms
 
     def _create_apigw_http_api(
             self, apidomain, authorizer: apigwv2_authorizers.HttpLambdaAuthorizer, integration: apigwv2_integrations.HttpNlbIntegration):
@@ -199,11 +436,146 @@ class GlobalAPIGWStack(core.Stack):
 
         core.CfnOutput(self, "HttpApiEndpoint", value=apigw_http_api.url)
 
+        # Stage-wide throttling so that a single noisy client is shed at the edge instead of
+        # queueing on the NLB / VPC endpoint service. Per-route overrides are set with the routes.
+        rate_limit = self.cdk_custom_configs.get('stage_throttling_rate_limit')
+        burst_limit = self.cdk_custom_configs.get('stage_throttling_burst_limit')
+        # Detailed metrics publish Latency, IntegrationLatency, 4xx and 5xx per route (billed as custom metrics)
+        detailed_metrics = Utility.get_bool(self.cdk_custom_configs, 'apigw_detailed_metrics', True)
+        # update default route settings on default stage via L1 construct since there is no method for it in L2
+        apigw_http_api.default_stage.node.default_child.default_route_settings = apigwv2.CfnStage.RouteSettingsProperty(
+            detailed_metrics_enabled=detailed_metrics,
+            throttling_rate_limit=float(rate_limit) if rate_limit else None,
+            throttling_burst_limit=int(burst_limit) if burst_limit else None,
+        )
+
         # Create api-gw log group
         self._create_apigw_log_group(apigw_http_api)
 
         return apigw_http_api
 
+    def _create_dashboard(self, apigw_http_api) -> cloudwatch.Dashboard:
+        """CloudWatch dashboard of the request path in this region: API Gateway, authorizer, NLB and VPC endpoint.
+
+        The p99 alarms are created for the thresholds configured in the properties file and drawn on the
+        latency graphs.
+        """
+        period = core.Duration.minutes(1)
+        authorizer_function = self.node.find_child("LambdaAuthorizer")
+        nlb = self.node.find_child("idmz-nlb")
+        target_group = self.node.find_child("idmz-nlb-targetgroup")
+
+        def api_metric(metric_name, statistic):
+            return apigw_http_api.metric(metric_name, statistic=statistic, period=period,
+                                         label=f"{metric_name} {statistic}")
+
+        latency_alarms = self._create_latency_alarms({
+            'alarm_api_latency_p99_ms': api_metric("Latency", "p99"),
+            'alarm_integration_latency_p99_ms': api_metric("IntegrationLatency", "p99"),
+            'alarm_authorizer_duration_p99_ms': authorizer_function.metric_duration(
+                statistic="p99", period=period, label="Duration p99"),
+        })
+
+        def annotations(*keys):
+            return [latency_alarms[key].to_annotation() for key in keys if key in latency_alarms]
+
+        # The authorizer decisions are EMF metrics logged by the function (see idmz_metrics.py)
+        decisions = [
+            cloudwatch.Metric(
+                namespace=self.cdk_custom_configs.get('lambda_metrics_namespace', 'IDMZ'),
+                metric_name="Decision",
+                dimensions_map={"Service": "authorizer", "Reason": reason},
+                statistic="Sum", period=period, label=reason)
+            for reason in ('allowed', 'certificate_denied', 'source_ip_denied', 'no_client_certificate', 'error')
+        ]
+        # The PrivateLink metrics carry the endpoint id, which is only known after deployment, so search them
+        vpce_bytes = cloudwatch.MathExpression(
+            expression=("SEARCH('{AWS/PrivateLinkEndpoints,\"Endpoint Type\",\"Service Name\",\"VPC Endpoint Id\","
+                        "\"VPC Id\"} MetricName=\"BytesProcessed\" \"Service Name\"=\""
+                        f"{self.cdk_custom_configs['vpce_service_name']}\"', 'Sum', 60)"),
+            using_metrics={},
+            label="BytesProcessed",
+            period=period)
+
+        dashboard = cloudwatch.Dashboard(
+            self,
+            "idmz-performance-dashboard",
+            dashboard_name=f"{self.cdk_custom_configs['ingress_name']}-{self.region}-performance",
+            default_interval=core.Duration.hours(3))
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="API latency (ms)", width=12,
+                left=[api_metric("Latency", "p50"), api_metric("Latency", "p99"),
+                      api_metric("IntegrationLatency", "p50"), api_metric("IntegrationLatency", "p99")],
+                left_annotations=annotations('alarm_api_latency_p99_ms', 'alarm_integration_latency_p99_ms')),
+            cloudwatch.GraphWidget(
+                title="API requests and errors", width=12,
+                left=[api_metric("4xx", "Sum"), api_metric("5xx", "Sum")],
+                right=[api_metric("Count", "Sum")]),
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Authorizer duration (ms) and throttles", width=12,
+                left=[authorizer_function.metric_duration(statistic="p50", period=period, label="Duration p50"),
+                      authorizer_function.metric_duration(statistic="p99", period=period, label="Duration p99")],
+                right=[authorizer_function.metric_throttles(period=period, label="Throttles")],
+                left_annotations=annotations('alarm_authorizer_duration_p99_ms')),
+            cloudwatch.GraphWidget(title="Authorizer decisions", width=12, left=decisions, stacked=True),
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="NLB flows and TCP resets", width=12,
+                left=[nlb.metrics.active_flow_count(period=period), nlb.metrics.new_flow_count(period=period)],
+                right=[nlb.metrics.tcp_elb_reset_count(period=period),
+                       nlb.metrics.tcp_target_reset_count(period=period),
+                       nlb.metrics.tcp_client_reset_count(period=period)]),
+            cloudwatch.GraphWidget(
+                title="NLB targets (VPC endpoint ENIs)", width=6,
+                left=[target_group.metrics.un_healthy_host_count(period=period),
+                      target_group.metrics.healthy_host_count(period=period)]),
+            cloudwatch.GraphWidget(title="VPC endpoint bytes", width=6, left=[vpce_bytes]),
+        )
+        return dashboard
+
+    def _create_latency_alarms(self, metrics: dict) -> dict:
+        """
+        p99 alarms for the metrics whose threshold (ms) is set in the properties file; an empty threshold
+        disables the alarm. The alarm fires when 'alarm_datapoints_to_alarm' of the last
+        'alarm_evaluation_periods' one-minute periods breach, and notifies 'alarm_sns_topic_arn' when set.
+
+        @param metrics: Threshold property -> p99 metric.
+        @return: dict of threshold property -> cloudwatch.Alarm
+        """
+        evaluation_periods = int(self.cdk_custom_configs.get('alarm_evaluation_periods', '5'))
+        datapoints_to_alarm = int(self.cdk_custom_configs.get('alarm_datapoints_to_alarm', '3'))
+        if not 1 <= datapoints_to_alarm <= evaluation_periods:
+            raise ValueError("Configuration error: 'alarm_datapoints_to_alarm' must be between 1 and "
+                             f"'alarm_evaluation_periods' ({evaluation_periods}), got {datapoints_to_alarm}.")
+        topic_arn = self.cdk_custom_configs.get('alarm_sns_topic_arn', '').strip()
+        topic = sns.Topic.from_topic_arn(self, "idmz-alarm-topic", topic_arn) if topic_arn else None
+
+        alarms = {}
+        for key, metric in metrics.items():
+            threshold = self.cdk_custom_configs.get(key, '').strip()
+            if not threshold:
+                continue
+            alarm = cloudwatch.Alarm(
+                self,
+                f"idmz-{key.replace('_', '-')}",
+                alarm_name=f"{self.cdk_custom_configs['ingress_name']}-{self.region}-{key[len('alarm_'):].replace('_', '-')}",
+                alarm_description=f"{metric.label} above {threshold} ms ({key})",
+                metric=metric,
+                threshold=float(threshold),
+                comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                evaluation_periods=evaluation_periods,
+                datapoints_to_alarm=datapoints_to_alarm,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING)
+            if topic:
+                alarm.add_alarm_action(cloudwatch_actions.SnsAction(topic))
+                alarm.add_ok_action(cloudwatch_actions.SnsAction(topic))
+            alarms[key] = alarm
+        return alarms
+
     def _create_apigw_log_group(self, http_api):
         #
         # Logging for API Gateway
@@ -219,8 +591,6 @@ class GlobalAPIGWStack(core.Stack):
             removal_policy=core.RemovalPolicy.DESTROY,
             retention=logs.RetentionDays.TWO_WEEKS,
         )
-        Tags.of(apilogs).add("sw:application",
-                             f"{self.cdk_custom_configs['workload']}")
         # JSON Log Format
         # https://docs.aws.amazon.com/apigateway/latest/developerguide/http-api-logging-variables.html
         logformat = {
@@ -241,7 +611,14 @@ class GlobalAPIGWStack(core.Stack):
                 '$context.identity.clientCert.serialNumber',
             'integrationError': '$context.integration.error',
             'integrationStatus': '$context.integration.status',
-            'integrationErrorMessage': '$context.integrationErrorMessage'
+            'integrationErrorMessage': '$context.integrationErrorMessage',
+            # Latency breakdown (ms), consumed by tools/access_log_analyzer.py
+            'responseLatency': '$context.responseLatency',
+            'integrationLatency': '$context.integrationLatency',
+            'authorizerLatency': '$context.authorizer.latency',
+            'authorizerStatus': '$context.authorizer.status',
+            # There is no context variable for the region, so it is baked into the format
+            'region': self.region
         }
         # update access log settings on default stage via L1 construct since there is no method for it in L2
         http_api.default_stage.node.default_child.access_log_settings = apigwv2.CfnStage.AccessLogSettingsProperty(
@@ -249,6 +626,193 @@ class GlobalAPIGWStack(core.Stack):
             format=json.dumps(logformat),
         )
 
+        if Utility.get_bool(self.cdk_custom_configs, 'access_log_archive_enabled', False):
+            self._create_access_log_archive(apilogs)
+
+    def _create_access_log_archive(self, apilogs: logs.LogGroup) -> firehose.CfnDeliveryStream:
+        """
+        Archive the access logs in S3 as Parquet, partitioned by region/date/hour, for bulk analysis
+        with Athena (or any Parquet reader) beyond the retention of the log group.
+
+        subscription filter -> Firehose -> transform Lambda (envelope to access_log_schema rows)
+        -> record format conversion to Parquet with the Glue table -> S3
+
+        Firehose partitions by arrival time, which trails the request time by at most the buffer
+        interval. The Glue table uses partition projection, so no crawler or MSCK REPAIR is needed.
+        """
+        retention_days = int(self.cdk_custom_configs.get('access_log_archive_retention_days', '400'))
+        ia_days = int(self.cdk_custom_configs.get('access_log_archive_ia_days', '30'))
+        buffer_seconds = int(self.cdk_custom_configs.get('access_log_archive_buffer_seconds', '300'))
+        if ia_days < 30 or retention_days <= ia_days:
+            raise ValueError("Configuration error: 'access_log_archive_ia_days' must be at least 30 and lower "
+                             f"than 'access_log_archive_retention_days', got {ia_days} and {retention_days}")
+        if not 60 <= buffer_seconds <= 900:
+            raise ValueError("Configuration error: 'access_log_archive_buffer_seconds' must be between 60 and "
+                             f"900, got {buffer_seconds}")
+
+        bucket = s3.Bucket(
+            self,
+            "idmz-access-log-archive",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl=True,
+            removal_policy=core.RemovalPolicy.RETAIN,
+            lifecycle_rules=[s3.LifecycleRule(
+                abort_incomplete_multipart_upload_after=core.Duration.days(1),
+                transitions=[s3.Transition(storage_class=s3.StorageClass.INFREQUENT_ACCESS,
+                                           transition_after=core.Duration.days(ia_days))],
+                expiration=core.Duration.days(retention_days))])
+        NagSuppressions.add_resource_suppressions(bucket, [{
+            'id': 'AwsSolutions-S1',
+            'reason': "Archive written only by the Firehose delivery stream, access is audited with CloudTrail",
+        }])
+
+        # Glue names allow lower-case letters, digits and underscores only
+        database_name = f"{self.cdk_custom_configs['ingress_name']}_access_logs".lower().replace('-', '_')
+        table_name = "access_logs"
+        database = glue.CfnDatabase(
+            self,
+            "idmz-access-log-database",
+            catalog_id=self.account,
+            database_input=glue.CfnDatabase.DatabaseInputProperty(name=database_name))
+        prefix = f"region={self.region}/date=!{{timestamp:yyyy-MM-dd}}/hour=!{{timestamp:HH}}/"
+        table = glue.CfnTable(
+            self,
+            "idmz-access-log-table",
+            catalog_id=self.account,
+            database_name=database_name,
+            table_input=glue.CfnTable.TableInputProperty(
+                name=table_name,
+                table_type="EXTERNAL_TABLE",
+                partition_keys=[glue.CfnTable.ColumnProperty(name=key, type="string")
+                                for key in access_log_schema.PARTITION_KEYS],
+                parameters={
+                    'classification': 'parquet',
+                    'projection.enabled': 'true',
+                    'projection.region.type': 'enum',
+                    'projection.region.values': self.region,
+                    'projection.date.type': 'date',
+                    'projection.date.format': 'yyyy-MM-dd',
+                    'projection.date.range': f"NOW-{retention_days}DAYS,NOW",
+                    'projection.date.interval': '1',
+                    'projection.date.interval.unit': 'DAYS',
+                    'projection.hour.type': 'integer',
+                    'projection.hour.range': '0,23',
+                    'projection.hour.digits': '2',
+                    'storage.location.template':
+                        f"s3://{bucket.bucket_name}/region=${{region}}/date=${{date}}/hour=${{hour}}/",
+                },
+                storage_descriptor=glue.CfnTable.StorageDescriptorProperty(
+                    columns=[glue.CfnTable.ColumnProperty(name=column, type=glue_type)
+                             for column, _, glue_type in access_log_schema.COLUMNS],
+                    location=f"s3://{bucket.bucket_name}/",
+                    input_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+                    output_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+                    serde_info=glue.CfnTable.SerdeInfoProperty(
+                        serialization_library="org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"))))
+        table.add_dependency(database)
+
+        transform_lambda = lambda_.Function(
+            self,
+            "AccessLogTransformFunction",
+            handler='handler.lambda_handler',
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            log_retention=logs.RetentionDays.TWO_WEEKS,
+            timeout=core.Duration.seconds(60),
+            memory_size=256,
+            code=lambda_.Code.from_asset(os.path.dirname(access_log_schema.__file__)))
+        NagSuppressions.add_resource_suppressions(transform_lambda, [{
+            "id": "AwsSolutions-IAM4",
+            "reason": "Role policy selected by use of Function construct uses AWSLambdaBasicExecutionRole",
+            "appliesTo": [
+                "Policy::arn:<AWS::Partition>:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole",
+            ]
+        }, {
+            "id": "AwsSolutions-L1",
+            "reason": "Using the latest available Python runtime (3.12). CDK-nag may not recognize this as the latest.",
+        }], apply_to_children=True)
+
+        firehose_role = iam.Role(self, "idmz-access-log-firehose-role",
+                                 assumed_by=iam.ServicePrincipal("firehose.amazonaws.com"))
+        bucket.grant_read_write(firehose_role)
+        transform_lambda.grant_invoke(firehose_role)
+        firehose_role.add_to_policy(iam.PolicyStatement(
+            actions=["glue:GetTable", "glue:GetTableVersion", "glue:GetTableVersions"],
+            resources=[
+                f"arn:{self.partition}:glue:{self.region}:{self.account}:catalog",
+                f"arn:{self.partition}:glue:{self.region}:{self.account}:database/{database_name}",
+                f"arn:{self.partition}:glue:{self.region}:{self.account}:table/{database_name}/{table_name}",
+            ]))
+        NagSuppressions.add_resource_suppressions(firehose_role, [{
+            "id": "AwsSolutions-IAM5",
+            "reason": "Firehose writes objects under generated partition prefixes of its own archive bucket "
+                      "and invokes the current version of the transform function",
+        }], apply_to_children=True)
+
+        delivery_stream = firehose.CfnDeliveryStream(
+            self,
+            "idmz-access-log-firehose",
+            delivery_stream_type="DirectPut",
+            delivery_stream_encryption_configuration_input=firehose.CfnDeliveryStream.
+            DeliveryStreamEncryptionConfigurationInputProperty(key_type="AWS_OWNED_CMK"),
+            extended_s3_destination_configuration=firehose.CfnDeliveryStream.ExtendedS3DestinationConfigurationProperty(
+                bucket_arn=bucket.bucket_arn,
+                role_arn=firehose_role.role_arn,
+                prefix=prefix,
+                error_output_prefix="errors/!{firehose:error-output-type}/date=!{timestamp:yyyy-MM-dd}/",
+                # Format conversion needs at least 64 MB buffers; large files keep the scans cheap
+                buffering_hints=firehose.CfnDeliveryStream.BufferingHintsProperty(
+                    interval_in_seconds=buffer_seconds, size_in_m_bs=128),
+                # Parquet is compressed by its serializer
+                compression_format="UNCOMPRESSED",
+                processing_configuration=firehose.CfnDeliveryStream.ProcessingConfigurationProperty(
+                    enabled=True,
+                    processors=[firehose.CfnDeliveryStream.ProcessorProperty(
+                        type="Lambda",
+                        parameters=[
+                            firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                                parameter_name="LambdaArn", parameter_value=transform_lambda.function_arn),
+                            # Small input batches: envelopes decompress roughly tenfold and the Lambda
+                            # response is limited to 6 MB
+                            firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                                parameter_name="BufferSizeInMBs", parameter_value="0.25"),
+                            firehose.CfnDeliveryStream.ProcessorParameterProperty(
+                                parameter_name="BufferIntervalInSeconds", parameter_value="60"),
+                        ])]),
+                data_format_conversion_configuration=firehose.CfnDeliveryStream.
+                DataFormatConversionConfigurationProperty(
+                    enabled=True,
+                    # The transform writes request_time as epoch milliseconds
+                    input_format_configuration=firehose.CfnDeliveryStream.InputFormatConfigurationProperty(
+                        deserializer=firehose.CfnDeliveryStream.DeserializerProperty(
+                            hive_json_ser_de=firehose.CfnDeliveryStream.HiveJsonSerDeProperty(
+                                timestamp_formats=["millis"]))),
+                    output_format_configuration=firehose.CfnDeliveryStream.OutputFormatConfigurationProperty(
+                        serializer=firehose.CfnDeliveryStream.SerializerProperty(
+                            parquet_ser_de=firehose.CfnDeliveryStream.ParquetSerDeProperty(compression="SNAPPY"))),
+                    schema_configuration=firehose.CfnDeliveryStream.SchemaConfigurationProperty(
+                        catalog_id=self.account,
+                        database_name=database_name,
+                        table_name=table_name,
+                        region=self.region,
+                        role_arn=firehose_role.role_arn,
+                        version_id="LATEST"))))
+        delivery_stream.node.add_dependency(firehose_role)
+        delivery_stream.add_dependency(table)
+
+        logs.SubscriptionFilter(
+            self,
+            "idmz-access-log-subscription",
+            log_group=apilogs,
+            destination=logs_destinations.FirehoseDestination(
+                firehose.DeliveryStream.from_delivery_stream_arn(
+                    self, "idmz-access-log-firehose-ref", delivery_stream.attr_arn)),
+            filter_pattern=logs.FilterPattern.all_events())
+
+        core.CfnOutput(self, "AccessLogArchiveBucket", value=bucket.bucket_name)
+        core.CfnOutput(self, "AccessLogArchiveTable", value=f"{database_name}.{table_name}")
+        return delivery_stream
+
     def _create_vpc_link(self, vpc, sg_vpclink, vpclink_subnets: List[ec2.ISubnet]):
 
         #
@@ -261,7 +825,5 @@ class GlobalAPIGWStack(core.Stack):
             security_groups=[sg_vpclink],
             subnets=ec2.SubnetSelection(
                 subnets=vpclink_subnets))
-        Tags.of(vpclink).add("sw:application",
-                             f"{self.cdk_custom_configs['workload']}")
 
         return vpclink
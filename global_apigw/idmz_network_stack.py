@@ -1,11 +1,12 @@
 import aws_cdk as core
 from aws_cdk import (
-    aws_ec2 as ec2, )
+    aws_ec2 as ec2,
+    aws_ssm as ssm, )
 from aws_cdk.aws_ec2 import IpAddresses
 from constructs import Construct
-from aws_cdk import Tags
 from cdk_nag import NagSuppressions
 from utils.utils import Utility
+from utils.subnet_planner import SubnetPlanner
 
 
 class IDMZNetworkStack(core.Stack):
@@ -41,6 +42,11 @@ class IDMZNetworkStack(core.Stack):
         self.sg_vpclink.connections.allow_to(self.sg_nlb, ec2.Port.tcp(443),
                                              "API Link outbound to NLB")
 
+        # Decoupled mode: publish the network IDs to SSM so that the API Gateway stack resolves them
+        # at deploy time instead of importing CloudFormation exports from this stack.
+        if Utility.get_bool(self._cdk_custom_configs, 'decouple_network_stack', False):
+            self._publish_network_parameters()
+
     def _import_existing_vpc(self) -> ec2.IVpc:
         # Ensure 'existing_vpc_id' is present in the regional or cdk_settings config
         vpc_id = self._cdk_custom_configs.get('existing_vpc_id')
@@ -80,16 +86,14 @@ class IDMZNetworkStack(core.Stack):
         az_ids = self._cdk_custom_configs['az_ids'].split(',')
         az_names = self._cdk_custom_configs['azs'].split(',')
 
-        # The original VPC had 3 subnet types. We need specific CIDRs for each.
-        vpce_subnet_cidrs = self._cdk_custom_configs['vpce1_subnet_cidrs'].split(',')
-        nlb_subnet_cidrs = self._cdk_custom_configs['nlb_subnet_cidrs'].split(',')
-        vpclink_subnet_cidrs = self._cdk_custom_configs['vpclink_subnet_cidrs'].split(',')
-
-        # Basic validation to ensure config lists are aligned
+        # The original VPC had 3 subnet types. We need specific CIDRs for each: the configured
+        # lists, or CIDRs derived from vpc_cidr_block and the per-tier masks. The planner also
+        # validates the AZ counts, that every subnet is inside the VPC and that none overlap.
+        subnet_plan = SubnetPlanner.plan_region(self._cdk_custom_configs)
+        vpce_subnet_cidrs = subnet_plan['vpce1_subnet_cidrs']
+        nlb_subnet_cidrs = subnet_plan['nlb_subnet_cidrs']
+        vpclink_subnet_cidrs = subnet_plan['vpclink_subnet_cidrs']
         num_azs = len(az_ids)
-        if not (len(az_names) == num_azs and len(vpce_subnet_cidrs) == num_azs and
-                len(nlb_subnet_cidrs) == num_azs and len(vpclink_subnet_cidrs) == num_azs):
-            raise ValueError("Configuration error: The number of items in az_ids, azs, and all subnet CIDR lists must be identical.")
 
         # 2. Create the L1 CfnVPC resource
         cfn_vpc = ec2.CfnVPC(
@@ -101,16 +105,7 @@ class IDMZNetworkStack(core.Stack):
             enable_dns_support=True,
         )
 
-        # Apply original tagging logic to the L1 CfnVPC resource for the LZ Addon
-        Tags.of(cfn_vpc).add(
-            key="Name",
-            value=
-            f"sw-{self._cdk_custom_configs['workload']}-{self._cdk_custom_configs['appenvironment']}-vpc-{self._cdk_custom_configs['vpc_instance']}-{self._cdk_custom_configs['idmzregion']}-{self._cdk_custom_configs['lzenv']}-aws"
-        )
-        Tags.of(cfn_vpc).add("sw:application", self._cdk_custom_configs["workload"])
-        Tags.of(cfn_vpc).add("swift:flow-log-to-cloudwatch", "enable")
-        Tags.of(cfn_vpc).add("swift:flow-log-to-s3", "enable")
-        Tags.of(cfn_vpc).add("swift:cw-flow-log-traffic-type", "reject")
+        # The Name, sw:application and flow log tags for the LZ Addon are applied by StackTags
 
         # Apply Nag suppression directly to the L1 CfnVPC resource
         NagSuppressions.add_resource_suppressions(
@@ -125,7 +120,7 @@ class IDMZNetworkStack(core.Stack):
 
         # And convert them to L2 ISubnet objects to be passed to other stacks
         self.vpce_subnets, self.nlb_subnets, self.vpclink_subnets = [], [], []
-        az_route_table_ids = [] # Store route table IDs for each AZ
+        self.az_route_table_ids = az_route_table_ids = [] # Store route table IDs for each AZ
 
         for i in range(num_azs):
             az_id = az_ids[i]
@@ -204,13 +199,32 @@ class IDMZNetworkStack(core.Stack):
             isolated_subnet_route_table_ids=all_isolated_subnet_route_table_ids,
         )
 
-        # 5. Apply original tagging logic and Nag suppressions to the reconstructed VPC
-        # Tags are now on the L1 resource, which is what matters for deployment.
-        # A simple Name tag on the L2 object is fine for CDK-level identification.
-        Tags.of(idmz_vpc).add("Name", f"idmz-vpc-{self.region}")
+        # Tags are on the L1 resource, which is what matters for deployment. The Name tag of the
+        # reconstructed VPC (inherited by the interface endpoint) is applied by StackTags.
 
         return idmz_vpc
 
+    def _publish_network_parameters(self):
+        # Subnet and route table IDs are published as comma-separated lists in AZ order
+        network_values = {
+            'vpc-id': self.vpc.vpc_id,
+            'vpc-cidr-block': self.vpc.vpc_cidr_block,
+            'sg-vpce-id': self.sg_vpce.security_group_id,
+            'sg-nlb-id': self.sg_nlb.security_group_id,
+            'sg-vpclink-id': self.sg_vpclink.security_group_id,
+            'vpce-subnet-ids': core.Fn.join(",", [subnet.subnet_id for subnet in self.vpce_subnets]),
+            'nlb-subnet-ids': core.Fn.join(",", [subnet.subnet_id for subnet in self.nlb_subnets]),
+            'vpclink-subnet-ids': core.Fn.join(",", [subnet.subnet_id for subnet in self.vpclink_subnets]),
+            'route-table-ids': core.Fn.join(",", self.az_route_table_ids),
+        }
+        for name, value in network_values.items():
+            ssm.StringParameter(
+                self,
+                f"idmz-ssm-{name}",
+                parameter_name=Utility.network_ssm_parameter_name(name),
+                string_value=value,
+                description=f"iDMZ network {name} for {self.region}, consumed by the API Gateway stack")
+
     def _configure_nacl(self):
 
         #
@@ -270,11 +284,4 @@ class IDMZNetworkStack(core.Stack):
         security_group.add_ingress_rule(ec2.Peer.ipv4(vpc.vpc_cidr_block),
                                         ec2.Port.tcp(22))
 
-        Tags.of(security_group).add(
-            "Name",
-            f"sw-{self._cdk_custom_configs['workload']}-{self._cdk_custom_configs['appenvironment']}-{sg_resource_name}-{self._cdk_custom_configs['vpc_instance']}-{self._cdk_custom_configs['idmzregion']}-{self._cdk_custom_configs['lzenv']}-aws"
-        )
-        Tags.of(security_group).add("sw:application",
-                                    f"{self._cdk_custom_configs['workload']}")
-
         return security_group
\ No newline at end of file
@@ -1,21 +1,23 @@
 import aws_cdk as cdk
 
+from utils.config_validator import ConfigValidator
 from utils.utils import Utility
 
 
 class CustomSynthesizer:
 
     @staticmethod
-    def build_synthesizer(env_profile: str, target_region: str):
+    def build_synthesizer(env_profile: str, target_region: str, properties_file_path: str = None):
         """
         Build Custom CDK Synthesizer for a specific target region using an INI-style properties file.
 
         @param env_profile: The environment profile (e.g., "develop") to load properties for.
                            This determines the filename: "resources/application.{env_profile}.properties".
         @param target_region: The AWS region for which to build the synthesizer (e.g., "eu-central-1").
+        @param properties_file_path: Optional properties file overriding the path derived from env_profile.
         @return: aws_environment (cdk.Environment), cdk_synthesizer (cdk.DefaultStackSynthesizer)
         """
-        properties_file_path = f"resources/application.{env_profile}.properties"
+        properties_file_path = properties_file_path or f"resources/application.{env_profile}.properties"
         all_props = Utility.load_properties(properties_file_path)
 
         if not all_props:
@@ -37,18 +39,8 @@ class CustomSynthesizer:
         Utility.cdk_custom_configs = merged_config
 
         # Validate required keys for the synthesizer and AWS environment
-        required_keys_map = {
-            'stack_deploy_account': "Deployment account ID",
-            'stack_deploy_region': "Deployment AWS region",
-            'bootstrap_cloudformation_role_arn': "CloudFormation execution role ARN",
-            'bootstrap_deploy_role_arn': "Deployment action role ARN",
-            'bootstrap_file_asset_publishing_role_arn': "File asset publishing role ARN",
-            'bootstrap_lookup_role_arn': "Lookup role ARN",
-            'bootstrap_file_assets_bucket_name': "File assets S3 bucket name"
-        }
-
         missing_keys_details = []
-        for key, description in required_keys_map.items():
+        for key, description in ConfigValidator.SYNTHESIZER_KEYS.items():
             if not merged_config.get(key):
                 missing_keys_details.append(f"'{key}' ({description})")
         
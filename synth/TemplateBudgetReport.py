@@ -0,0 +1,124 @@
+import json
+import os
+from collections import Counter
+
+from utils.utils import Utility
+
+
+class TemplateBudgetReport:
+    # CloudFormation hard limits, used when no budget is configured in [cdk_settings]
+    # https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/cloudformation-limits.html
+    CLOUDFORMATION_LIMITS = {
+        'bytes': 1000000,  # template uploaded through the bootstrap S3 bucket
+        'resources': 500,
+        'outputs': 200,
+        'parameters': 200,
+    }
+
+    # Report key -> property name of the configured budget
+    BUDGET_KEYS = {
+        'bytes': 'template_budget_max_bytes',
+        'resources': 'template_budget_max_resources',
+        'outputs': 'template_budget_max_outputs',
+        'parameters': 'template_budget_max_parameters',
+    }
+
+    @staticmethod
+    def app_options(cdk_settings: dict) -> dict:
+        """
+        Build the cdk.App keyword arguments for the configured template size options.
+
+        With 'strip_template_metadata = True' the aws:cdk:path metadata, the CDKMetadata version
+        reporting resource and the additional construct metadata are left out of every template.
+        post_cli_context is used so that this also wins over the CDK CLI defaults.
+
+        @param cdk_settings: The [cdk_settings] section of the properties file.
+        @return: kwargs for cdk.App
+        """
+        if not Utility.get_bool(cdk_settings, 'strip_template_metadata', False):
+            return {}
+        return {
+            'analytics_reporting': False,
+            'post_cli_context': {
+                'aws:cdk:enable-path-metadata': False,
+                'aws:cdk:version-reporting': False,
+                '@aws-cdk/core:enableAdditionalMetadataCollection': False,
+            },
+        }
+
+    @staticmethod
+    def measure_template(template_path: str) -> dict:
+        """
+        Measure a synthesized template.
+
+        @param template_path: Path of the *.template.json file in the cloud assembly.
+        @return: bytes, resource count (total and by type), output and parameter counts and the
+                 number of bytes taken by metadata (resource Metadata and the CDKMetadata resource)
+        """
+        with open(template_path, "rt") as f:
+            raw = f.read()
+        template = json.loads(raw)
+        resources = template.get('Resources', {})
+
+        stripped = dict(template)
+        stripped.pop('Metadata', None)
+        stripped['Resources'] = {
+            logical_id: {k: v for k, v in resource.items() if k != 'Metadata'}
+            for logical_id, resource in resources.items()
+            if resource.get('Type') != 'AWS::CDK::Metadata'
+        }
+        # Compare like for like: the CDK writes templates with a one space indent
+        metadata_bytes = len(json.dumps(template, indent=1)) - len(json.dumps(stripped, indent=1))
+
+        return {
+            'bytes': len(raw.encode('utf-8')),
+            'resources': len(resources),
+            'resources_by_type': dict(Counter(r.get('Type') for r in resources.values()).most_common()),
+            'outputs': len(template.get('Outputs', {})),
+            'parameters': len(template.get('Parameters', {})),
+            'metadata_bytes': max(metadata_bytes, 0),
+        }
+
+    @staticmethod
+    def build_report(cloud_assembly, cdk_settings: dict):
+        """
+        Build the budget report for every stack of a synthesized cloud assembly.
+
+        @param cloud_assembly: The cx_api.CloudAssembly returned by app.synth().
+        @param cdk_settings: The [cdk_settings] section of the properties file.
+        @return: (report dict keyed by stack name, list of budget violation messages)
+        """
+        budgets = {
+            key: int(cdk_settings.get(config_key) or TemplateBudgetReport.CLOUDFORMATION_LIMITS[key])
+            for key, config_key in TemplateBudgetReport.BUDGET_KEYS.items()
+        }
+
+        report, violations = {}, []
+        for stack in cloud_assembly.stacks:
+            measurements = TemplateBudgetReport.measure_template(stack.template_full_path)
+            measurements['budgets'] = budgets
+            report[stack.stack_name] = measurements
+            for key, budget in budgets.items():
+                if measurements[key] > budget:
+                    violations.append(
+                        f"{stack.stack_name}: {key} {measurements[key]} exceeds budget {budget} "
+                        f"('{TemplateBudgetReport.BUDGET_KEYS[key]}')")
+        return report, violations
+
+    @staticmethod
+    def write_report(cloud_assembly, report: dict) -> str:
+        """
+        Print a one-line summary per stack and write the full report next to the templates.
+
+        @return: Path of the JSON report
+        """
+        for stack_name, m in report.items():
+            print(f"Template budget {stack_name}: {m['bytes']}/{m['budgets']['bytes']} bytes, "
+                  f"{m['resources']}/{m['budgets']['resources']} resources, "
+                  f"{m['outputs']} outputs, {m['parameters']} parameters, "
+                  f"{m['metadata_bytes']} bytes of metadata")
+
+        report_path = os.path.join(cloud_assembly.directory, "template-budget-report.json")
+        with open(report_path, "wt") as f:
+            json.dump(report, f, indent=2)
+        return report_path
@@ -0,0 +1,202 @@
+"""Synth scaling benchmark across regions, AZs and routes.
+
+Generates synthetic properties files over a grid of sizes (number of target_regions, az_ids per
+region and entries in routes), synthesizes the app in-process for each point and records wall time,
+peak RSS of the Python process and of the JSII node kernel, and the template sizes. Every grid point
+runs in a freshly spawned interpreter so that peak RSS is not carried over between points.
+
+The result is a JSON scaling curve plus a log-log growth exponent per dimension; an exponent well
+above 1 means that synth time or template size grows super-linearly with that dimension.
+
+Usage (from the repository root):
+
+    python -m tests.benchmark.synth_scaling --regions 1,2,4 --azs 2,3 --routes 0,50,200 --output synth_scaling.json
+"""
+import argparse
+import configparser
+import contextlib
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BASE_PROFILE = os.path.join(REPO_ROOT, "resources", "application.develop.properties")
+
+BENCHMARK_REGIONS = [
+    "eu-central-1", "us-east-1", "eu-west-1", "us-west-2", "ap-southeast-1", "ap-northeast-1",
+    "eu-west-2", "us-east-2", "ca-central-1", "ap-south-1", "sa-east-1", "eu-north-1",
+]
+TIERS = ["vpce1_subnet_cidrs", "nlb_subnet_cidrs", "vpclink_subnet_cidrs"]
+
+
+def generate_properties(num_regions: int, num_azs: int, num_routes: int, path: str) -> str:
+    """Write a synthetic properties file derived from the develop profile."""
+    if num_regions > len(BENCHMARK_REGIONS):
+        raise ValueError(f"At most {len(BENCHMARK_REGIONS)} regions are supported")
+    if not 1 <= num_azs <= 6:
+        raise ValueError("Between 1 and 6 AZs are supported")
+
+    base = configparser.ConfigParser(inline_comment_prefixes=(';', '#'))
+    base.optionxform = str
+    base.read(BASE_PROFILE)
+    template_region = base.sections()[1]
+
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    regions = BENCHMARK_REGIONS[:num_regions]
+    config['cdk_settings'] = dict(base['cdk_settings'])
+    config['cdk_settings']['target_regions'] = ", ".join(regions)
+    # Distinct top-level paths, so that the route compiler cannot merge them
+    config['cdk_settings']['routes'] = json.dumps([f"/svc{i}/op" for i in range(num_routes)])
+
+    for index, region in enumerate(regions):
+        section = dict(base[template_region])
+        section.update({
+            'stack_deploy_region': region,
+            'idmzregion': region,
+            'vpc_cidr_block': f"10.{index}.0.0/16",
+            'azs': ",".join(f"{region}{chr(ord('a') + az)}" for az in range(num_azs)),
+            'az_ids': ",".join(f"bench{index}-az{az + 1}" for az in range(num_azs)),
+            'vpce_service_name': f"com.amazonaws.vpce.{region}.vpce-svc-0123456789abcdef0",
+        })
+        for tier_index, tier in enumerate(TIERS):
+            section[tier] = ",".join(f"10.{index}.{tier_index * 16 + az}.0/24" for az in range(num_azs))
+        config[region] = section
+
+    with open(path, "wt") as f:
+        config.write(f)
+    return path
+
+
+def _node_children_peak_rss_kb():
+    """Peak RSS (VmHWM) of node processes started by this interpreter, i.e. the JSII kernel."""
+    peak = 0
+    for pid in filter(str.isdigit, os.listdir("/proc") if os.path.isdir("/proc") else []):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                stat = f.read()
+            # The command name is in parentheses and may contain spaces
+            comm = stat[stat.index("(") + 1:stat.rindex(")")]
+            ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+            if ppid != os.getpid() or "node" not in comm:
+                continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = max(peak, int(line.split()[1]))
+        except (OSError, ValueError):
+            continue
+    return peak or None
+
+
+def _synth_point(properties_path: str, outdir: str, conn):
+    """Runs in a spawned interpreter: synthesize the app once and report measurements."""
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION", "1")
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            from app import build_app
+            from synth.TemplateBudgetReport import TemplateBudgetReport
+            imported = time.perf_counter()
+            app, _ = build_app("benchmark", properties_path, outdir)
+            built = time.perf_counter()
+            cloud_assembly = app.synth()
+        synthesized = time.perf_counter()
+
+        templates = {
+            stack.stack_name: TemplateBudgetReport.measure_template(stack.template_full_path)
+            for stack in cloud_assembly.stacks
+        }
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        conn.send({
+            "import_seconds": round(imported - start, 3),
+            "construct_seconds": round(built - imported, 3),
+            "synth_seconds": round(synthesized - built, 3),
+            "wall_seconds": round(synthesized - imported, 3),
+            # ru_maxrss is in KiB on Linux and bytes on macOS
+            "python_peak_rss_kb": peak_rss // 1024 if sys.platform == "darwin" else peak_rss,
+            "node_peak_rss_kb": _node_children_peak_rss_kb(),
+            "template_bytes": sum(t["bytes"] for t in templates.values()),
+            "resources": sum(t["resources"] for t in templates.values()),
+            "templates": {name: {"bytes": t["bytes"], "resources": t["resources"]} for name, t in templates.items()},
+        })
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_point(num_regions: int, num_azs: int, num_routes: int, workdir: str) -> dict:
+    name = f"r{num_regions}-a{num_azs}-n{num_routes}"
+    properties_path = generate_properties(num_regions, num_azs, num_routes,
+                                          os.path.join(workdir, f"application.{name}.properties"))
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_synth_point,
+                              args=(properties_path, os.path.join(workdir, f"cdk.out.{name}"), child_conn))
+    process.start()
+    child_conn.close()
+    result = parent_conn.recv()
+    process.join()
+    return {"regions": num_regions, "azs": num_azs, "routes": num_routes, **result}
+
+
+def growth_exponents(points: list, metrics=("wall_seconds", "template_bytes")) -> dict:
+    """Log-log slope of each metric along each dimension, with the other dimensions at their minimum."""
+    exponents = {}
+    valid = [p for p in points if "error" not in p]
+    for dimension in ("regions", "azs", "routes"):
+        others = [d for d in ("regions", "azs", "routes") if d != dimension]
+        baseline = {d: min(p[d] for p in valid) for d in others} if valid else {}
+        axis = sorted((p for p in valid if all(p[d] == baseline[d] for d in others) and p[dimension] > 0),
+                      key=lambda p: p[dimension])
+        if len(axis) < 2 or axis[0][dimension] == axis[-1][dimension]:
+            continue
+        first, last = axis[0], axis[-1]
+        exponents[dimension] = {
+            metric: round(math.log(last[metric] / first[metric]) / math.log(last[dimension] / first[dimension]), 2)
+            for metric in metrics if first[metric] and last[metric]
+        }
+    return exponents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--regions", default="1,2,4", help="Comma-separated numbers of target regions")
+    parser.add_argument("--azs", default="2,3", help="Comma-separated numbers of AZs per region")
+    parser.add_argument("--routes", default="0,50,200", help="Comma-separated numbers of routes")
+    parser.add_argument("--output", help="Write the JSON result to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    grid = itertools.product(*(sorted(int(v) for v in getattr(args, axis).split(","))
+                               for axis in ("regions", "azs", "routes")))
+    points = []
+    with tempfile.TemporaryDirectory(prefix="synth-scaling-") as workdir:
+        for num_regions, num_azs, num_routes in grid:
+            point = run_point(num_regions, num_azs, num_routes, workdir)
+            print(f"regions={num_regions} azs={num_azs} routes={num_routes}: "
+                  + (point["error"] if "error" in point else
+                     f"{point['wall_seconds']}s, python {point['python_peak_rss_kb']} KiB, "
+                     f"node {point['node_peak_rss_kb']} KiB, {point['template_bytes']} template bytes"),
+                  file=sys.stderr)
+            points.append(point)
+
+    result = {"points": points, "growth_exponents": growth_exponents(points)}
+    if args.output:
+        with open(args.output, "wt") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import gzip
+import json
+
+from tools.access_log_analyzer import AccessLogAnalyzer, main
+from tools.latency_histogram import LatencyHistogram
+
+
+def test_histogram_quantiles_within_accuracy():
+    histogram = LatencyHistogram(0.01)
+    for value in range(1, 1001):
+        histogram.record(value)
+    assert abs(histogram.quantile(0.5) - 500) / 500 <= 0.02
+    assert abs(histogram.quantile(0.99) - 990) / 990 <= 0.02
+    assert histogram.quantile(1) == 1000
+
+
+def test_histogram_merge_matches_single_histogram():
+    a, b, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in range(1, 500):
+        a.record(value)
+        combined.record(value)
+    for value in range(500, 1000):
+        b.record(value)
+        combined.record(value)
+    merged = LatencyHistogram.from_dict(a.to_dict()).merge(b)
+    assert merged.count == combined.count
+    assert merged.quantile(0.9) == combined.quantile(0.9)
+
+
+def test_analyzer_reads_gzip_export(tmp_path, capsys):
+    path = tmp_path / "export.gz"
+    with gzip.open(path, "wt") as f:
+        for i in range(100):
+            record = {"routeKey": "ANY /a" if i % 2 else "GET /idmzhealth", "ip": "10.0.0.1",
+                      "region": "eu-central-1", "clientcert.subjectDN": "CN=client",
+                      "responseLatency": str(i + 1)}
+            f.write(f"2025-01-01T00:00:00.000Z {json.dumps(record)}\n")
+        f.write(json.dumps({"routeKey": "ANY /a", "responseLatency": "-"}) + "\n")
+
+    analyzer = AccessLogAnalyzer()
+    analyzer.add_file(str(path))
+    report = analyzer.report()
+    assert report["records"] == 101
+    assert report["skipped"] == 1
+    assert report["route"]["ANY /a"]["count"] == 50
+    assert report["region"]["eu-central-1"]["count"] == 100
+
+    main(["--format", "json", "--by", "region", str(path)])
+    assert json.loads(capsys.readouterr().out)["overall"]["count"] == 100
+
+
+def test_analyzer_caps_the_keys_per_dimension():
+    analyzer = AccessLogAnalyzer(dimensions=["ip", "region"], max_keys=3)
+    for i in range(200):
+        # One heavy hitter among 100 addresses seen once
+        ip = "10.0.0.1" if i % 2 else f"10.1.0.{i}"
+        analyzer.add({"ip": ip, "region": "eu-central-1", "responseLatency": "10"})
+
+    report = analyzer.report(top=0)
+    assert len(analyzer.groups["ip"]) == 3
+    assert report["ip"]["10.0.0.1"]["count"] == 100
+    assert report["evicted"] == {"ip": 98}
+    # The records of evicted keys are kept in (other)
+    assert sum(summary["count"] for summary in report["ip"].values()) == 200
+    assert report["region"]["eu-central-1"]["count"] == 200
@@ -0,0 +1,114 @@
+import base64
+import gzip
+import importlib.util
+import json
+import os
+import sys
+
+import aws_cdk.assertions as assertions
+import pytest
+
+from app import build_app
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TRANSFORM_DIR = os.path.join(REPO_ROOT, "apigw_vpce_helpers", "custom_resource", "access_log_transform")
+sys.path.insert(0, TRANSFORM_DIR)
+
+import access_log_schema  # noqa: E402
+
+# Loaded under its own name, the other Lambda functions also have a handler.py
+_spec = importlib.util.spec_from_file_location("access_log_transform_handler",
+                                               os.path.join(TRANSFORM_DIR, "handler.py"))
+handler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(handler)
+
+ACCESS_LOG = {
+    "requestId": "abc=", "ip": "35.189.89.201", "requestTime": "19/Oct/2026:23:59:58 -0100",
+    "httpMethod": "GET", "path": "/orders/1", "routeKey": "GET /orders/{id}", "status": "200",
+    "protocol": "HTTP/1.1", "responseLength": "42", "authorizerError": "-", "apigwError": "-",
+    "clientcert.subjectDN": "CN=client", "clientcert.issuerDN": "CN=ca", "clientcert.serialNumber": "01",
+    "integrationError": "-", "integrationStatus": "200", "integrationErrorMessage": "-",
+    "responseLatency": "35", "integrationLatency": "30", "authorizerLatency": "-", "authorizerStatus": "-",
+    "region": "eu-central-1",
+}
+
+
+def _firehose_record(record_id, envelope):
+    return {"recordId": record_id, "data": base64.b64encode(gzip.compress(json.dumps(envelope).encode())).decode()}
+
+
+def test_normalize_types_columns_and_partitions_by_utc_request_time():
+    row = access_log_schema.normalize(ACCESS_LOG)
+
+    assert list(row) == [column for column, _, _ in access_log_schema.COLUMNS]
+    assert row["status"] == 200 and row["response_length"] == 42 and row["response_latency"] == 35
+    assert row["authorizer_latency"] is None and row["apigw_error"] is None
+    assert row["client_subject_dn"] == "CN=client"
+    # 23:59:58 at UTC-1 is 00:59:58 UTC on the next day
+    assert row["request_time"] == 1792457998000
+    assert access_log_schema.partition(row, "eu-central-1") == ("eu-central-1", "2026-10-20", "00")
+    assert access_log_schema.partition(access_log_schema.normalize({}), "eu-central-1") is None
+
+
+def test_firehose_transform_unpacks_envelopes_into_rows():
+    data_message = {"messageType": "DATA_MESSAGE", "logEvents": [
+        {"id": "1", "timestamp": 0, "message": json.dumps(ACCESS_LOG)},
+        {"id": "2", "timestamp": 0, "message": "not an access log record"},
+        {"id": "3", "timestamp": 0, "message": json.dumps({**ACCESS_LOG, "status": "403"})},
+    ]}
+    event = {"records": [
+        _firehose_record("data", data_message),
+        _firehose_record("control", {"messageType": "CONTROL_MESSAGE", "logEvents": []}),
+        {"recordId": "garbage", "data": base64.b64encode(b"plain").decode()},
+    ]}
+
+    data, control, garbage = handler.lambda_handler(event, None)["records"]
+
+    assert data["recordId"] == "data" and data["result"] == "Ok"
+    rows = [json.loads(line) for line in base64.b64decode(data["data"]).decode().splitlines()]
+    assert [row["status"] for row in rows] == [200, 403]
+    assert control["result"] == "Dropped"
+    assert garbage["result"] == "ProcessingFailed" and base64.b64decode(garbage["data"]) == b"plain"
+
+
+def test_api_stack_archives_access_logs_as_parquet(tmp_path):
+    properties = tmp_path / "application.archive.properties"
+    with open(os.path.join(REPO_ROOT, "resources", "application.develop.properties")) as f:
+        properties.write_text(f.read().replace("access_log_archive_enabled = False", "access_log_archive_enabled = True"))
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop", properties_file_path=str(properties))
+    finally:
+        os.chdir(cwd)
+    stack = next(child for child in app.node.children if child.node.id.startswith("iDMZ-APIGateway-HTTP-API"))
+    template = assertions.Template.from_stack(stack)
+
+    template.resource_count_is("AWS::Logs::SubscriptionFilter", 1)
+    template.has_resource_properties("AWS::KinesisFirehose::DeliveryStream", {
+        "ExtendedS3DestinationConfiguration": assertions.Match.object_like({
+            "Prefix": f"region={stack.region}/date=!{{timestamp:yyyy-MM-dd}}/hour=!{{timestamp:HH}}/",
+            "DataFormatConversionConfiguration": assertions.Match.object_like({
+                "Enabled": True,
+                "OutputFormatConfiguration": {"Serializer": {"ParquetSerDe": {"Compression": "SNAPPY"}}},
+            }),
+        }),
+    })
+    table = template.find_resources("AWS::Glue::Table")
+    columns = next(iter(table.values()))["Properties"]["TableInput"]["StorageDescriptor"]["Columns"]
+    assert [column["Name"] for column in columns] == [column for column, _, _ in access_log_schema.COLUMNS]
+
+
+def test_parquet_converter_writes_the_archive_layout(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from tools.access_log_parquet import main
+
+    logs = tmp_path / "logs.ndjson"
+    logs.write_text("\n".join(json.dumps({**ACCESS_LOG, "requestId": str(i)}) for i in range(3)) + "\n")
+    main(["--output", str(tmp_path / "archive"), "--rows-per-file", "2", str(logs)])
+
+    partition = tmp_path / "archive" / "region=eu-central-1" / "date=2026-10-20" / "hour=00"
+    assert sorted(os.listdir(partition)) == ["part-00000.parquet", "part-00001.parquet"]
+    table = pq.read_table(str(partition / "part-00000.parquet"))
+    assert table.column_names == [column for column, _, _ in access_log_schema.COLUMNS]
+    assert table.num_rows == 2
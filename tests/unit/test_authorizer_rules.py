@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "apigw_vpce_helpers", "custom_resource",
+                                "authorizer_lambda"))
+
+import authorizer_rules  # noqa: E402
+
+BUILTIN = authorizer_rules.RuleSnapshot(frozenset({"CN=Issuer"}), frozenset({"CN=Client"}),
+                                        frozenset({"10.0.0.1"}), frozenset(), "builtin")
+
+
+class StubParameterStore:
+    """Local stand-in for the SSM client: get_parameter on an in-memory parameter."""
+
+    def __init__(self, value):
+        self.value, self.version, self.available = value, 1, True
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def put(self, value):
+        self.value, self.version = value, self.version + 1
+
+    def get_parameter(self, Name):
+        self.calls += 1
+        self.release.wait(5)
+        if not self.available:
+            raise ConnectionError("SSM unavailable")
+        return {"Parameter": {"Name": Name, "Value": self.value, "Version": self.version}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store():
+    ssm = StubParameterStore(json.dumps({"sourceIpList": ["10.0.0.2"]}))
+    clock = FakeClock()
+    rule_store = authorizer_rules.RuleStore(authorizer_rules.SsmRuleSource(ssm, "/rules"), BUILTIN, 60, clock)
+    rule_store.refresh()
+    return rule_store, ssm, clock
+
+
+def _wait_for_refresh(rule_store):
+    # The background refresh holds the lock while it runs
+    assert rule_store._refresh_lock.acquire(timeout=5)
+    rule_store._refresh_lock.release()
+
+
+def test_document_overrides_only_the_lists_it_contains(store):
+    rule_store, _, _ = store
+
+    assert rule_store.current().source_ips == {"10.0.0.2"}
+    assert rule_store.current().issuers == {"CN=Issuer"}
+    assert rule_store.current().version == 1
+
+
+def test_stale_snapshot_is_served_while_refreshing_in_background(store):
+    rule_store, ssm, clock = store
+    ssm.put(json.dumps({"sourceIpList": ["10.0.0.3"]}))
+    ssm.release.clear()
+
+    clock.now = 61
+    # The source blocks, yet the request is answered from the current snapshot
+    assert rule_store.current().source_ips == {"10.0.0.2"}
+    assert rule_store.current().source_ips == {"10.0.0.2"}
+    ssm.release.set()
+    _wait_for_refresh(rule_store)
+
+    assert rule_store.current().source_ips == {"10.0.0.3"}
+    assert ssm.calls == 2
+
+
+def test_last_good_snapshot_is_kept_when_source_fails(store):
+    rule_store, ssm, clock = store
+    ssm.available = False
+    clock.now = 61
+    rule_store.current()
+    _wait_for_refresh(rule_store)
+    assert isinstance(rule_store.last_error, ConnectionError)
+
+    ssm.available = True
+    ssm.put("not json")
+    assert rule_store.refresh() is False
+    assert rule_store.current().source_ips == {"10.0.0.2"}
+
+
+def test_refresh_is_retried_when_the_thread_cannot_start(store, monkeypatch):
+    rule_store, ssm, clock = store
+    ssm.put(json.dumps({"sourceIpList": ["10.0.0.4"]}))
+    clock.now = 61
+
+    def fail_start(thread):
+        raise RuntimeError("can't start new thread")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(threading.Thread, "start", fail_start)
+        assert rule_store.current().source_ips == {"10.0.0.2"}
+
+    # The lock was released, so the next stale read starts the refresh
+    rule_store.current()
+    _wait_for_refresh(rule_store)
+    assert rule_store.current().source_ips == {"10.0.0.4"}
@@ -0,0 +1,110 @@
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+AUTHORIZER_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "apigw_vpce_helpers", "custom_resource",
+                              "authorizer_lambda")
+AUTHORIZER = os.path.join(AUTHORIZER_DIR, "api-gateway-lambda-http-authorizer-simple.py")
+METRICS_LAYER_DIR = os.path.join(AUTHORIZER_DIR, "..", "metrics_layer", "python")
+
+
+def _client_cert_pem(common_name):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                   .serial_number(1).not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+                   .sign(key, hashes.SHA256()))
+    return certificate.public_bytes(serialization.Encoding.PEM).decode(), certificate
+
+
+def _load_authorizer(monkeypatch, pins):
+    monkeypatch.setenv("CERT_PINNING", "True")
+    monkeypatch.setenv("PINNED_CERT_SHA256", ",".join(pins))
+    monkeypatch.setenv("FINGERPRINT_MEMO_SIZE", "2")
+    # The handler imports its sibling modules and the metrics layer like in the Lambda package
+    monkeypatch.syspath_prepend(METRICS_LAYER_DIR)
+    monkeypatch.syspath_prepend(AUTHORIZER_DIR)
+    spec = importlib.util.spec_from_file_location("authorizer_simple", AUTHORIZER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _event(pem, source_ip="35.189.89.201"):
+    return {"requestContext": {"authentication": {"clientCert": {"clientCertPem": pem, "issuerDN": "CN=x",
+                                                                 "subjectDN": "CN=x"}},
+                               "http": {"sourceIp": source_ip}}}
+
+
+def test_pinned_certificate_is_authorized_and_hashed_once(monkeypatch):
+    pinned_pem, pinned = _client_cert_pem("pinned")
+    other_pem, _ = _client_cert_pem("other")
+    fingerprint = hashlib.sha256(pinned.public_bytes(serialization.Encoding.DER)).hexdigest()
+    authorizer = _load_authorizer(monkeypatch, [fingerprint])
+
+    response = authorizer.lambda_handler(_event(pinned_pem), None)
+    assert response["isAuthorized"] is True
+    assert response["context"]["rule"] == "pin:" + fingerprint[:16]
+    assert authorizer.lambda_handler(_event(other_pem), None) == {"isAuthorized": False}
+    assert authorizer.lambda_handler(_event(pinned_pem, "10.0.0.1"), None) == {"isAuthorized": False}
+
+    hashed = []
+    monkeypatch.setattr(authorizer.hashlib, "sha256", lambda der: hashed.append(der) or hashlib.sha256(der))
+    authorizer.lambda_handler(_event(pinned_pem), None)
+    assert hashed == []
+
+
+def test_fingerprint_memo_is_bounded(monkeypatch):
+    authorizer = _load_authorizer(monkeypatch, [])
+
+    pems = [_client_cert_pem(f"client-{i}")[0] for i in range(3)]
+    for pem in pems:
+        authorizer.cert_fingerprint(pem)
+
+    assert list(authorizer.fingerprint_memo) == pems[1:]
+
+
+def test_authorized_response_carries_client_identity_context(monkeypatch):
+    authorizer = _load_authorizer(monkeypatch, [])
+    monkeypatch.setattr(authorizer, "CERT_PINNING", False)
+    event = _event("unused")
+    event["requestContext"]["authentication"]["clientCert"].update({
+        "issuerDN": "C=BE,O=GlobalSign nv-sa,CN=GlobalSign RSA OV SSL CA 2018",
+        "subjectDN": "C=BE,ST=Brabant Wallon,L=La Hulpe,O=SWIFT,CN=Sandbox-Dev.swift.com",
+        "serialNumber": "0A:1B:2C",
+    })
+    monkeypatch.setattr(authorizer, "BUILTIN_RULES", authorizer.BUILTIN_RULES._replace(
+        subjects=frozenset({event["requestContext"]["authentication"]["clientCert"]["subjectDN"]})))
+
+    response = authorizer.lambda_handler(event, None)
+
+    assert response == {"isAuthorized": True,
+                        "context": {"cn": "sandbox-dev.swift.com", "serial": "0a1b2c", "tenant": "swift", "rule": "dn"}}
+
+
+def test_each_invocation_flushes_decision_metrics_once(monkeypatch, capsys):
+    pinned_pem, pinned = _client_cert_pem("pinned")
+    authorizer = _load_authorizer(monkeypatch, [hashlib.sha256(pinned.public_bytes(serialization.Encoding.DER)).hexdigest()])
+    capsys.readouterr()
+
+    authorizer.lambda_handler(_event(pinned_pem), None)
+    authorizer.lambda_handler(_event(pinned_pem, "10.0.0.1"), None)
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    decisions = [(r["Reason"], r["Decision"]) for r in records if "Decision" in r]
+    assert decisions == [("allowed", 1), ("source_ip_denied", 1)]
+    assert [r["CacheHit"] for r in records if r.get("Cache") == "fingerprint"] == [0, 1]
+    base = [r for r in records if "ColdStart" in r]
+    assert [r["ColdStart"] for r in base] == [1, 0]
+    assert "InitDuration" in base[0] and "InitDuration" not in base[1]
+    assert base[0]["RuleEvaluationTime"] >= 0
+    assert base[0]["RulesVersion"] == "builtin"
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from tools.capacity_planner import DEFAULT_MODEL, authorizer_durations, main, plan_profile, plan_region
+
+REGION = {
+    'azs': 'eu-central-1a,eu-central-1b',
+    'stage_throttling_rate_limit': '1000',
+    'stage_throttling_burst_limit': '2000',
+    'alarm_api_latency_p99_ms': '3000',
+    'routes': '[{"method": "POST", "path": "/payments", "rate_limit": 100, "burst_limit": 50}]',
+}
+
+
+def _statuses(plan):
+    return {check['check']: check['status'] for check in plan['checks']}
+
+
+def test_sizes_the_ingress_path_of_a_region():
+    model = {**DEFAULT_MODEL, 'rps': 500, 'headroom': 1.0, 'identities': 3000, 'authorizer_p99_ms': 200,
+             'request_bytes': 1000, 'response_bytes': 4000, 'route_shares': {'POST /payments': 0.1}}
+
+    plan = plan_region('eu-central-1', REGION, model)
+
+    # 3000 identities over a 300 s cache TTL: 10 invocations/s of 200 ms
+    assert plan['authorizer']['invocations_per_s'] == 10 and plan['authorizer']['concurrency'] == 2
+    assert plan['apigw']['stage_headroom'] == 2.0
+    # 2.5 MB/s is 9 GB/h: processed bytes dominate 500 new connections/s (0.625 LCU)
+    assert plan['nlb']['listener'] == 'tcp' and plan['nlb']['lcu_dimension'] == 'processed_bytes'
+    assert plan['nlb']['lcus'] == 9.0
+    assert plan['vpce']['gbps'] == 0.02 and plan['vpce']['per_az_gbps'] == 0.01
+    assert plan['expected_p99_ms'] == 430 and not plan['flagged']
+    assert set(_statuses(plan).values()) == {'ok'}
+
+
+@pytest.mark.parametrize("region_overrides, model_overrides, check", [
+    ({'azs': 'eu-central-1a'}, {}, 'az_count'),
+    ({}, {'rps': 2000}, 'stage_throttle'),
+    ({}, {'route_shares': {'POST /payments': 0.5}}, 'route_throttle'),
+    ({}, {'response_bytes': 10 ** 8}, 'vpce_bandwidth_az_lost'),
+    ({}, {'identities': 10 ** 7, 'authorizer_p99_ms': 3000}, 'lambda_concurrency'),
+    ({'nlb_tls_certificate_arn': 'arn:aws:acm:eu-central-1:111111111111:certificate/x'},
+     {'backend_p99_ms': 5000}, 'latency'),
+])
+def test_flags_regions_that_cannot_sustain_the_target(region_overrides, model_overrides, check):
+    model = {**DEFAULT_MODEL, 'rps': 500, 'headroom': 1.0, **model_overrides}
+
+    plan = plan_region('eu-central-1', {**REGION, **region_overrides}, model)
+
+    assert plan['flagged'] and _statuses(plan)[check] == 'fail'
+
+
+def test_measured_authorizer_duration_per_region(tmp_path, capsys):
+    report = {'metric': 'authorizerLatency', 'overall': {'count': 10, 'p99': 120.0},
+              'region': {'us-east-1': {'count': 4, 'p99': 900.0}}}
+    durations = authorizer_durations(report)
+    all_props = {'cdk_settings': {'target_regions': 'eu-central-1, us-east-1', **REGION},
+                 'us-east-1': {'azs': 'us-east-1a,us-east-1b'}}
+
+    plans = plan_profile(all_props, {**DEFAULT_MODEL, 'identities': 30000}, durations)
+
+    assert plans['eu-central-1']['authorizer']['concurrency'] == 12
+    assert plans['us-east-1']['authorizer']['concurrency'] == 90
+
+    (tmp_path / "report.json").write_text(json.dumps(report))
+    with pytest.raises(SystemExit) as exit_info:
+        main(["--rps", "eu-central-1=5000", "--rps", "us-east-1=10", "--format", "json",
+              "--authorizer-report", str(tmp_path / "report.json")])
+    assert exit_info.value.code == 1
+    plans = json.loads(capsys.readouterr().out)
+    assert plans['eu-central-1']['flagged'] and not plans['us-east-1']['flagged']
+
+
+def test_region_rps_overrides_keep_the_global_value_as_fallback(capsys):
+    with pytest.raises(SystemExit):
+        main(["--rps", "800", "--rps", "us-east-1=1500", "--format", "json"])
+    plans = json.loads(capsys.readouterr().out)
+    assert plans['eu-central-1']['target_rps'] == 800 and plans['us-east-1']['target_rps'] == 1500
+
+    main(["--rps", "0", "--format", "json"])
+    plans = json.loads(capsys.readouterr().out)
+    assert plans['eu-central-1']['apigw']['stage_headroom'] is None and not plans['eu-central-1']['flagged']
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tools.validate_config import main
+from utils.config_validator import ConfigValidator
+from utils.utils import Utility
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _profile():
+    return Utility.load_properties(os.path.join(REPO_ROOT, "resources/application.develop.properties"))
+
+
+def test_develop_profile_is_valid_without_loading_jsii():
+    script = ("import sys; from tools.validate_config import main; main(['develop']); "
+              "assert not [m for m in sys.modules if m.split('.')[0] in ('aws_cdk', 'jsii', 'constructs')]")
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "application.develop.properties: OK" in result.stdout
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({'decouple_network_stack': '__import__("os")'}, "'decouple_network_stack' must be True or False"),
+    ({'nw_preserve_client_ip': ''}, "'nw_preserve_client_ip' is required"),
+    ({'stack_deploy_region': 'us-east-1'}, "'stack_deploy_region' is 'us-east-1' but must match"),
+    ({'azs': 'eu-central-1a,us-east-1b'}, "AZs of another region: us-east-1b"),
+    ({'az_ids': 'euc1-az2'}, "'azs' has 2 entries but 'az_ids' has 1"),
+    ({'routes': '[{"method": "GET"'}, "'routes' is not valid JSON"),
+    ({'vpce_service_name': ''}, "'vpce_service_name'"),
+    ({'r53_failover_region': 'eu-west-1'}, "'r53_failover_region' 'eu-west-1' is not one of the target_regions"),
+    ({'r53_health_check_type': 'HTTPS'}, "'r53_health_check_type' must be TCP or CALCULATED"),
+    ({'nlb_access_logs_enabled': 'True'}, "'nlb_access_logs_enabled' is True but 'nlb_tls_certificate_arn' is not set"),
+])
+def test_reports_errors_per_region(overrides, message):
+    all_props = _profile()
+    all_props['eu-central-1'].update(overrides)
+
+    errors = ConfigValidator.validate_profile(all_props)
+
+    assert any(message in error for error in errors if error.startswith("[eu-central-1] ")), errors
+
+
+def test_get_bool_rejects_anything_but_true_and_false():
+    assert Utility.get_bool({'flag': ' "true" '}, 'flag') is True
+    assert Utility.get_bool({'flag': ''}, 'flag', default=True) is True
+    with pytest.raises(ValueError, match="must be True or False"):
+        Utility.get_bool({'flag': '1'}, 'flag', default=False)
+
+
+def test_main_exits_non_zero_on_errors(tmp_path, capsys):
+    path = tmp_path / "application.broken.properties"
+    path.write_text("[cdk_settings]\ntarget_regions =\n")
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(["--file", str(path)])
+
+    assert exit_info.value.code == 1
+    assert "'target_regions' is empty" in capsys.readouterr().out
@@ -0,0 +1,79 @@
+import json
+
+from tools.deploy_critical_path import analyze, main, template_dependencies
+
+STACK = "iDMZ-APIGateway-HTTP-API-eu-central-1"
+
+TEMPLATE = {"Resources": {
+    "Vpc": {"Type": "AWS::EC2::VPC"},
+    "Role": {"Type": "AWS::IAM::Role"},
+    "Endpoint": {"Type": "AWS::EC2::VPCEndpoint", "Properties": {"VpcId": {"Ref": "Vpc"}}},
+    "EniIps": {"Type": "Custom::AWS", "Properties": {
+        "Create": {"Fn::Sub": "${Endpoint}"}, "Role": {"Fn::GetAtt": ["Role", "Arn"]}}},
+    "Nlb": {"Type": "AWS::ElasticLoadBalancingV2::LoadBalancer", "DependsOn": "EniIps"},
+}}
+
+
+def _event(second, logical_id, resource_type, status, reason=None):
+    event = {"StackName": STACK, "LogicalResourceId": logical_id, "ResourceType": resource_type,
+             "ResourceStatus": status, "Timestamp": f"2026-10-19T10:{second // 60:02d}:{second % 60:02d}.000Z"}
+    if reason:
+        event["ResourceStatusReason"] = reason
+    return event
+
+
+def _events():
+    stack = "AWS::CloudFormation::Stack"
+    events = [
+        # An earlier, unrelated operation
+        _event(0, STACK, stack, "UPDATE_IN_PROGRESS", "User Initiated"),
+        _event(1, "Nlb", "AWS::ElasticLoadBalancingV2::LoadBalancer", "UPDATE_IN_PROGRESS"),
+        _event(2, "Nlb", "AWS::ElasticLoadBalancingV2::LoadBalancer", "UPDATE_COMPLETE"),
+        _event(3, STACK, stack, "UPDATE_COMPLETE"),
+        _event(100, STACK, stack, "CREATE_IN_PROGRESS", "User Initiated"),
+        _event(101, "Vpc", "AWS::EC2::VPC", "CREATE_IN_PROGRESS"),
+        _event(101, "Role", "AWS::IAM::Role", "CREATE_IN_PROGRESS"),
+        _event(112, "Vpc", "AWS::EC2::VPC", "CREATE_COMPLETE"),
+        _event(115, "Endpoint", "AWS::EC2::VPCEndpoint", "CREATE_IN_PROGRESS"),
+        _event(118, "Role", "AWS::IAM::Role", "CREATE_COMPLETE"),
+        _event(235, "Endpoint", "AWS::EC2::VPCEndpoint", "CREATE_COMPLETE"),
+        _event(236, "EniIps", "Custom::AWS", "CREATE_IN_PROGRESS"),
+        _event(266, "EniIps", "Custom::AWS", "CREATE_COMPLETE"),
+        _event(267, "Nlb", "AWS::ElasticLoadBalancingV2::LoadBalancer", "CREATE_IN_PROGRESS"),
+        _event(447, "Nlb", "AWS::ElasticLoadBalancingV2::LoadBalancer", "CREATE_COMPLETE"),
+        _event(449, STACK, stack, "CREATE_COMPLETE"),
+    ]
+    # describe-stack-events lists the newest event first
+    return list(reversed(events))
+
+
+def test_dependencies_distinguish_data_flow_from_depends_on():
+    dependencies = template_dependencies(TEMPLATE)
+    assert dependencies["EniIps"] == {"Endpoint": "data", "Role": "data"}
+    assert dependencies["Nlb"] == {"EniIps": "depends_on"}
+
+
+def test_critical_path_follows_the_dependency_that_finished_last():
+    events = sorted(_events(), key=lambda event: event["Timestamp"])
+    report = analyze(events, TEMPLATE)
+
+    assert report["stack"] == STACK and report["operation"] == "CREATE_COMPLETE"
+    assert report["duration_s"] == 349
+    assert [step["logical_id"] for step in report["critical_path"]] == ["Vpc", "Endpoint", "EniIps", "Nlb"]
+    endpoint = report["critical_path"][1]
+    assert endpoint["duration_s"] == 120 and endpoint["wait_s"] == 3 and endpoint["edge"] == "data"
+    assert report["critical_path_s"] == 347
+    assert report["resources"][0]["logical_id"] == "Nlb"
+    assert [(c["logical_id"], c["kind"]) for c in report["candidates"]] == [
+        ("Nlb", "serial_dependency"), ("Nlb", "slow_resource"), ("Endpoint", "slow_resource"),
+        ("EniIps", "slow_resource")]
+
+
+def test_main_reads_describe_stack_events_dumps(tmp_path, capsys):
+    (tmp_path / "events.json").write_text(json.dumps({"StackEvents": _events()}))
+    (tmp_path / "template.json").write_text(json.dumps(TEMPLATE))
+
+    main([str(tmp_path / "events.json"), "--template", str(tmp_path / "template.json"), "--format", "json"])
+
+    report = json.loads(capsys.readouterr().out)
+    assert report["critical_path"][-1]["after"] == "EniIps"
@@ -0,0 +1,83 @@
+import io
+import json
+import threading
+import time
+
+from tools import deploy_orchestrator
+from tools.deploy_orchestrator import DeployOrchestrator
+
+
+class FakeDeployer:
+
+    def __init__(self, failing=(), delay=0.05):
+        self.failing = set(failing)
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def deploy(self, stack_id, on_output):
+        with self._lock:
+            self.calls.append(stack_id)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        on_output("CREATE_IN_PROGRESS")
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return stack_id not in self.failing
+
+
+def test_network_stack_is_deployed_before_api_stack_per_region():
+    deployer = FakeDeployer()
+    report = DeployOrchestrator(deployer, parallelism=3, output=io.StringIO()).run(["r1", "r2", "r3"])
+
+    assert report["status"] == "succeeded"
+    for region in ["r1", "r2", "r3"]:
+        assert deployer.calls.index(f"IDMZ-Network-Stack-{region}") < \
+            deployer.calls.index(f"iDMZ-APIGateway-HTTP-API-{region}")
+    assert deployer.max_in_flight == 3
+    assert report["speedup"] > 1.5
+
+
+def test_failure_stops_later_waves():
+    deployer = FakeDeployer(failing={"IDMZ-Network-Stack-r1"})
+    output = io.StringIO()
+    report = DeployOrchestrator(deployer, parallelism=2, output=output).run(["r1", "r2", "r3"])
+
+    statuses = {s["stack_id"]: s["status"] for s in report["stacks"]}
+    assert report["status"] == "failed"
+    assert statuses["iDMZ-APIGateway-HTTP-API-r1"] == "skipped"
+    assert statuses["iDMZ-APIGateway-HTTP-API-r2"] == "succeeded"
+    assert statuses["IDMZ-Network-Stack-r3"] == "not_started"
+    assert "[IDMZ-Network-Stack-r2] CREATE_IN_PROGRESS" in output.getvalue()
+
+
+def test_global_stacks_are_deployed_after_all_regions():
+    deployer = FakeDeployer(delay=0)
+    report = DeployOrchestrator(deployer, parallelism=2, output=io.StringIO()).run(["r1", "r2"], ["iDMZ-GlobalAccelerator"])
+
+    assert report["status"] == "succeeded"
+    assert deployer.calls[-1] == "iDMZ-GlobalAccelerator"
+
+    deployer = FakeDeployer(failing={"iDMZ-APIGateway-HTTP-API-r2"}, delay=0)
+    report = DeployOrchestrator(deployer, parallelism=2, output=io.StringIO()).run(["r1", "r2"], ["iDMZ-GlobalAccelerator"])
+    assert report["stacks"][-1] == {"stack_id": "iDMZ-GlobalAccelerator", "region": "global", "status": "not_started"}
+
+
+def test_experimental_accelerator_stack_is_opt_in(tmp_path, monkeypatch):
+    (tmp_path / "resources").mkdir()
+    (tmp_path / "resources" / "application.develop.properties").write_text(
+        "[cdk_settings]\ntarget_regions = r1\nglobal_accelerator_enabled = True\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(deploy_orchestrator, "CdkCliDeployer", lambda app_dir: FakeDeployer(delay=0))
+
+    deployed = []
+    for option in ([], ["--include-global-accelerator"]):
+        report_path = tmp_path / "report.json"
+        deploy_orchestrator.main(["--profile", "develop", "--skip-synth", "--report", str(report_path)] + option)
+        deployed.append([stack["stack_id"] for stack in json.loads(report_path.read_text())["stacks"]])
+
+    assert "iDMZ-GlobalAccelerator" not in deployed[0]
+    assert deployed[1][-1] == "iDMZ-GlobalAccelerator"
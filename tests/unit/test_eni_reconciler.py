@@ -0,0 +1,116 @@
+import importlib.util
+import io
+import os
+import sys
+
+import aws_cdk.assertions as assertions
+
+from app import build_app
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_ROOT, "apigw_vpce_helpers", "custom_resource", "metrics_layer", "python"))
+
+# Loaded under its own name, the other Lambda functions also have a handler.py
+_spec = importlib.util.spec_from_file_location(
+    "eni_reconciler_handler",
+    os.path.join(REPO_ROOT, "apigw_vpce_helpers", "custom_resource", "eni_reconciler", "handler.py"))
+handler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(handler)
+
+TARGET_GROUP_ARN = "arn:aws:elasticloadbalancing:eu-central-1:111111111111:targetgroup/idmz/abc"
+
+
+class StubEc2:
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def describe_vpc_endpoints(self, VpcEndpointIds):
+        self.calls.append(('describe_vpc_endpoints', VpcEndpointIds))
+        eni_ids = [eni['NetworkInterfaceId'] for page in self.pages for eni in page]
+        return {'VpcEndpoints': [{'VpcEndpointId': VpcEndpointIds[0], 'NetworkInterfaceIds': eni_ids}]}
+
+    def describe_network_interfaces(self, NetworkInterfaceIds, NextToken=None):
+        self.calls.append(('describe_network_interfaces', NextToken))
+        index = int(NextToken or 0)
+        response = {'NetworkInterfaces': self.pages[index]}
+        if index + 1 < len(self.pages):
+            response['NextToken'] = str(index + 1)
+        return response
+
+
+class StubElbv2:
+
+    def __init__(self, targets):
+        self.targets = dict(targets)
+        self.calls = []
+
+    def describe_target_health(self, TargetGroupArn):
+        return {'TargetHealthDescriptions': [{'Target': {'Id': ip, 'Port': 443}, 'TargetHealth': {'State': state}}
+                                             for ip, state in self.targets.items()]}
+
+    def register_targets(self, TargetGroupArn, Targets):
+        self.calls.append(('register', [target['Id'] for target in Targets]))
+        self.targets.update({target['Id']: 'initial' for target in Targets})
+
+    def deregister_targets(self, TargetGroupArn, Targets):
+        self.calls.append(('deregister', [target['Id'] for target in Targets]))
+        self.targets.update({target['Id']: 'draining' for target in Targets})
+
+
+def _eni(eni_id, ip, status="in-use"):
+    return {'NetworkInterfaceId': eni_id, 'PrivateIpAddress': ip, 'AvailabilityZone': 'eu-central-1a',
+            'Status': status}
+
+
+def test_registers_new_and_deregisters_stale_ips_idempotently():
+    handler.metrics.stream = io.StringIO()
+    ec2 = StubEc2([[_eni("eni-1", "10.0.0.10")], [_eni("eni-2", "10.0.0.20"), _eni("eni-3", "10.0.0.30", "detaching")]])
+    elbv2 = StubElbv2({"10.0.0.10": "healthy", "10.0.0.99": "healthy", "10.0.0.98": "draining"})
+
+    result = handler.reconcile(ec2, elbv2, "vpce-1", TARGET_GROUP_ARN, 443)
+
+    assert result == {'endpoint_ips': ["10.0.0.10", "10.0.0.20"], 'registered': ["10.0.0.20"],
+                      'deregistered': ["10.0.0.99"]}
+    assert [call[1] for call in ec2.calls if call[0] == 'describe_network_interfaces'] == [None, "1"]
+    assert handler.metrics.records()[0]['TargetsRegistered'] == 1
+
+    # A second run finds nothing to do
+    elbv2.calls = []
+    assert handler.reconcile(ec2, elbv2, "vpce-1", TARGET_GROUP_ARN, 443)['registered'] == []
+    assert elbv2.calls == []
+
+
+def test_keeps_the_targets_when_the_endpoint_has_no_eni_in_use():
+    handler.metrics.stream = io.StringIO()
+    elbv2 = StubElbv2({"10.0.0.10": "healthy"})
+
+    result = handler.reconcile(StubEc2([[_eni("eni-1", "10.0.0.10", "detaching")]]), elbv2, "vpce-1",
+                               TARGET_GROUP_ARN, 443)
+
+    assert result['deregistered'] == [] and elbv2.calls == []
+    assert any(record.get('ReconcileSkipped') == 1 for record in handler.metrics.records())
+
+
+def test_api_stack_schedules_the_reconciler(tmp_path):
+    properties = tmp_path / "application.reconciler.properties"
+    with open(os.path.join(REPO_ROOT, "resources", "application.develop.properties")) as f:
+        properties.write_text(f.read().replace("eni_reconciler_enabled = False", "eni_reconciler_enabled = True"))
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop", properties_file_path=str(properties))
+    finally:
+        os.chdir(cwd)
+    stack = next(child for child in app.node.children if child.node.id.startswith("iDMZ-APIGateway-HTTP-API"))
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Events::Rule", {"ScheduleExpression": "rate(5 minutes)"})
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "handler.lambda_handler",
+        "Environment": {"Variables": assertions.Match.object_like({
+            "VPC_ENDPOINT_ID": assertions.Match.any_value(),
+            "TARGET_GROUP_ARN": assertions.Match.any_value(),
+        })},
+    })
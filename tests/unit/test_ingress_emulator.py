@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+import ssl
+
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+
+from apigw_vpce_helpers import route_compiler
+from tests.unit.test_load_generator import _issue
+from tools import http1, ingress_emulator
+from utils.truststore_builder import TruststoreBuilder
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _backend(seen):
+    async def handle(reader, writer):
+        while (request := await http1.read_request(reader)) is not None:
+            seen.append(request)
+            writer.write(http1.format_response(200, 'OK', {'content-type': 'application/json'},
+                                               json.dumps({'backend': request.target}).encode()))
+            await writer.drain()
+        writer.close()
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def _get(port, ca_path, client, targets, headers=None):
+    context = ssl.create_default_context(cafile=ca_path)
+    context.load_cert_chain(*client)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port, ssl=context, server_hostname='localhost')
+    responses = []
+    for target in targets:
+        writer.write(http1.format_request('GET', target, {'host': 'localhost', **(headers or {})}))
+        await writer.drain()
+        responses.append(await http1.read_response(reader))
+    writer.close()
+    return responses
+
+
+def test_requests_go_through_mtls_authorizer_cache_and_backend(tmp_path, monkeypatch):
+    ca, ca_key, ca_path, _ = _issue(tmp_path, "idmz-test-ca", ca=True)
+    _, _, *server = _issue(tmp_path, "localhost", ca.subject, ca_key, san=[x509.DNSName("localhost")])
+    pinned, _, *client = _issue(tmp_path, "client", ca.subject, ca_key)
+    _, _, *unpinned = _issue(tmp_path, "unpinned", ca.subject, ca_key)
+    monkeypatch.setenv("CERT_PINNING", "True")
+    monkeypatch.setenv("PINNED_CERT_SHA256", hashlib.sha256(pinned.public_bytes(serialization.Encoding.DER)).hexdigest())
+    authorizer = ingress_emulator.load_handler(*ingress_emulator.AUTHORIZER)
+    events = []
+
+    def counting_authorizer(event, context):
+        events.append(event)
+        return authorizer(event, context)
+
+    truststore = TruststoreBuilder.build([ca_path], str(tmp_path / "truststore"))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*server)
+    context.load_verify_locations(truststore['path'])
+    context.verify_mode = ssl.CERT_REQUIRED
+    routes = route_compiler.compile_routes(["GET /orders", {"path": "/public", "authorization": "none"}]).routes
+    clock = FakeClock()
+
+    async def scenario():
+        seen = []
+        backend, backend_port = await _backend(seen)
+        emulator = ingress_emulator.IngressEmulator(
+            context, counting_authorizer, routes, f"http://127.0.0.1:{backend_port}",
+            health_handler=ingress_emulator.load_handler(*ingress_emulator.HEALTH), cache_ttl=300,
+            source_ip="35.189.89.201", clock=clock)
+        port = await emulator.start()
+        try:
+            first = await _get(port, ca_path, client, ["/orders", "/orders?page=2", "/idmzhealth"])
+            clock.now = 301
+            expired = await _get(port, ca_path, client, ["/public"], {'x-idmz-tenant-id': 'spoofed'})
+            expired += await _get(port, ca_path, client, ["/orders"])
+            denied = await _get(port, ca_path, unpinned, ["/orders"])
+            return first, expired, denied, seen, emulator
+        finally:
+            await emulator.close()
+            backend.close()
+
+    (orders, cached, health), (public, refreshed), (denied,), seen, emulator = asyncio.run(scenario())
+
+    assert [orders.status, cached.status, health.status, public.status, refreshed.status] == [200] * 5
+    assert json.loads(health.body) == "idmzhealth=SUCCESS"
+    assert denied.status == 403 and json.loads(denied.body) == {"message": "Forbidden"}
+    # The authorizer was invoked once per certificate, the cache answered until the TTL expired; /public skips it
+    assert len(events) == 3 and emulator.cache.hits == 2
+    event = events[0]
+    assert event["identitySource"] == ["35.189.89.201", event["requestContext"]["authentication"]["clientCert"]["clientCertPem"]]
+    assert event["routeKey"] == "GET /orders" and event["requestContext"]["authentication"]["clientCert"]["subjectDN"] == "CN=client"
+    assert [request.target for request in seen] == ["/orders", "/orders?page=2", "/public", "/orders"]
+    assert seen[0].headers["x-idmz-client-cn"] == "client"
+    assert seen[0].headers["x-idmz-rule-id"].startswith("pin:")
+    assert seen[0].headers["x-forwarded-for"] == "35.189.89.201"
+    assert "x-idmz-tenant-id" not in seen[2].headers
+    assert "authorizer;dur=" in orders.headers["server-timing"]
+    assert emulator.stats()["hops_ms"]["total"]["count"] == 6
+
+
+def test_match_route_prefers_literal_then_variable_then_greedy_and_method_over_any():
+    # Different settings, so that the route compiler keeps the routes covered by the greedy one
+    routes = route_compiler.compile_routes(
+        [{"path": "/orders/{proxy+}", "rate_limit": 5}, "GET /orders/{id}", "POST /orders/{id}",
+         {"path": "/orders/latest", "method": "GET", "rate_limit": 50}], collapse_threshold=0).routes
+
+    assert ingress_emulator.match_route(routes, "GET", "/orders/latest").route_key == "GET /orders/latest"
+    assert ingress_emulator.match_route(routes, "GET", "/orders/17").route_key == "GET /orders/{id}"
+    assert ingress_emulator.match_route(routes, "DELETE", "/orders/17").route_key == "ANY /orders/{proxy+}"
+    assert ingress_emulator.match_route(routes, "GET", "/orders/17/items").route_key == "ANY /orders/{proxy+}"
+    assert ingress_emulator.match_route(routes, "GET", "/status") is None
@@ -0,0 +1,54 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "apigw_vpce_helpers", "custom_resource",
+                                "metrics_layer", "python"))
+
+import idmz_metrics  # noqa: E402
+
+
+def test_records_are_valid_emf_grouped_by_dimensions():
+    metrics = idmz_metrics.MetricsLogger("authorizer", namespace="IDMZ-Test", stream=io.StringIO())
+    metrics.put_metric("Decision", 1, Reason="allowed")
+    metrics.put_metric("EniLookupLatency", 12.5, "Milliseconds")
+    metrics.put_metric("EniLookupLatency", 7.5, "Milliseconds")
+    metrics.set_property("RulesVersion", "3")
+
+    decision, base = metrics.records(timestamp=1700000000000)
+
+    assert base["_aws"] == {"Timestamp": 1700000000000, "CloudWatchMetrics": [{
+        "Namespace": "IDMZ-Test", "Dimensions": [["Service"]],
+        "Metrics": [{"Name": "EniLookupLatency", "Unit": "Milliseconds"}]}]}
+    assert base["Service"] == "authorizer" and base["EniLookupLatency"] == [12.5, 7.5]
+    assert base["RulesVersion"] == "3"
+    assert decision["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Service", "Reason"]]
+    assert decision["Reason"] == "allowed" and decision["Decision"] == 1
+
+
+def test_instrumented_handler_flushes_once_per_invocation_even_when_it_raises():
+    stream = io.StringIO()
+    metrics = idmz_metrics.MetricsLogger("idmzhealth", stream=stream)
+    writes = []
+    stream.write = lambda text, write=stream.write: writes.append(text) or write(text)
+
+    @metrics.instrument
+    def handler(event, context):
+        metrics.put_metric("Decision", 1, Reason=event)
+        if event == "error":
+            raise RuntimeError(event)
+        return event
+
+    assert handler("allowed", None) == "allowed"
+    try:
+        handler("error", None)
+    except RuntimeError:
+        pass
+
+    assert len(writes) == 2
+    first, second = ([json.loads(line) for line in text.splitlines()] for text in writes)
+    assert first[0]["ColdStart"] == 1 and first[0]["InitDuration"] >= 0
+    assert second[0]["ColdStart"] == 0 and "InitDuration" not in second[0]
+    assert second[1]["Reason"] == "error"
+    assert metrics.flush() == []
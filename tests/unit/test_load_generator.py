@@ -0,0 +1,105 @@
+import asyncio
+import datetime
+import ipaddress
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+import pytest
+
+from tools import http1, load_generator, tls_stand_in
+
+
+def _issue(tmp_path, name, issuer=None, issuer_key=None, ca=False, san=None):
+    key = ec.generate_private_key(ec.SECP256R1())
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    builder = (x509.CertificateBuilder().subject_name(subject).issuer_name(issuer or subject)
+               .public_key(key.public_key()).serial_number(x509.random_serial_number())
+               .not_valid_before(now - datetime.timedelta(minutes=1)).not_valid_after(now + datetime.timedelta(days=1))
+               .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True))
+    if san:
+        builder = builder.add_extension(x509.SubjectAlternativeName(san), critical=False)
+    certificate = builder.sign(issuer_key or key, hashes.SHA256())
+    cert_path, key_path = tmp_path / f"{name}.pem", tmp_path / f"{name}.key"
+    cert_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    return certificate, key, str(cert_path), str(key_path)
+
+
+def _pki(tmp_path):
+    ca, ca_key, ca_path, _ = _issue(tmp_path, "idmz-test-ca", ca=True)
+    _, _, server_cert, server_key = _issue(tmp_path, "localhost", ca.subject, ca_key,
+                                           san=[x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))])
+    _, _, client_cert, client_key = _issue(tmp_path, "client", ca.subject, ca_key)
+    _, _, rogue_cert, rogue_key = _issue(tmp_path, "rogue")
+    return ca_path, (server_cert, server_key), (client_cert, client_key), (rogue_cert, rogue_key)
+
+
+def _run(ca_path, server, client, **generator_options):
+    async def scenario():
+        stand_in = tls_stand_in.TlsStandInServer(tls_stand_in.server_ssl_context(*server, ca_path),
+                                                 statuses={"/denied": 403, "/broken": 502})
+        port = await stand_in.start()
+        try:
+            generator = load_generator.LoadGenerator(
+                f"https://127.0.0.1:{port}", load_generator.client_ssl_context(*client, ca=ca_path),
+                load_generator.parse_routes(["GET /idmzhealth=3", "GET /denied=1", "POST /broken=1"]),
+                server_name="localhost", seed=7, timeout=5, **generator_options)
+            return await generator.run([(200, 0.5), (400, 0.5)]), stand_in
+        finally:
+            await stand_in.close()
+    return asyncio.run(scenario())
+
+
+def test_open_loop_run_against_stand_in_reports_statuses_and_reuses_connections(tmp_path):
+    ca_path, server, client, _ = _pki(tmp_path)
+
+    report, stand_in = _run(ca_path, server, client, connections=4, requests_per_connection=50,
+                            arrival="constant")
+
+    # 0.5 s at 200 rps, then 0.5 s at 400 rps
+    assert 298 <= report["requests"]["scheduled"] <= 300
+    assert report["requests"]["completed"] == report["requests"]["scheduled"] == stand_in.requests
+    assert report["errors"] == {"forbidden": report["status"]["403"], "server_error": report["status"]["502"]}
+    assert report["requests"]["succeeded"] == report["status"]["200"]
+    assert set(report["routes"]) == {"GET /idmzhealth", "GET /denied", "POST /broken"}
+    assert report["latency_ms"]["count"] == report["requests"]["completed"]
+    # Connections are reused: 4 at most at a time, each closed after 50 requests
+    assert 6 <= report["connections"]["opened"] <= stand_in.connections <= 12
+    assert 0 < report["sustained_rps"] <= report["requests"]["succeeded"]
+
+
+def test_client_certificate_outside_truststore_is_a_tls_error(tmp_path):
+    ca_path, server, _, rogue = _pki(tmp_path)
+
+    report, stand_in = _run(ca_path, server, rogue, requests_per_connection=1)
+
+    assert report["requests"]["completed"] == 0 and stand_in.requests == 0
+    assert report["errors"] == {"tls_handshake": report["requests"]["scheduled"]}
+
+
+def test_route_and_stage_parsing():
+    assert load_generator.parse_routes(["get /a", "POST /b=2.5"]) == [("GET", "/a", 1.0), ("POST", "/b", 2.5)]
+    assert load_generator.parse_stages("20:10,100:30") == [(20.0, 10.0), (100.0, 30.0)]
+    assert load_generator.classify_status(403) == "forbidden"
+    assert load_generator.classify_status(504) == "server_error"
+
+
+@pytest.mark.parametrize("response", [
+    b"HTTP/1.1 200 OK\r\nContent-Length: abc\r\n\r\n",
+    b"HTTP/1.1 200 OK\r\nContent-Length: -1\r\n\r\n",
+    b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nxyz\r\n",
+    b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n" + b"1" * 128 + b"\r\n",
+])
+def test_malformed_body_framing_is_a_protocol_error(response):
+    async def read():
+        reader = asyncio.StreamReader(limit=64)
+        reader.feed_data(response)
+        reader.feed_eof()
+        return await http1.read_response(reader)
+
+    with pytest.raises(http1.ProtocolError):
+        asyncio.run(read())
@@ -0,0 +1,57 @@
+import gzip
+import json
+import os
+
+from tools.nlb_log_analyzer import NlbLogAnalyzer, main, nlb_subnets_from_profile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _entry(destination, connection_ms, handshake_ms, received, sent, alert="-"):
+    return (f"tls 2.0 2026-10-19T10:00:00 net/idmz-nlb/c6e77e28c25b2234 g3d4b5e8bb8464cd 192.168.2.140:51341 "
+            f"{destination}:443 {connection_ms} {handshake_ms} {received} {sent} {alert} "
+            f"arn:aws:acm:eu-central-1:070490149644:certificate/abc - ECDHE-RSA-AES128-GCM-SHA256 tlsv12 - "
+            f"gpi.dev.cloud01.swift.com - - - 2026-10-19T09:59:59")
+
+
+def test_profile_subnets_map_nlb_nodes_to_azs():
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        subnets = nlb_subnets_from_profile("develop", "eu-central-1")
+    finally:
+        os.chdir(cwd)
+    assert subnets == {"192.168.2.64/27": "eu-central-1a", "192.168.2.96/27": "eu-central-1b"}
+
+
+def test_groups_by_destination_and_az_and_flags_imbalance():
+    analyzer = NlbLogAnalyzer({"192.168.2.64/27": "eu-central-1a", "192.168.2.96/27": "eu-central-1b"})
+    analyzer.add_lines([_entry("192.168.2.70", 1000, 20, 500, 1500) for _ in range(8)])
+    analyzer.add_lines([
+        _entry("192.168.2.100", 2000, 40, 100, 100),
+        _entry("192.168.2.100", 5, "-", 0, 7, alert="0x30"),
+        "not an access log entry",
+    ])
+
+    report = analyzer.report(threshold=1.25)
+
+    assert report["entries"] == 10 and report["skipped"] == 1
+    az_a, az_b = report["azs"]["eu-central-1a"], report["azs"]["eu-central-1b"]
+    assert az_a["connections"] == 8 and az_a["received_bytes"] == 4000 and az_a["sent_bytes"] == 12000
+    assert abs(az_a["tls_handshake_ms"]["p50"] - 20) <= 0.4
+    assert az_b["failed_handshakes"] == 1 and az_b["tls_handshake_ms"]["count"] == 1
+    assert report["destinations"]["192.168.2.100"]["az"] == "eu-central-1b"
+    assert report["imbalance"]["azs"]["imbalanced"] == ["eu-central-1a"]
+    assert report["imbalance"]["azs"]["max_over_mean"] == 1.6
+
+
+def test_main_streams_gzip_files(tmp_path, capsys):
+    path = tmp_path / "070490149644_elasticloadbalancing_eu-central-1_net.idmz-nlb_20261019T1000Z_1.log.gz"
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(_entry(ip, 10, 5, 1, 1) for ip in ["192.168.2.70", "192.168.2.100"]) + "\n")
+
+    main(["--subnet", "eu-central-1a=192.168.2.64/27", "--format", "json", str(path)])
+
+    report = json.loads(capsys.readouterr().out)
+    assert report["entries"] == 2 and set(report["azs"]) == {"eu-central-1a", "-"}
+    assert report["imbalance"]["azs"]["imbalanced"] == []
@@ -0,0 +1,50 @@
+import pytest
+
+from apigw_vpce_helpers.route_compiler import compile_routes
+
+
+def route_keys(table):
+    return [route.route_key for route in table.routes]
+
+
+def test_dedupes_and_normalises_route_keys():
+    table = compile_routes(["/orders", "orders/", "//orders", "GET /orders"], collapse_threshold=0)
+    assert route_keys(table) == ["ANY /orders"]
+    assert table.configured_count == 4
+
+
+def test_routes_under_greedy_route_are_dropped():
+    table = compile_routes(["/api/{proxy+}", "/api/a", "GET /api/b/c", "/other"], collapse_threshold=0)
+    assert route_keys(table) == ["ANY /api/{proxy+}", "ANY /other"]
+
+
+def test_siblings_with_default_settings_are_collapsed_when_enabled():
+    routes = ["/api/a", "/api/b", {"path": "/api/c", "rate_limit": 10}, "/top"]
+    assert route_keys(compile_routes(routes)) == ["ANY /api/a", "ANY /api/b", "ANY /api/c", "ANY /top"]
+    table = compile_routes(routes, collapse_threshold=2)
+    assert route_keys(table) == ["ANY /api/c", "ANY /api/{proxy+}", "ANY /top"]
+
+
+@pytest.mark.parametrize("settings", [
+    {"authorization": "none"},
+    {"rate_limit": 50},
+    {"burst_limit": 100},
+])
+def test_public_and_throttled_routes_are_never_widened(settings):
+    routes = [{"path": path, **settings} for path in ("/api/public1", "/api/public2", "/api/public3")]
+    # Not even dropped under an explicit greedy route with the same settings
+    table = compile_routes(routes + [{"path": "/api/{proxy+}", **settings}], collapse_threshold=2)
+
+    assert route_keys(table) == ["ANY /api/public1", "ANY /api/public2", "ANY /api/public3", "ANY /api/{proxy+}"]
+
+
+def test_per_method_keys_are_kept_separate():
+    table = compile_routes([{"path": "/orders", "method": ["GET", "POST"]}])
+    assert route_keys(table) == ["GET /orders", "POST /orders"]
+
+
+def test_conflicting_duplicates_are_rejected():
+    with pytest.raises(ValueError):
+        compile_routes(["/orders", {"path": "/orders", "rate_limit": 5}])
+    with pytest.raises(ValueError):
+        compile_routes([{"path": "/orders", "method": "FETCH"}])
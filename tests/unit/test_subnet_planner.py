@@ -0,0 +1,48 @@
+import pytest
+
+from utils.subnet_planner import SubnetPlanner
+
+REGION = {'vpc_cidr_block': '10.0.0.0/24', 'azs': 'eu-central-1a,eu-central-1b', 'az_ids': 'euc1-az2,euc1-az3'}
+
+
+def test_derives_aligned_subnets_largest_first():
+    plan = SubnetPlanner.plan_region({**REGION, 'vpce1_cidr_mask': '27', 'nlb_cidr_mask': '26'})
+
+    assert plan == {
+        'nlb_subnet_cidrs': ['10.0.0.0/26', '10.0.0.64/26'],
+        'vpce1_subnet_cidrs': ['10.0.0.128/27', '10.0.0.160/27'],
+        'vpclink_subnet_cidrs': ['10.0.0.192/28', '10.0.0.208/28'],
+    }
+
+
+def test_derived_subnets_avoid_explicit_ones():
+    plan = SubnetPlanner.plan_region({**REGION, 'nlb_subnet_cidrs': '10.0.0.0/28,10.0.0.32/28'})
+
+    assert plan['nlb_subnet_cidrs'] == ['10.0.0.0/28', '10.0.0.32/28']
+    assert plan['vpce1_subnet_cidrs'] == ['10.0.0.16/28', '10.0.0.48/28']
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({'vpce1_subnet_cidrs': '10.0.0.0/28,10.0.1.0/28'}, "outside vpc_cidr_block"),
+    ({'vpce1_subnet_cidrs': '10.0.0.0/27,10.0.0.16/28'}, "overlaps"),
+    ({'vpce1_subnet_cidrs': '10.0.0.0/28'}, "1 entries for 2 AZs"),
+    ({'vpce1_cidr_mask': '25', 'nlb_cidr_mask': '25'}, "no free /25"),
+])
+def test_rejects_invalid_region(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        SubnetPlanner.plan_region({**REGION, **overrides})
+
+
+def test_reports_vpc_overlaps_across_regions():
+    props = {'cdk_settings': {'azs': REGION['azs'], 'az_ids': REGION['az_ids']}}
+    regions = [f"region-{i}" for i in range(40)]
+    for i, region in enumerate(regions):
+        props[region] = {'vpc_cidr_block': f"10.{i}.0.0/24"}
+    props['region-7']['vpc_cidr_block'] = "10.6.0.0/23"
+
+    with pytest.raises(ValueError) as e:
+        SubnetPlanner.validate_profile(props, regions)
+    assert "10.6.0.0/24 of region-6 overlaps 10.6.0.0/23 of region-7" in str(e.value)
+
+    props['region-7']['vpc_cidr_block'] = "10.7.0.0/24"
+    assert len(SubnetPlanner.validate_profile(props, regions)) == 40
@@ -1,15 +1,259 @@
+import json
+import os
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
+
+from app import build_app
+from utils.stack_tags import StackTags
+from utils.utils import Utility
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def develop_app():
+    # Stacks resolve certificate paths relative to the repository root
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop")
+        yield app
+    finally:
+        os.chdir(cwd)
+
+
+def test_network_stack_creates_vpc_and_subnets(develop_app):
+    stack = develop_app.node.find_child("IDMZ-Network-Stack-eu-central-1")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::EC2::VPC", {
+        "CidrBlock": "192.168.2.0/24",
+        "Tags": assertions.Match.array_with([
+            {"Key": "Name", "Value": "sw-gpi_idmz-dev-vpc-idmz-eu-central-1-main-aws"},
+            {"Key": "swift:flow-log-to-s3", "Value": "enable"},
+        ]),
+    })
+    # vpce, nlb and vpclink subnets in each of the two AZs
+    template.resource_count_is("AWS::EC2::Subnet", 6)
+
+
+def test_api_stack_creates_http_api_behind_nlb(develop_app):
+    stack = develop_app.node.find_child("iDMZ-APIGateway-HTTP-API-eu-central-1")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::ApiGatewayV2::Api", {"DisableExecuteApiEndpoint": True})
+    template.has_resource_properties("AWS::ElasticLoadBalancingV2::Listener", {"Port": 443, "Protocol": "TCP"})
+    template.has_resource_properties("AWS::ApiGatewayV2::Route", {"RouteKey": "GET /idmzhealth"})
+
+    stages = template.find_resources("AWS::ApiGatewayV2::Stage")
+    log_format = json.loads(next(iter(stages.values()))["Properties"]["AccessLogSettings"]["Format"])
+    assert log_format["responseLatency"] == "$context.responseLatency"
+    assert log_format["region"] == "eu-central-1"
+
+    # All functions share one metrics layer
+    template.resource_count_is("AWS::Lambda::LayerVersion", 1)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "api-gateway-lambda-http-authorizer-simple.lambda_handler",
+        "Layers": [{"Ref": assertions.Match.string_like_regexp("idmzmetricslayer")}],
+    })
+
+
+def test_api_stack_creates_dashboard_and_p99_alarms(develop_app):
+    stack = develop_app.node.find_child("iDMZ-APIGateway-HTTP-API-eu-central-1")
+    template = assertions.Template.from_stack(stack)
+
+    template.resource_count_is("AWS::CloudWatch::Dashboard", 1)
+    template.has_resource_properties("AWS::ApiGatewayV2::Stage", {
+        "DefaultRouteSettings": assertions.Match.object_like({"DetailedMetricsEnabled": True})})
+    alarms = template.find_resources("AWS::CloudWatch::Alarm")
+    thresholds = {a["Properties"]["Metrics"][0]["MetricStat"]["Metric"]["MetricName"]: a["Properties"]["Threshold"]
+                  for a in alarms.values()}
+    assert thresholds == {"Latency": 3000, "IntegrationLatency": 2500, "Duration": 500}
+
+
+def _health_check_profile(tmp_path, failover_region):
+    with open(os.path.join(REPO_ROOT, "resources", "application.develop.properties")) as f:
+        properties = f.read().replace("r53_health_check_enabled = False", "r53_health_check_enabled = True")
+    path = tmp_path / f"application.failover-{failover_region}.properties"
+    path.write_text(properties.replace("r53_failover_region =", f"r53_failover_region = {failover_region}"))
+    return str(path)
+
+
+def test_latency_record_uses_the_alarm_based_health_check(tmp_path):
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop", _health_check_profile(tmp_path, "eu-central-1"))
+        with pytest.raises(ValueError, match="'r53_failover_region' 'eu-west-1' is not one of the target_regions"):
+            build_app("develop", _health_check_profile(tmp_path, "eu-west-1"))
+    finally:
+        os.chdir(cwd)
+    template = assertions.Template.from_stack(app.node.find_child("iDMZ-APIGateway-HTTP-API-eu-central-1"))
+
+    # Route 53 checkers cannot present a client certificate to the mTLS custom domain
+    template.has_resource_properties("AWS::Route53::HealthCheck", {
+        "HealthCheckConfig": assertions.Match.object_like({"Type": "TCP", "Port": 443})})
+    metric_checks = template.find_resources("AWS::Route53::HealthCheck", {
+        "Properties": {"HealthCheckConfig": {"Type": "CLOUDWATCH_METRIC"}}})
+    alarms = template.find_resources("AWS::CloudWatch::Alarm")
+    watched = {alarms[check["Properties"]["HealthCheckConfig"]["AlarmIdentifier"]["Name"]["Ref"]]["Properties"]
+               ["MetricName"] for check in metric_checks.values()}
+    assert watched == {"5xx", "IntegrationLatency", "UnHealthyHostCount"}
+
+    calculated = template.find_resources("AWS::Route53::HealthCheck", {
+        "Properties": {"HealthCheckConfig": {"Type": "CALCULATED"}}})
+    (calculated_id, calculated_check), = calculated.items()
+    assert calculated_check["Properties"]["HealthCheckConfig"]["HealthThreshold"] == 4
+    latency_records = template.find_resources("AWS::Route53::RecordSet", {"Properties": {"Region": "eu-central-1"}})
+    (latency_record,) = latency_records.values()
+    assert latency_record["Properties"]["HealthCheckId"] == {"Fn::GetAtt": [calculated_id, "HealthCheckId"]}
+    template.has_resource_properties("AWS::Route53::RecordSet", {"Failover": "PRIMARY"})
+
+
+def test_tcp_health_check_type_keeps_the_connection_check_only(tmp_path):
+    path = _health_check_profile(tmp_path, "eu-central-1")
+    with open(path) as f:
+        properties = f.read().replace("r53_health_check_type = CALCULATED", "r53_health_check_type = TCP")
+    with open(path, "w") as f:
+        f.write(properties)
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop", path)
+    finally:
+        os.chdir(cwd)
+    template = assertions.Template.from_stack(app.node.find_child("iDMZ-APIGateway-HTTP-API-eu-central-1"))
+
+    template.resource_count_is("AWS::Route53::HealthCheck", 1)
+    template.has_resource_properties("AWS::Route53::HealthCheck", {
+        "HealthCheckConfig": assertions.Match.object_like({"Type": "TCP"})})
+
+
+def test_stage_throttling_defaults_and_route_overrides(develop_app, tmp_path):
+    template = assertions.Template.from_stack(develop_app.node.find_child("iDMZ-APIGateway-HTTP-API-eu-central-1"))
+    template.has_resource_properties("AWS::ApiGatewayV2::Stage", {
+        "DefaultRouteSettings": assertions.Match.object_like({
+            "ThrottlingRateLimit": 1000, "ThrottlingBurstLimit": 2000})})
+
+    with open(os.path.join(REPO_ROOT, "resources", "application.develop.properties")) as f:
+        properties = f.read().replace(
+            "routes = []", 'routes = [{"path": "/orders", "method": "GET", "rate_limit": 50, "burst_limit": 100}]')
+    path = tmp_path / "application.throttling.properties"
+    path.write_text(properties)
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop", str(path))
+    finally:
+        os.chdir(cwd)
+    template = assertions.Template.from_stack(app.node.find_child("iDMZ-APIGateway-HTTP-API-eu-central-1"))
+
+    (stage,) = template.find_resources("AWS::ApiGatewayV2::Stage").values()
+    assert stage["Properties"]["RouteSettings"] == {
+        "GET /orders": {"ThrottlingRateLimit": 50, "ThrottlingBurstLimit": 100}}
+    (route_id,) = template.find_resources("AWS::ApiGatewayV2::Route", {
+        "Properties": {"RouteKey": "GET /orders"}}).keys()
+    # Route settings can only reference route keys that already exist
+    assert route_id in stage["DependsOn"]
+
+
+def test_decoupled_mode_passes_network_ids_through_ssm(tmp_path):
+    with open(os.path.join(REPO_ROOT, "resources", "application.develop.properties")) as f:
+        properties = f.read().replace("decouple_network_stack = False", "decouple_network_stack = True")
+    path = tmp_path / "application.decoupled.properties"
+    path.write_text(properties)
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop", str(path))
+    finally:
+        os.chdir(cwd)
+    network_stack = app.node.find_child("IDMZ-Network-Stack-eu-central-1")
+    api_stack = app.node.find_child("iDMZ-APIGateway-HTTP-API-eu-central-1")
+    network_template = assertions.Template.from_stack(network_stack)
+    api_template = assertions.Template.from_stack(api_stack)
+
+    network_template.resource_count_is("AWS::SSM::Parameter", 9)
+    parameter_names = {parameter["Properties"]["Name"]
+                       for parameter in network_template.find_resources("AWS::SSM::Parameter").values()}
+    ssm_values = {parameter["Default"] for logical_id, parameter in api_template.to_json()["Parameters"].items()
+                  if logical_id.startswith("SsmParameterValue")
+                  and parameter["Type"] == "AWS::SSM::Parameter::Value<String>"}
+    assert ssm_values == parameter_names
+    assert "Fn::ImportValue" not in json.dumps(api_template.to_json())
+    assert network_stack in api_stack.dependencies
+
+
+def test_nlb_access_logs_require_a_tls_listener(tmp_path):
+    with open(os.path.join(REPO_ROOT, "resources", "application.develop.properties")) as f:
+        properties = f.read().replace("nlb_access_logs_enabled = False", "nlb_access_logs_enabled = True")
+    path = tmp_path / "application.nlb-logs.properties"
+    path.write_text(properties)
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        with pytest.raises(ValueError, match="'nlb_access_logs_enabled' is True but 'nlb_tls_certificate_arn'"):
+            build_app("develop", str(path))
+    finally:
+        os.chdir(cwd)
+
+
+def test_every_tag_rule_resolves_in_the_develop_stacks(develop_app):
+    stacks = [child for child in develop_app.node.children if isinstance(child, core.Stack)]
+    for stack_type, rules in StackTags.TAG_RULES.items():
+        typed_stacks = [stack for stack in stacks if type(stack).__name__ == stack_type]
+        assert typed_stacks, stack_type
+        for stack in typed_stacks:
+            assert [construct_id for construct_id in rules if stack.node.try_find_child(construct_id) is None] == []
+
+    # A renamed construct fails the synth instead of silently losing its tags
+    class GlobalAPIGWStack(core.Stack):
+        pass
+
+    stack = GlobalAPIGWStack(core.App(), "Stack")
+    with pytest.raises(ValueError, match="TAG_RULES construct IDs not found in stack 'Stack'.*idmz-nlb"):
+        StackTags.apply(stack, Utility.cdk_custom_configs, {})
+
+
+def _accelerator_profile(tmp_path, endpoint_ids):
+    with open(os.path.join(REPO_ROOT, "resources", "application.develop.properties")) as f:
+        properties = f.read().replace("global_accelerator_enabled = False", "global_accelerator_enabled = True")
+    for endpoint_id in endpoint_ids:
+        properties = properties.replace("global_accelerator_endpoint_id =\n",
+                                        f"global_accelerator_endpoint_id = {endpoint_id}\n", 1)
+    properties = properties.replace("global_accelerator_traffic_dial = 100", "global_accelerator_traffic_dial = 25", 1)
+    path = tmp_path / "application.accelerator.properties"
+    path.write_text(properties)
+    return str(path)
 
-from sw_devhub_idmz_appinfra_code_main_aws.sw_devhub_idmz_appinfra_code_main_aws_stack import SwDevhubIdmzAppinfraCodeMainAwsStack
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in sw_devhub_idmz_appinfra_code_main_aws/sw_devhub_idmz_appinfra_code_main_aws_stack.py
-def test_sqs_queue_created():
-    app = core.App()
-    stack = SwDevhubIdmzAppinfraCodeMainAwsStack(app, "sw-devhub-idmz-appinfra-code-main-aws")
+def test_accelerator_stack_has_an_endpoint_group_per_region(tmp_path):
+    nlb_arn = "arn:aws:elasticloadbalancing:eu-central-1:070490149644:loadbalancer/net/idmz-edge/0123456789abcdef"
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        app, _ = build_app("develop", _accelerator_profile(tmp_path, [nlb_arn, "eipalloc-0123456789abcdef0"]))
+        with pytest.raises(ValueError, match="'global_accelerator_endpoint_id' is not set for region 'us-east-1'"):
+            build_app("develop", _accelerator_profile(tmp_path, [nlb_arn]))
+    finally:
+        os.chdir(cwd)
+    stack = app.node.find_child("iDMZ-GlobalAccelerator")
     template = assertions.Template.from_stack(stack)
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+    assert stack.region == "eu-central-1"
+    # The endpoints are brought by the regions, not created by the regional stacks
+    assert stack.dependencies == []
+    template.has_resource_properties("AWS::GlobalAccelerator::Listener", {
+        "Protocol": "TCP", "PortRanges": [{"FromPort": 443, "ToPort": 443}]})
+    template.resource_count_is("AWS::GlobalAccelerator::EndpointGroup", 2)
+    template.has_resource_properties("AWS::GlobalAccelerator::EndpointGroup", {
+        "EndpointGroupRegion": "eu-central-1",
+        "EndpointConfigurations": [{"EndpointId": nlb_arn}],
+        "TrafficDialPercentage": 25,
+        "HealthCheckProtocol": "TCP",
+        "HealthCheckPort": 443,
+    })
+    template.has_resource_properties("AWS::GlobalAccelerator::EndpointGroup", {
+        "EndpointGroupRegion": "us-east-1", "TrafficDialPercentage": 100})
@@ -0,0 +1,59 @@
+import aws_cdk as core
+import aws_cdk.aws_sns as sns
+import aws_cdk.aws_sqs as sqs
+
+from synth.TemplateBudgetReport import TemplateBudgetReport
+
+
+# Context the CDK CLI passes to the app by default
+CLI_CONTEXT = {'aws:cdk:enable-path-metadata': True, 'aws:cdk:version-reporting': True}
+
+
+def _synth(tmp_path, cdk_settings):
+    app = core.App(outdir=str(tmp_path / "cdk.out"), context=CLI_CONTEXT,
+                   **TemplateBudgetReport.app_options(cdk_settings))
+    stack = core.Stack(app, "BudgetStack")
+    sns.Topic(stack, "Topic")
+    sns.Topic(stack, "OtherTopic")
+    queue = sqs.Queue(stack, "Queue")
+    core.CfnParameter(stack, "Stage", default="dev")
+    core.CfnOutput(stack, "QueueUrl", value=queue.queue_url)
+    return app.synth()
+
+
+def test_reports_counts_per_stack(tmp_path):
+    report, violations = TemplateBudgetReport.build_report(_synth(tmp_path, {}), {})
+
+    measurements = report["BudgetStack"]
+    assert violations == []
+    assert measurements["resources_by_type"]["AWS::SNS::Topic"] == 2
+    assert measurements["resources_by_type"]["AWS::SQS::Queue"] == 1
+    assert measurements["outputs"] == 1
+    # The bootstrap version parameter of the default synthesizer is counted too
+    assert measurements["parameters"] == 2
+    assert measurements["budgets"]["resources"] == TemplateBudgetReport.CLOUDFORMATION_LIMITS["resources"]
+
+
+def test_returns_budget_violations(tmp_path):
+    cloud_assembly = _synth(tmp_path, {})
+
+    report, violations = TemplateBudgetReport.build_report(
+        cloud_assembly, {'template_budget_max_resources': '2', 'template_budget_max_outputs': ''})
+
+    assert violations == [f"BudgetStack: resources {report['BudgetStack']['resources']} exceeds budget 2 "
+                          "('template_budget_max_resources')"]
+
+
+def test_strip_template_metadata_drops_paths_and_version_reporting(tmp_path):
+    default_stack = _synth(tmp_path / "default", {}).get_stack_by_name("BudgetStack")
+    stripped_assembly = _synth(tmp_path / "stripped", {'strip_template_metadata': 'True'})
+    stripped_stack = stripped_assembly.get_stack_by_name("BudgetStack")
+
+    def has_metadata(template):
+        return ("CDKMetadata" in template.get("Resources", {}),
+                any("aws:cdk:path" in resource.get("Metadata", {}) for resource in template["Resources"].values()))
+
+    assert has_metadata(default_stack.template) == (True, True)
+    assert has_metadata(stripped_stack.template) == (False, False)
+    report, _ = TemplateBudgetReport.build_report(stripped_assembly, {'strip_template_metadata': 'True'})
+    assert report["BudgetStack"]["metadata_bytes"] == 0
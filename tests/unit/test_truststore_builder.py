@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from utils.truststore_builder import TruststoreBuilder
+
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _certificate(common_name, issuer=None, days=365):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    issuer_name, issuer_key = (issuer[0].subject, issuer[1]) if issuer else (name, key)
+    certificate = (x509.CertificateBuilder()
+                   .subject_name(name).issuer_name(issuer_name).public_key(key.public_key())
+                   .serial_number(x509.random_serial_number())
+                   .not_valid_before(NOW - datetime.timedelta(days=1))
+                   .not_valid_after(NOW + datetime.timedelta(days=days))
+                   .sign(issuer_key, hashes.SHA256()))
+    return certificate, key
+
+
+def _write(path, *certificates):
+    path.write_bytes(b"".join(c[0].public_bytes(serialization.Encoding.PEM) for c in certificates))
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def chain():
+    root = _certificate("Root CA", days=3650)
+    intermediate = _certificate("Issuing CA", root)
+    return root, intermediate
+
+
+def test_bundle_is_deduplicated_chain_ordered_and_content_addressed(tmp_path, chain):
+    root, intermediate = chain
+    first = _write(tmp_path / "a.pem", root, intermediate)
+    second = _write(tmp_path / "b.pem", intermediate)
+    empty = _write(tmp_path / "empty.pem")
+
+    truststore = TruststoreBuilder.build([first, second, empty], str(tmp_path / "out"), now=NOW)
+
+    assert truststore['certificates'] == ["CN=Issuing CA", "CN=Root CA"]
+    assert truststore['path'].endswith(f"truststore-{truststore['sha256']}.pem")
+    assert any("empty.pem contains no certificate" in w for w in truststore['warnings'])
+
+    reordered = TruststoreBuilder.build([_write(tmp_path / "c.pem", intermediate, root)],
+                                        str(tmp_path / "out"), now=NOW)
+    assert reordered['sha256'] == truststore['sha256']
+
+
+def test_rejects_expired_certificates_and_incomplete_chains(tmp_path, chain):
+    root, intermediate = chain
+    expired = _certificate("Old CA", days=-1)
+
+    with pytest.raises(ValueError) as e:
+        TruststoreBuilder.build([_write(tmp_path / "t.pem", intermediate, expired)], str(tmp_path), now=NOW)
+    assert "CN=Old CA" in str(e.value) and "expired" in str(e.value)
+    assert "issuer CN=Root CA is not in the truststore" in str(e.value)
+
+
+def test_warns_about_certificates_close_to_expiry(tmp_path):
+    soon = _certificate("Short Lived CA", days=10)
+
+    truststore = TruststoreBuilder.build([_write(tmp_path / "t.pem", soon)], str(tmp_path), now=NOW)
+
+    assert truststore['warnings'] == [f"CN=Short Lived CA ({tmp_path / 't.pem'}) expires on 2026-01-11"]
@@ -0,0 +1,214 @@
+"""Offline latency breakdown for exported API Gateway access logs.
+
+Reads the JSON access log format configured in GlobalAPIGWStack._create_apigw_log_group from
+exported log files (plain or gzip NDJSON, CloudWatch Logs S3 exports with a timestamp prefix, or
+subscription filter envelopes) and reports p50/p90/p99 latency per route, client certificate
+subject, source IP and region.
+
+Files are streamed line by line and every group keeps a fixed-size LatencyHistogram, so memory does
+not grow with the number of log records. The number of keys tracked per dimension is capped as well
+(--max-keys, space-saving eviction): high-cardinality dimensions such as the source IP keep their heaviest
+hitters, and the records of evicted keys are folded into an "(other)" group so that no latency is lost.
+
+Usage:
+
+    python -m tools.access_log_analyzer exported/*.gz
+    python -m tools.access_log_analyzer --metric integrationLatency --by route,region --format json logs.ndjson
+"""
+import argparse
+import gzip
+import heapq
+import json
+import sys
+from typing import Dict, Iterable, Iterator, List
+
+from tools.latency_histogram import LatencyHistogram
+
+# Latency fields written by the access log format (milliseconds)
+LATENCY_FIELDS = ['responseLatency', 'integrationLatency', 'authorizerLatency']
+
+# Report dimension -> access log field
+DIMENSIONS = {
+    'route': 'routeKey',
+    'subject': 'clientcert.subjectDN',
+    'ip': 'ip',
+    'region': 'region',
+}
+
+# Default cap of the keys tracked per dimension
+DEFAULT_MAX_KEYS = 1000
+
+# Group of the records of evicted keys
+OTHER_KEY = '(other)'
+
+
+def open_log_file(path: str):
+    """Open a log file for streaming, transparently handling gzip compression."""
+    if path == '-':
+        return sys.stdin
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'rt', encoding='utf-8', errors='replace')
+
+
+def iter_records(lines: Iterable[str]) -> Iterator[dict]:
+    """Yield access log records from raw lines, skipping anything that is not a log record."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith('{'):
+            # CloudWatch Logs S3 exports prefix every message with its ISO timestamp
+            _, _, line = line.partition(' ')
+            if not line.startswith('{'):
+                continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if 'logEvents' in record:
+            # Subscription filter envelope: the access log records are the event messages
+            yield from iter_records(event.get('message', '') for event in record['logEvents'])
+        else:
+            yield record
+
+
+def parse_latency(value):
+    """API Gateway writes '-' (or nothing) when a latency does not apply to a request."""
+    try:
+        latency = float(value)
+    except (TypeError, ValueError):
+        return None
+    return latency if latency >= 0 else None
+
+
+class AccessLogAnalyzer:
+
+    def __init__(self, metric: str = 'responseLatency', dimensions: List[str] = None,
+                 relative_accuracy: float = 0.01, max_keys: int = DEFAULT_MAX_KEYS):
+        if max_keys < 1:
+            raise ValueError(f"max_keys must be at least 1, got {max_keys}")
+        self.metric = metric
+        self.dimensions = dimensions or list(DIMENSIONS)
+        self.relative_accuracy = relative_accuracy
+        self.max_keys = max_keys
+        self.overall = LatencyHistogram(relative_accuracy)
+        self.groups: Dict[str, Dict[str, LatencyHistogram]] = {d: {} for d in self.dimensions}
+        # Space-saving state per dimension: the records a key inherited from the key it evicted
+        # (its count may be overestimated by that much) and a min-heap of (estimated count, key)
+        # with one entry per tracked key, refreshed lazily when it is popped
+        self.overcounts: Dict[str, Dict[str, int]] = {d: {} for d in self.dimensions}
+        self._heaps: Dict[str, list] = {d: [] for d in self.dimensions}
+        self.other: Dict[str, LatencyHistogram] = {d: LatencyHistogram(relative_accuracy) for d in self.dimensions}
+        self.evicted: Dict[str, int] = {d: 0 for d in self.dimensions}
+        self.records = 0
+        self.skipped = 0
+
+    def add(self, record: dict):
+        self.records += 1
+        latency = parse_latency(record.get(self.metric))
+        if latency is None:
+            self.skipped += 1
+            return
+        self.overall.record(latency)
+        for dimension in self.dimensions:
+            key = record.get(DIMENSIONS[dimension]) or '-'
+            histogram = self.groups[dimension].get(key)
+            if histogram is None:
+                histogram = self._track(dimension, key)
+            histogram.record(latency)
+
+    def _track(self, dimension: str, key: str) -> LatencyHistogram:
+        """Start tracking a key, evicting the key with the lowest estimated count when the dimension is full."""
+        groups, overcounts, heap = self.groups[dimension], self.overcounts[dimension], self._heaps[dimension]
+        overcount = 0
+        if len(groups) >= self.max_keys:
+            while True:
+                estimate, victim = heapq.heappop(heap)
+                current = groups[victim].count + overcounts[victim]
+                if current == estimate:
+                    break
+                heapq.heappush(heap, (current, victim))
+            self.other[dimension].merge(groups.pop(victim))
+            overcounts.pop(victim)
+            self.evicted[dimension] += 1
+            # Space-saving: the new key takes over the count of the evicted one as its error bound
+            overcount = estimate
+        histogram = groups[key] = LatencyHistogram(self.relative_accuracy)
+        overcounts[key] = overcount
+        heapq.heappush(heap, (overcount, key))
+        return histogram
+
+    def add_file(self, path: str):
+        f = open_log_file(path)
+        try:
+            for record in iter_records(f):
+                self.add(record)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+    def report(self, top: int = 0) -> dict:
+        result = {
+            'metric': self.metric,
+            'records': self.records,
+            'skipped': self.skipped,
+            'overall': self.overall.summary(),
+        }
+        for dimension, histograms in self.groups.items():
+            ordered = sorted(histograms.items(), key=lambda item: item[1].count, reverse=True)
+            if top:
+                ordered = ordered[:top]
+            result[dimension] = {key: histogram.summary() for key, histogram in ordered}
+            if self.evicted[dimension]:
+                result[dimension][OTHER_KEY] = self.other[dimension].summary()
+        result['evicted'] = {dimension: count for dimension, count in self.evicted.items() if count}
+        return result
+
+
+def format_text(report: dict) -> str:
+    lines = [f"{report['metric']}: {report['records']} records, {report['skipped']} without a value"]
+    rows = [('overall', '*', report['overall'])]
+    for dimension in DIMENSIONS:
+        rows.extend((dimension, key, summary) for key, summary in report.get(dimension, {}).items())
+    lines.append(f"{'dimension':<10} {'key':<60} {'count':>8} {'p50':>10} {'p90':>10} {'p99':>10} {'max':>10}")
+    for dimension, key, summary in rows:
+        if not summary['count']:
+            continue
+        lines.append(f"{dimension:<10} {key[:60]:<60} {summary['count']:>8} {summary['p50']:>10} "
+                     f"{summary['p90']:>10} {summary['p99']:>10} {summary['max']:>10}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='+', help="Exported log files ('-' for stdin)")
+    parser.add_argument('--metric', default='responseLatency', choices=LATENCY_FIELDS)
+    parser.add_argument('--by', default=','.join(DIMENSIONS),
+                        help=f"Comma-separated dimensions to break down by ({', '.join(DIMENSIONS)})")
+    parser.add_argument('--top', type=int, default=20, help="Keys to report per dimension (0 for all)")
+    parser.add_argument('--max-keys', type=int, default=DEFAULT_MAX_KEYS,
+                        help="Keys tracked per dimension; the least frequent ones are folded into (other)")
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    dimensions = [d.strip() for d in args.by.split(',') if d.strip()]
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        parser.error(f"Unknown dimension(s): {', '.join(unknown)}")
+
+    if args.max_keys < 1:
+        parser.error("--max-keys must be at least 1")
+
+    analyzer = AccessLogAnalyzer(args.metric, dimensions, max_keys=args.max_keys)
+    for path in args.files:
+        analyzer.add_file(path)
+
+    report = analyzer.report(args.top)
+    print(json.dumps(report, indent=2) if args.format == 'json' else format_text(report))
+
+
+if __name__ == '__main__':
+    main()
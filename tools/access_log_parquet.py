@@ -0,0 +1,127 @@
+"""Convert exported API Gateway access logs to partitioned Parquet.
+
+Reads the same inputs as tools.access_log_analyzer (plain or gzip NDJSON, CloudWatch Logs S3 exports,
+subscription filter envelopes) and writes the layout of the S3 archive that
+GlobalAPIGWStack._create_access_log_archive delivers through Firehose:
+
+    <output>/region=<region>/date=<yyyy-MM-dd>/hour=<HH>/part-<n>.parquet
+
+with the columns of access_log_schema, so the same queries run on both (e.g. DuckDB, pandas or
+Athena over an upload). Unlike Firehose, which partitions by arrival time, records are partitioned
+by their request time. Rows are buffered per partition and written in files of --rows-per-file rows,
+so memory is bounded by the number of partitions open at a time.
+
+Requires pyarrow (pip install pyarrow).
+
+Usage:
+
+    python -m tools.access_log_parquet --output archive/ exported/*.gz
+    python -m tools.access_log_parquet --output archive/ --region eu-central-1 --rows-per-file 500000 logs.ndjson
+"""
+import argparse
+import os
+import sys
+from typing import Dict, Iterable
+
+from tools.access_log_analyzer import iter_records, open_log_file
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'apigw_vpce_helpers', 'custom_resource',
+                                'access_log_transform'))
+
+import access_log_schema  # noqa: E402
+
+
+def partition_path(partition: tuple) -> str:
+    """Relative Hive-style directory of a (region, date, hour) partition."""
+    return os.path.join(*(f"{key}={value}" for key, value in zip(access_log_schema.PARTITION_KEYS, partition)))
+
+
+def arrow_schema():
+    """pyarrow schema of the access_log_schema columns."""
+    import pyarrow as pa
+    types = {'string': pa.string(), 'int': pa.int32(), 'bigint': pa.int64(), 'timestamp': pa.timestamp('ms')}
+    return pa.schema([(column, types[glue_type]) for column, _, glue_type in access_log_schema.COLUMNS])
+
+
+class ParquetArchiveWriter:
+
+    def __init__(self, output: str, default_region: str = 'unknown', rows_per_file: int = 100000):
+        """
+        @param output: Root directory of the partitioned archive.
+        @param default_region: Region of records without a 'region' field.
+        @param rows_per_file: Rows buffered per partition before a file is written.
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("tools.access_log_parquet requires pyarrow: pip install pyarrow")
+        self.output = output
+        self.default_region = default_region
+        self.rows_per_file = rows_per_file
+        self.schema = arrow_schema()
+        self.rows = 0
+        self.skipped = 0
+        self.files = []
+        self._buffers: Dict[tuple, list] = {}
+        self._file_counts: Dict[tuple, int] = {}
+
+    def add(self, record: dict):
+        row = access_log_schema.normalize(record)
+        partition = access_log_schema.partition(row, record.get('region') or self.default_region)
+        if partition is None:
+            # Without a request time the record cannot be placed in a partition
+            self.skipped += 1
+            return
+        buffer = self._buffers.setdefault(partition, [])
+        buffer.append(row)
+        self.rows += 1
+        if len(buffer) >= self.rows_per_file:
+            self._write(partition)
+
+    def add_all(self, records: Iterable[dict]):
+        for record in records:
+            self.add(record)
+
+    def close(self):
+        for partition in list(self._buffers):
+            self._write(partition)
+
+    def _write(self, partition: tuple):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        rows = self._buffers.pop(partition)
+        directory = os.path.join(self.output, partition_path(partition))
+        os.makedirs(directory, exist_ok=True)
+        # Continue the numbering of files written by an earlier run into the same archive
+        count = self._file_counts.get(partition)
+        if count is None:
+            count = sum(1 for name in os.listdir(directory) if name.endswith('.parquet'))
+        path = os.path.join(directory, f"part-{count:05d}.parquet")
+        self._file_counts[partition] = count + 1
+        pq.write_table(pa.Table.from_pylist(rows, schema=self.schema), path, compression='snappy')
+        self.files.append(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='+', help="Exported log files ('-' for stdin)")
+    parser.add_argument('--output', required=True, help="Root directory of the partitioned archive")
+    parser.add_argument('--region', default='unknown', help="Region of records without a 'region' field")
+    parser.add_argument('--rows-per-file', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    writer = ParquetArchiveWriter(args.output, args.region, args.rows_per_file)
+    for path in args.files:
+        log_file = open_log_file(path)
+        try:
+            writer.add_all(iter_records(log_file))
+        finally:
+            if log_file is not sys.stdin:
+                log_file.close()
+    writer.close()
+    print(f"{writer.rows} records in {len(writer.files)} Parquet files under {args.output}"
+          f" ({writer.skipped} records without request time skipped)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Capacity plan of the ingress path of every region of a profile for an expected load.
+
+Reads the regions, AZs, routes and throttling of a profile plus a load model (JSON, see
+DEFAULT_MODEL) and computes per region, from local data only:
+
+ * authorizer invocations and concurrency: one invocation per identity (source IP + client
+   certificate) per authorizer result cache TTL, times the measured authorizer duration
+ * Lambda account concurrency share of the authorizer in the region
+ * API Gateway throttle headroom of the stage, of the routes with their own limits and of the
+   account-level quota
+ * NLB LCUs (new connections, active connections and processed bytes; TLS dimensions when the
+   listener terminates TLS)
+ * VPC endpoint bandwidth per AZ, with the AZs in use and with one AZ lost (cross-zone load
+   balancing is disabled on the NLB, so every AZ carries its share through its own endpoint ENI)
+ * expected p99 latency against the target
+
+A region is flagged when its configured AZ count or limits cannot sustain the load. The measured
+authorizer duration can be taken from 'python -m tools.access_log_analyzer --metric
+authorizerLatency --by region --format json' (--authorizer-report) instead of the model.
+
+Usage:
+
+    python -m tools.capacity_planner --profile develop --rps 800
+    python -m tools.capacity_planner --profile live --model load_model.json --rps eu-central-1=1500 --format json
+"""
+import argparse
+import json
+import math
+import sys
+
+from apigw_vpce_helpers import authorizer_contract, route_compiler
+from utils.utils import Utility
+
+# Load model; every value can be overridden by the --model file
+DEFAULT_MODEL = {
+    # Target requests per second: a number for every region or {region: rps}, where '*' applies to the
+    # regions without their own value
+    'rps': 100,
+    # Multiplier applied to the target rps for the plan
+    'headroom': 1.3,
+    # Target p99 latency; None uses 'alarm_api_latency_p99_ms' of the profile
+    'p99_latency_ms': None,
+    'request_bytes': 2048,
+    'response_bytes': 8192,
+    'backend_p99_ms': 200,
+    # Measured p99 duration of the authorizer (cache misses only)
+    'authorizer_p99_ms': 100,
+    # Distinct (source IP, client certificate) combinations sending requests within one cache TTL
+    'identities': 50,
+    # Requests per TCP connection from the VPC link to the NLB (1: a new connection per request)
+    'requests_per_connection': 1,
+    # Share of the busiest AZ over an even split (max/mean of tools.nlb_log_analyzer)
+    'az_skew': 1.0,
+    # Share of the traffic of a route key, checked against the limits of that route
+    'route_shares': {},
+    # Time API Gateway adds to every request (TLS, routing, VPC link)
+    'apigw_overhead_ms': 30,
+    # Account quotas per region
+    'lambda_account_concurrency': 1000,
+    'lambda_other_concurrency': 0,
+    'apigw_account_rps': 10000,
+}
+
+# NLB LCU dimensions, per LCU
+# https://aws.amazon.com/elasticloadbalancing/pricing/
+NLB_LCU = {
+    'tcp': {'new_connections': 800, 'active_connections': 100000, 'processed_gb_per_hour': 1},
+    'tls': {'new_connections': 50, 'active_connections': 3000, 'processed_gb_per_hour': 1},
+}
+
+# Sustained bandwidth of an interface VPC endpoint per AZ (bursts up to 100 Gbps)
+# https://docs.aws.amazon.com/vpc/latest/privatelink/vpc-endpoints-quotas.html
+VPCE_GBPS_PER_AZ = 10
+
+# Lambda concurrency share above which the plan warns
+LAMBDA_SHARE_WARNING = 0.5
+
+
+def load_model(path: str = None) -> dict:
+    model = dict(DEFAULT_MODEL)
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(DEFAULT_MODEL))
+        if unknown:
+            raise ValueError(f"Unknown load model key(s): {', '.join(unknown)}")
+        model.update(overrides)
+    return model
+
+
+def authorizer_durations(report: dict) -> dict:
+    """region -> p99 authorizer duration (ms) of an access_log_analyzer JSON report; '*' is overall."""
+    if report.get('metric') != 'authorizerLatency':
+        raise ValueError("The authorizer report must be produced with --metric authorizerLatency")
+    durations = {}
+    if report.get('overall', {}).get('count'):
+        durations['*'] = report['overall']['p99']
+    for region, summary in report.get('region', {}).items():
+        if summary.get('count'):
+            durations[region] = summary['p99']
+    return durations
+
+
+def region_rps(model: dict, region: str) -> float:
+    rps = model['rps']
+    if isinstance(rps, dict):
+        if region not in rps and '*' not in rps:
+            raise ValueError(f"The load model has no rps for region '{region}'")
+        rps = rps.get(region, rps.get('*'))
+    return float(rps)
+
+
+def _check(checks: list, name: str, ok: bool, detail: str, warning: bool = False):
+    checks.append({'check': name, 'status': 'ok' if ok else ('warn' if warning else 'fail'), 'detail': detail})
+
+
+def plan_region(region: str, region_config: dict, model: dict) -> dict:
+    """
+    Capacity plan of one region.
+
+    @param region: Target region.
+    @param region_config: Merged [cdk_settings] and region configuration.
+    @param model: Load model (DEFAULT_MODEL with overrides).
+    @return: dict of computed capacities and the list of checks
+    """
+    target_rps = region_rps(model, region)
+    rps = target_rps * model['headroom']
+    azs = [az.strip() for az in region_config.get('azs', '').split(',') if az.strip()]
+    checks = []
+
+    # Authorizer: API Gateway invokes it once per identity per cache TTL, at most once per request
+    ttl = authorizer_contract.RESULT_CACHE_TTL_SECONDS
+    invocations = min(rps, model['identities'] / ttl) if ttl else rps
+    authorizer_concurrency = math.ceil(invocations * model['authorizer_p99_ms'] / 1000)
+    available = model['lambda_account_concurrency'] - model['lambda_other_concurrency']
+    share = authorizer_concurrency / available if available > 0 else math.inf
+    _check(checks, 'lambda_concurrency', share <= LAMBDA_SHARE_WARNING,
+           f"authorizer needs {authorizer_concurrency} of {available} available concurrent executions "
+           f"({share:.1%})", warning=share <= 1)
+
+    # API Gateway throttling
+    stage_rate = region_config.get('stage_throttling_rate_limit', '').strip()
+    stage_burst = region_config.get('stage_throttling_burst_limit', '').strip()
+    stage_rate = float(stage_rate) if stage_rate else None
+    stage_burst = int(stage_burst) if stage_burst else None
+    if stage_rate is not None:
+        _check(checks, 'stage_throttle', stage_rate >= rps,
+               f"stage rate limit {stage_rate:g} rps for {rps:g} rps"
+               + (f" (headroom {stage_rate / rps:.2f}x)" if rps else ""))
+    if stage_burst is not None:
+        in_flight = rps * (model['apigw_overhead_ms'] + model['backend_p99_ms']) / 1000
+        _check(checks, 'stage_burst', stage_burst >= in_flight,
+               f"stage burst limit {stage_burst} for {in_flight:.0f} requests in flight")
+    _check(checks, 'account_throttle', model['apigw_account_rps'] >= rps,
+           f"account quota {model['apigw_account_rps']} rps for {rps:g} rps")
+
+    routes = route_compiler.compile_routes(
+        json.loads(region_config.get('routes') or '[]'),
+        collapse_threshold=int(region_config.get('routes_collapse_threshold', '0'))).routes
+    route_limits = {route.route_key: route.rate_limit for route in routes}
+    for route_key, route_share in model['route_shares'].items():
+        if route_key not in route_limits:
+            _check(checks, 'route_throttle', False, f"'{route_key}' is not a deployed route of the region",
+                   warning=True)
+        elif route_limits[route_key] is not None:
+            route_rps = rps * route_share
+            _check(checks, 'route_throttle', route_limits[route_key] >= route_rps,
+                   f"'{route_key}' rate limit {route_limits[route_key]:g} rps for {route_rps:g} rps")
+
+    # NLB: the listener terminates TLS when a certificate is configured
+    listener = 'tls' if region_config.get('nlb_tls_certificate_arn', '').strip() else 'tcp'
+    new_connections = rps / model['requests_per_connection']
+    active_connections = rps * model['backend_p99_ms'] / 1000
+    bytes_per_second = rps * (model['request_bytes'] + model['response_bytes'])
+    gb_per_hour = bytes_per_second * 3600 / 1e9
+    lcu = NLB_LCU[listener]
+    lcus = {
+        'new_connections': new_connections / lcu['new_connections'],
+        'active_connections': active_connections / lcu['active_connections'],
+        'processed_bytes': gb_per_hour / lcu['processed_gb_per_hour'],
+    }
+
+    # VPC endpoint bandwidth per AZ, evenly spread times the measured skew
+    gbps = bytes_per_second * 8 / 1e9
+    per_az_gbps = gbps / len(azs) * model['az_skew'] if azs else gbps
+    per_az_one_lost_gbps = gbps / (len(azs) - 1) if len(azs) > 1 else None
+    _check(checks, 'az_count', len(azs) >= 2, f"{len(azs)} AZ(s) configured, at least 2 are needed to survive "
+                                              f"the loss of an AZ")
+    _check(checks, 'vpce_bandwidth', per_az_gbps <= VPCE_GBPS_PER_AZ,
+           f"{per_az_gbps:.3f} Gbps in the busiest AZ, {VPCE_GBPS_PER_AZ} Gbps per endpoint ENI")
+    if per_az_one_lost_gbps is not None:
+        _check(checks, 'vpce_bandwidth_az_lost', per_az_one_lost_gbps <= VPCE_GBPS_PER_AZ,
+               f"{per_az_one_lost_gbps:.3f} Gbps per AZ with one AZ lost")
+
+    # Latency: a cache miss adds the authorizer duration to the request
+    target_p99 = model['p99_latency_ms'] or float(region_config.get('alarm_api_latency_p99_ms', '0') or 0)
+    miss_ratio = invocations / rps if rps else 0
+    expected_p99 = model['apigw_overhead_ms'] + model['backend_p99_ms'] + (
+        model['authorizer_p99_ms'] if miss_ratio > 0.01 else 0)
+    if target_p99:
+        _check(checks, 'latency', expected_p99 <= target_p99,
+               f"expected p99 {expected_p99:g} ms for a target of {target_p99:g} ms "
+               f"(authorizer cache miss ratio {miss_ratio:.2%})")
+
+    return {
+        'target_rps': target_rps,
+        'planned_rps': round(rps, 3),
+        'azs': len(azs),
+        'authorizer': {
+            'cache_ttl_s': ttl,
+            'invocations_per_s': round(invocations, 3),
+            'concurrency': authorizer_concurrency,
+            'account_share': round(share, 4),
+        },
+        'apigw': {
+            'stage_rate_limit': stage_rate,
+            'stage_burst_limit': stage_burst,
+            'stage_headroom': round(stage_rate / rps, 3) if stage_rate and rps else None,
+            'account_headroom': round(model['apigw_account_rps'] / rps, 3) if rps else None,
+        },
+        'nlb': {
+            'listener': listener,
+            'new_connections_per_s': round(new_connections, 3),
+            'active_connections': round(active_connections, 3),
+            'processed_gb_per_hour': round(gb_per_hour, 3),
+            'lcus': round(max(lcus.values()), 3),
+            'lcu_dimension': max(lcus, key=lcus.get),
+        },
+        'vpce': {
+            'gbps': round(gbps, 4),
+            'per_az_gbps': round(per_az_gbps, 4),
+            'per_az_gbps_one_az_lost': round(per_az_one_lost_gbps, 4) if per_az_one_lost_gbps is not None else None,
+        },
+        'expected_p99_ms': expected_p99,
+        'target_p99_ms': target_p99 or None,
+        'checks': checks,
+        'flagged': any(check['status'] == 'fail' for check in checks),
+    }
+
+
+def plan_profile(all_props: dict, model: dict, authorizer_ms: dict = None) -> dict:
+    """
+    Capacity plan of every target region of a profile.
+
+    @param all_props: All sections of the properties file (Utility.load_properties).
+    @param model: Load model.
+    @param authorizer_ms: Optional region ('*' for any) -> measured authorizer p99 duration (ms).
+    @return: region -> plan_region result
+    """
+    cdk_settings = all_props.get('cdk_settings', {})
+    regions = [region.strip() for region in cdk_settings.get('target_regions', '').split(',') if region.strip()]
+    if not regions:
+        raise ValueError("'target_regions' is empty or not defined in [cdk_settings]")
+    plans = {}
+    for region in regions:
+        region_model = model
+        if authorizer_ms:
+            measured = authorizer_ms.get(region, authorizer_ms.get('*'))
+            if measured is not None:
+                region_model = {**model, 'authorizer_p99_ms': measured}
+        plans[region] = plan_region(region, {**cdk_settings, **all_props.get(region, {})}, region_model)
+    return plans
+
+
+def format_text(plans: dict) -> str:
+    lines = []
+    for region, plan in plans.items():
+        lines.append(f"{region}: {plan['target_rps']:g} rps target, planned for {plan['planned_rps']:g} rps over "
+                     f"{plan['azs']} AZ(s){' - FLAGGED' if plan['flagged'] else ''}")
+        lines.append(f"  authorizer   {plan['authorizer']['invocations_per_s']:g} invocations/s, concurrency "
+                     f"{plan['authorizer']['concurrency']} ({plan['authorizer']['account_share']:.1%} of the account)")
+        lines.append(f"  nlb          {plan['nlb']['lcus']:g} LCU ({plan['nlb']['listener']}, bound by "
+                     f"{plan['nlb']['lcu_dimension']})")
+        lines.append(f"  vpce         {plan['vpce']['per_az_gbps']:g} Gbps per AZ, "
+                     f"{plan['vpce']['per_az_gbps_one_az_lost']} Gbps per AZ with one AZ lost")
+        for check in plan['checks']:
+            lines.append(f"  [{check['status']:<4}] {check['check']:<22} {check['detail']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--profile', default='develop')
+    parser.add_argument('--model', help="Load model JSON overriding DEFAULT_MODEL")
+    parser.add_argument('--rps', action='append', default=[], metavar='[REGION=]RPS',
+                        help="Target rps for every region or one region (repeatable, overrides the model)")
+    parser.add_argument('--authorizer-report', help="access_log_analyzer JSON report of authorizerLatency")
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    try:
+        model = load_model(args.model)
+        for entry in args.rps:
+            region, sep, rps = entry.rpartition('=')
+            # A value without region stays the fallback ('*') of the regions without their own value
+            rps_by_region = model['rps'] if isinstance(model['rps'], dict) else {'*': model['rps']}
+            model['rps'] = {**rps_by_region, (region if sep else '*'): float(rps)}
+        authorizer_ms = None
+        if args.authorizer_report:
+            with open(args.authorizer_report) as f:
+                authorizer_ms = authorizer_durations(json.load(f))
+        all_props = Utility.load_properties(f"resources/application.{args.profile}.properties")
+        plans = plan_profile(all_props, model, authorizer_ms)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(plans, indent=2) if args.format == 'json' else format_text(plans))
+    if any(plan['flagged'] for plan in plans.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Critical path of a CloudFormation deployment from saved stack events.
+
+Joins the events of the last stack operation (`aws cloudformation describe-stack-events` output)
+with the dependency graph of the synthesized template (DependsOn, Ref, Fn::GetAtt and Fn::Sub) and
+reports:
+
+- the duration of every resource (first *_IN_PROGRESS to *_COMPLETE / *_FAILED),
+- the critical path: starting from the resource that finished last, the dependency that finished
+  last, recursively; the deploy cannot be faster than this chain,
+- the wait of every resource on the path between its dependencies finishing and its own start,
+- optimization candidates on the path: explicit DependsOn edges without data flow (the resources
+  could be created in parallel if the ordering is not needed) and resource types with a known
+  faster alternative.
+
+Runs offline on saved event dumps, e.g.
+
+    aws cloudformation describe-stack-events --stack-name iDMZ-APIGateway-HTTP-API-eu-central-1 > events.json
+
+Usage:
+
+    python -m tools.deploy_critical_path events.json --template cdk.out/iDMZ-APIGateway-HTTP-API-eu-central-1.template.json
+    python -m tools.deploy_critical_path events.json --template template.json --format json
+"""
+import argparse
+import json
+from datetime import datetime
+from typing import Dict, List
+
+STACK_TYPE = 'AWS::CloudFormation::Stack'
+
+# Resource type -> hint shown when the type is on the critical path
+SLOW_RESOURCE_HINTS = {
+    'AWS::EC2::VPCEndpoint': "interface endpoints take minutes to provision ENIs in every subnet; keep the "
+                             "endpoint in the network stack so that API deploys do not wait for it",
+    'AWS::CloudFormation::CustomResource': "custom resources wait for their provider Lambda (cold start, "
+                                           "API calls); check whether the value is known at synth time",
+    'Custom::AWS': "AwsCustomResource calls an API through a provider Lambda; check whether the value is known "
+                   "at synth time or can be read from an attribute",
+    'Custom::LogRetention': "log_retention creates a log group through a provider Lambda; create an explicit "
+                            "logs.LogGroup for the function instead",
+    'AWS::CertificateManager::Certificate': "DNS validation waits for the validation record to propagate; "
+                                            "import an existing certificate or create it in a separate stack",
+    'AWS::ApiGatewayV2::DomainName': "custom domains with mTLS are provisioned at the edge; keep the domain "
+                                     "stable so updates do not replace it",
+    'AWS::ElasticLoadBalancingV2::LoadBalancer': "load balancer creation takes minutes; avoid changes that "
+                                                 "replace it",
+}
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def load_events(path: str) -> List[dict]:
+    """Events of a describe-stack-events dump ({"StackEvents": [...]} or a plain list), oldest first."""
+    with open(path) as f:
+        document = json.load(f)
+    events = document.get('StackEvents', []) if isinstance(document, dict) else document
+    return sorted(events, key=lambda event: _timestamp(event['Timestamp']))
+
+
+def last_operation(events: List[dict]) -> List[dict]:
+    """Events of the last stack operation: from the last stack-level *_IN_PROGRESS started by a user."""
+    starts = [i for i, event in enumerate(events)
+              if event['ResourceType'] == STACK_TYPE and event['LogicalResourceId'] == event.get('StackName')
+              and event['ResourceStatus'] in ('CREATE_IN_PROGRESS', 'UPDATE_IN_PROGRESS', 'DELETE_IN_PROGRESS')
+              and event.get('ResourceStatusReason', 'User Initiated') == 'User Initiated']
+    return events[starts[-1]:] if starts else events
+
+
+def resource_timings(events: List[dict]) -> Dict[str, dict]:
+    """
+    Start, end and status of every resource touched by the operation, in seconds since its start.
+    Cleanup events (*_CLEANUP_*) after the stack completed are not part of the deploy and are ignored.
+    """
+    if not events:
+        return {}
+    origin = _timestamp(events[0]['Timestamp'])
+    timings = {}
+    for event in events:
+        logical_id, status = event['LogicalResourceId'], event['ResourceStatus']
+        if event['ResourceType'] == STACK_TYPE and logical_id == event.get('StackName'):
+            continue
+        if 'CLEANUP' in status:
+            continue
+        at = _timestamp(event['Timestamp']) - origin
+        timing = timings.get(logical_id)
+        if status.endswith('_IN_PROGRESS'):
+            if timing is None:
+                timings[logical_id] = {'type': event['ResourceType'], 'start': at, 'end': None, 'status': status}
+        elif timing is not None and timing['end'] is None:
+            timing.update(end=at, status=status)
+    for timing in timings.values():
+        # A resource still in progress when the dump was taken ends with the last event
+        if timing['end'] is None:
+            timing['end'] = _timestamp(events[-1]['Timestamp']) - origin
+        timing['duration'] = timing['end'] - timing['start']
+    return timings
+
+
+def _references(value, resources: set, found: dict):
+    if isinstance(value, dict):
+        if 'Ref' in value and value['Ref'] in resources:
+            found[value['Ref']] = 'data'
+        if 'Fn::GetAtt' in value:
+            target = value['Fn::GetAtt']
+            target = target[0] if isinstance(target, list) else str(target).split('.')[0]
+            if target in resources:
+                found[target] = 'data'
+        if 'Fn::Sub' in value:
+            template = value['Fn::Sub'][0] if isinstance(value['Fn::Sub'], list) else value['Fn::Sub']
+            for part in str(template).split('${')[1:]:
+                target = part.split('}')[0].split('.')[0]
+                if target in resources:
+                    found[target] = 'data'
+        for item in value.values():
+            _references(item, resources, found)
+    elif isinstance(value, list):
+        for item in value:
+            _references(item, resources, found)
+
+
+def template_dependencies(template: dict) -> Dict[str, Dict[str, str]]:
+    """logical id -> {dependency: 'data' (Ref, GetAtt, Sub) or 'depends_on' (DependsOn only)}."""
+    resources = template.get('Resources', {})
+    names = set(resources)
+    dependencies = {}
+    for logical_id, resource in resources.items():
+        found = {}
+        depends_on = resource.get('DependsOn', [])
+        for target in [depends_on] if isinstance(depends_on, str) else depends_on:
+            found[target] = 'depends_on'
+        _references({key: value for key, value in resource.items() if key != 'DependsOn'}, names, found)
+        found.pop(logical_id, None)
+        dependencies[logical_id] = found
+    return dependencies
+
+
+def critical_path(timings: Dict[str, dict], dependencies: Dict[str, Dict[str, str]]) -> List[dict]:
+    """Chain of resources from the start of the operation to the resource that finished last."""
+    if not timings:
+        return []
+    current = max(timings, key=lambda logical_id: timings[logical_id]['end'])
+    path = []
+    while current is not None:
+        timing = timings[current]
+        # Dependencies deployed by this operation; unchanged ones were ready before it started
+        deployed = [dependency for dependency in dependencies.get(current, {}) if dependency in timings
+                    and timings[dependency]['end'] <= timing['start'] + 1e-6]
+        predecessor = max(deployed, key=lambda dependency: timings[dependency]['end'], default=None)
+        ready = timings[predecessor]['end'] if predecessor else 0.0
+        path.append({
+            'logical_id': current,
+            'type': timing['type'],
+            'start_s': round(timing['start'], 3),
+            'duration_s': round(timing['duration'], 3),
+            'wait_s': round(timing['start'] - ready, 3),
+            'after': predecessor,
+            'edge': dependencies[current][predecessor] if predecessor else None,
+        })
+        current = predecessor
+    path.reverse()
+    return path
+
+
+def optimization_candidates(path: List[dict], top: int = 10) -> List[dict]:
+    """Candidates on the critical path, largest potential saving first."""
+    candidates = []
+    for step in path:
+        if step['edge'] == 'depends_on':
+            candidates.append({
+                'logical_id': step['logical_id'],
+                'seconds': step['duration_s'],
+                'kind': 'serial_dependency',
+                'message': f"explicit DependsOn {step['after']} without Ref/GetAtt: both could be created in "
+                           f"parallel if the ordering is not required",
+            })
+        hint = SLOW_RESOURCE_HINTS.get(step['type'])
+        if hint is None and step['type'].startswith('Custom::'):
+            hint = SLOW_RESOURCE_HINTS['AWS::CloudFormation::CustomResource']
+        if hint:
+            candidates.append({'logical_id': step['logical_id'], 'seconds': step['duration_s'],
+                               'kind': 'slow_resource', 'message': hint})
+    return sorted(candidates, key=lambda candidate: -candidate['seconds'])[:top]
+
+
+def analyze(events: List[dict], template: dict, top: int = 10) -> dict:
+    operation = last_operation(events)
+    timings = resource_timings(operation)
+    path = critical_path(timings, template_dependencies(template))
+    stack_events = [event for event in operation if event['ResourceType'] == STACK_TYPE
+                    and event['LogicalResourceId'] == event.get('StackName')]
+    return {
+        'stack': stack_events[0]['StackName'] if stack_events else None,
+        'operation': stack_events[-1]['ResourceStatus'] if stack_events else None,
+        'duration_s': round(_timestamp(operation[-1]['Timestamp']) - _timestamp(operation[0]['Timestamp']), 3)
+        if operation else 0.0,
+        'resources': sorted(({'logical_id': logical_id, 'type': timing['type'], 'start_s': round(timing['start'], 3),
+                              'duration_s': round(timing['duration'], 3), 'status': timing['status']}
+                             for logical_id, timing in timings.items()), key=lambda row: -row['duration_s']),
+        'critical_path': path,
+        'critical_path_s': round(path[-1]['start_s'] + path[-1]['duration_s'], 3) if path else 0.0,
+        'candidates': optimization_candidates(path, top),
+    }
+
+
+def format_text(report: dict, top: int = 10) -> str:
+    lines = [f"{report['stack']}  {report['operation']}  {report['duration_s']:.0f} s, "
+             f"critical path {report['critical_path_s']:.0f} s over {len(report['critical_path'])} resources", '',
+             'critical path (start, wait, duration):']
+    for step in report['critical_path']:
+        edge = f"  <- {step['edge']}" if step['edge'] else ''
+        lines.append(f"  {step['start_s']:7.0f} s  +{step['wait_s']:4.0f} s  {step['duration_s']:6.0f} s  "
+                     f"{step['logical_id']} ({step['type']}){edge}")
+    lines += ['', f"slowest resources (top {top}):"]
+    for row in report['resources'][:top]:
+        lines.append(f"  {row['duration_s']:6.0f} s  {row['logical_id']} ({row['type']}) {row['status']}")
+    if report['candidates']:
+        lines += ['', 'optimization candidates:']
+        for candidate in report['candidates']:
+            lines.append(f"  {candidate['seconds']:6.0f} s  {candidate['logical_id']}: {candidate['message']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('events', help="describe-stack-events output (JSON)")
+    parser.add_argument('--template', required=True, help="Synthesized template of the stack (JSON)")
+    parser.add_argument('--top', type=int, default=10, help="Rows in the slowest resources and candidates lists")
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    with open(args.template) as f:
+        template = json.load(f)
+    report = analyze(load_events(args.events), template, args.top)
+    print(json.dumps(report, indent=2) if args.format == 'json' else format_text(report, args.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Concurrent multi-region deploy driver.
+
+Deploys the stacks of every region in `target_regions` with a bounded number of regions in flight.
+Within a region the network stack is always deployed before the API Gateway stack. Regions are
+deployed in waves of `--parallelism` regions; when a stack fails, the regions already in flight are
+allowed to finish (a CloudFormation deployment cannot be safely interrupted) but no further wave is
+started. Output of every stack is streamed with a `[stack id]` prefix and a timing report is written
+at the end.
+
+The app is synthesized once and every deploy uses the same cloud assembly (`cdk deploy --app
+cdk.out --exclusively`), so parallel deploys do not race on re-synthesizing into the same directory.
+
+Usage:
+
+    python -m tools.deploy_orchestrator --profile develop --parallelism 2 --report deploy-report.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from utils.utils import Utility
+
+
+class CdkCliDeployer:
+    """Deploys one stack of a pre-synthesized cloud assembly with the CDK CLI."""
+
+    def __init__(self, app_dir: str = "cdk.out", cdk_command: str = "cdk", extra_args=None):
+        self.app_dir = app_dir
+        self.cdk_command = cdk_command
+        self.extra_args = list(extra_args or [])
+
+    def synth(self, env_profile: str, on_output):
+        return self._run([self.cdk_command, "synth", "--quiet", "--output", self.app_dir],
+                         on_output, {"CDK_ENV_PROFILE": env_profile})
+
+    def deploy(self, stack_id: str, on_output) -> bool:
+        return self._run([self.cdk_command, "deploy", stack_id, "--app", self.app_dir, "--exclusively",
+                          "--require-approval", "never", "--progress", "events", *self.extra_args],
+                         on_output)
+
+    @staticmethod
+    def _run(command, on_output, extra_env=None) -> bool:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                   env={**os.environ, **(extra_env or {})})
+        for line in process.stdout:
+            on_output(line.rstrip("\n"))
+        return process.wait() == 0
+
+
+class DeployOrchestrator:
+
+    def __init__(self, deployer, parallelism: int = 2, output=None):
+        if parallelism < 1:
+            raise ValueError("parallelism must be at least 1")
+        self.deployer = deployer
+        self.parallelism = parallelism
+        self.output = output or sys.stdout
+        self._output_lock = threading.Lock()
+
+    def emit(self, stack_id: str, line: str):
+        with self._output_lock:
+            print(f"[{stack_id}] {line}", file=self.output, flush=True)
+
+    def _deploy_stack(self, region: str, stack_id: str) -> dict:
+        started_at = datetime.now(timezone.utc).isoformat()
+        start = time.monotonic()
+        self.emit(stack_id, "deploy started")
+        try:
+            succeeded = self.deployer.deploy(stack_id, lambda line: self.emit(stack_id, line))
+            error = None
+        except Exception as e:
+            succeeded, error = False, f"{type(e).__name__}: {e}"
+        duration = round(time.monotonic() - start, 3)
+        status = "succeeded" if succeeded else "failed"
+        self.emit(stack_id, f"deploy {status} in {duration}s" + (f" ({error})" if error else ""))
+        return {"stack_id": stack_id, "region": region, "status": status, "started_at": started_at,
+                "duration_seconds": duration, **({"error": error} if error else {})}
+
+    def _deploy_region(self, region: str) -> list:
+        # Network before API: the API stack consumes the network stack's VPC, subnets and security groups
+        results = [self._deploy_stack(region, Utility.network_stack_id(region))]
+        if results[0]["status"] == "succeeded":
+            results.append(self._deploy_stack(region, Utility.api_stack_id(region)))
+        else:
+            results.append({"stack_id": Utility.api_stack_id(region), "region": region, "status": "skipped"})
+        return results
+
+    def run(self, regions: list, global_stack_ids: list = None) -> dict:
+        """
+        @param regions: Regions to deploy, in waves of `parallelism` regions.
+        @param global_stack_ids: Stacks in front of all regions (e.g. the Global Accelerator), deployed
+                                 one after the other once every region succeeded.
+        """
+        waves = [regions[i:i + self.parallelism] for i in range(0, len(regions), self.parallelism)]
+        start = time.monotonic()
+        stacks, wave_reports, failed = [], [], False
+
+        for index, wave in enumerate(waves):
+            if failed:
+                for region in wave:
+                    stacks.extend({"stack_id": stack_id, "region": region, "status": "not_started"}
+                                  for stack_id in (Utility.network_stack_id(region), Utility.api_stack_id(region)))
+                continue
+
+            wave_start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=len(wave), thread_name_prefix="deploy") as executor:
+                wave_results = [result for region_results in executor.map(self._deploy_region, wave)
+                                for result in region_results]
+            stacks.extend(wave_results)
+            failed = any(result["status"] != "succeeded" for result in wave_results)
+            wave_reports.append({"wave": index + 1, "regions": wave,
+                                 "duration_seconds": round(time.monotonic() - wave_start, 3),
+                                 "status": "failed" if failed else "succeeded"})
+
+        for stack_id in global_stack_ids or []:
+            if failed:
+                stacks.append({"stack_id": stack_id, "region": "global", "status": "not_started"})
+                continue
+            result = self._deploy_stack("global", stack_id)
+            stacks.append(result)
+            failed = result["status"] != "succeeded"
+
+        serial_seconds = sum(s.get("duration_seconds", 0) for s in stacks)
+        wall_seconds = round(time.monotonic() - start, 3)
+        return {
+            "status": "failed" if failed else "succeeded",
+            "parallelism": self.parallelism,
+            "wall_seconds": wall_seconds,
+            "serial_seconds": round(serial_seconds, 3),
+            "speedup": round(serial_seconds / wall_seconds, 2) if wall_seconds else None,
+            "waves": wave_reports,
+            "stacks": stacks,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--profile", default=os.getenv("CDK_ENV_PROFILE", "develop"),
+                        help="Environment profile (resources/application.<profile>.properties)")
+    parser.add_argument("--regions", help="Comma-separated subset of target_regions (default: all)")
+    parser.add_argument("--parallelism", type=int, default=2, help="Regions deployed concurrently")
+    parser.add_argument("--app", default="cdk.out", help="Cloud assembly directory")
+    parser.add_argument("--skip-synth", action="store_true", help="Deploy the existing cloud assembly as is")
+    parser.add_argument("--report", help="Write the timing report to this JSON file")
+    parser.add_argument("--include-global-accelerator", action="store_true",
+                        help="Also deploy the experimental Global Accelerator stack (global_accelerator_enabled)")
+    args = parser.parse_args(argv)
+
+    properties_file_path = f"resources/application.{args.profile}.properties"
+    cdk_settings = Utility.load_properties(properties_file_path).get("cdk_settings", {})
+    regions = [r.strip() for r in (args.regions or cdk_settings.get("target_regions", "")).split(",") if r.strip()]
+    if not regions:
+        raise SystemExit(f"No target regions found in {properties_file_path}")
+
+    deployer = CdkCliDeployer(app_dir=args.app)
+    orchestrator = DeployOrchestrator(deployer, args.parallelism)
+    if not args.skip_synth and not deployer.synth(args.profile, lambda line: orchestrator.emit("synth", line)):
+        raise SystemExit("cdk synth failed")
+
+    # The Global Accelerator stack is experimental (its endpoints are brought from outside the app), opt in
+    global_stack_ids = []
+    if args.include_global_accelerator and Utility.get_bool(cdk_settings, "global_accelerator_enabled", False):
+        global_stack_ids.append(Utility.accelerator_stack_id())
+    report = orchestrator.run(regions, global_stack_ids)
+    for stack in report["stacks"]:
+        print(f"{stack['stack_id']:<45} {stack['status']:<12} {stack.get('duration_seconds', '')}")
+    print(f"Wall time {report['wall_seconds']}s, serial time {report['serial_seconds']}s, "
+          f"speedup x{report['speedup']}")
+    if args.report:
+        with open(args.report, "wt") as f:
+            json.dump(report, f, indent=2)
+    if report["status"] != "succeeded":
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
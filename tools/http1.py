@@ -0,0 +1,121 @@
+"""Minimal HTTP/1.1 message framing on asyncio streams, shared by the offline load and ingress tools.
+
+Only what the iDMZ ingress speaks is supported: Content-Length and chunked bodies, keep-alive and
+Connection: close. Header names are returned lower-cased.
+"""
+import asyncio
+from collections import namedtuple
+
+Request = namedtuple('Request', ['method', 'target', 'headers', 'body'])
+Response = namedtuple('Response', ['status', 'reason', 'headers', 'body'])
+
+# Upper bound for a header block, protects the tools against a misbehaving peer
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class ProtocolError(Exception):
+    """The peer sent something that is not a valid HTTP/1.1 message."""
+
+
+class ConnectionClosed(ProtocolError):
+    """The peer closed the connection before sending a response."""
+
+
+async def _read_head(reader: asyncio.StreamReader):
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ProtocolError("connection closed inside the message head")
+    except asyncio.LimitOverrunError:
+        raise ProtocolError("message head too large")
+    if len(head) > MAX_HEADER_BYTES:
+        raise ProtocolError("message head too large")
+    lines = head.decode('latin-1').split('\r\n')[:-2]
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise ProtocolError(f"malformed header line {line!r}")
+        headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readuntil(b'\r\n')
+    except asyncio.LimitOverrunError:
+        raise ProtocolError("chunk line too long")
+
+
+def _parse_length(value, base: int, what: str) -> int:
+    try:
+        length = int(value, base)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise ProtocolError(f"malformed {what} {value!r}")
+    return length
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: dict, until_close: bool) -> bytes:
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size_line = await _read_line(reader)
+            size = _parse_length(size_line.split(b';')[0].strip(), 16, "chunk size")
+            if size == 0:
+                # Trailer section ends with an empty line
+                while await _read_line(reader) != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+    if 'content-length' in headers:
+        return await reader.readexactly(_parse_length(headers['content-length'], 10, "Content-Length"))
+    return await reader.read() if until_close else b''
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Read the next request, or None when the client closed the connection between requests."""
+    head = await _read_head(reader)
+    if head is None:
+        return None
+    request_line, headers = head
+    parts = request_line.split(' ')
+    if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+        raise ProtocolError(f"malformed request line {request_line!r}")
+    body = await _read_body(reader, headers, until_close=False)
+    return Request(parts[0], parts[1], headers, body)
+
+
+async def read_response(reader: asyncio.StreamReader) -> Response:
+    head = await _read_head(reader)
+    if head is None:
+        raise ConnectionClosed("connection closed before the response")
+    status_line, headers = head
+    parts = status_line.split(' ', 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/1.') or not parts[1].isdigit():
+        raise ProtocolError(f"malformed status line {status_line!r}")
+    status = int(parts[1])
+    # These responses never have a body, whatever the headers say
+    body = b'' if status in (204, 304) or status < 200 else await _read_body(reader, headers, until_close=True)
+    return Response(status, parts[2] if len(parts) == 3 else '', headers, body)
+
+
+def _headers(headers: dict, body: bytes) -> str:
+    headers = {**headers, 'content-length': str(len(body))}
+    return ''.join(f"{name}: {value}\r\n" for name, value in headers.items() if name != 'transfer-encoding')
+
+
+def format_request(method: str, target: str, headers: dict, body: bytes = b'') -> bytes:
+    return f"{method} {target} HTTP/1.1\r\n{_headers(headers, body)}\r\n".encode('latin-1') + body
+
+
+def format_response(status: int, reason: str, headers: dict, body: bytes = b'') -> bytes:
+    return f"HTTP/1.1 {status} {reason}\r\n{_headers(headers, body)}\r\n".encode('latin-1') + body
+
+
+def keep_alive(headers: dict) -> bool:
+    return headers.get('connection', '').lower() != 'close'
@@ -0,0 +1,439 @@
+"""Local end-to-end emulator of the iDMZ ingress path.
+
+Emulates, on one machine, what a request goes through between the client and the VPC endpoint service:
+
+    mTLS termination   with the truststore built from mtls_certs_path (TruststoreBuilder, as the stack does)
+    routing            the compiled route table of the profile (route_compiler), then $default
+    Lambda authorizer  the real authorizer module invoked in-process with API Gateway's payload 2.0 event
+                       (authorizer_contract), results cached per identity source values for the cache TTL
+    integration        the request forwarded to a local backend with the x-idmz-* context headers, or the
+                       real idmzhealth handler for GET /idmzhealth
+
+Every hop is timed. The times are returned in a Server-Timing header on each response, and
+GET /__emulator/stats (or Ctrl+C) reports their histograms, so authorizer and routing changes can be
+benchmarked end to end, e.g. with tools.load_generator.
+
+The authorizer runs on the event loop, so its invocations are serialized like those of a single Lambda
+execution environment. The client's address is usually 127.0.0.1, which the allow-lists do not contain;
+use --source-ip to present an allowed address to the authorizer.
+
+Usage:
+
+    python -m tools.ingress_emulator --profile develop --cert server.pem --key server.key \\
+        --backend http://127.0.0.1:9000 --source-ip 35.189.89.201
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import ssl
+import sys
+import tempfile
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from cryptography import x509
+
+from apigw_vpce_helpers import authorizer_contract, route_compiler
+from tools import http1
+from tools.latency_histogram import LatencyHistogram
+from utils.truststore_builder import TruststoreBuilder
+from utils.utils import Utility
+
+CUSTOM_RESOURCE_DIR = os.path.join(os.path.dirname(__file__), '..', 'apigw_vpce_helpers', 'custom_resource')
+METRICS_LAYER_DIR = os.path.join(CUSTOM_RESOURCE_DIR, 'metrics_layer', 'python')
+AUTHORIZER = ('authorizer_lambda', 'api-gateway-lambda-http-authorizer-simple.py', 'lambda_handler')
+HEALTH = ('idmzhealth', 'handler.py', 'lambda_handler')
+
+HEALTH_ROUTE_KEY = 'GET /idmzhealth'
+STATS_PATH = '/__emulator/stats'
+
+# Headers that apply to one connection and are not forwarded
+HOP_BY_HOP_HEADERS = ('connection', 'keep-alive', 'transfer-encoding', 'te', 'upgrade', 'proxy-connection')
+
+HOPS = ['routing', 'authorizer', 'integration', 'total']
+
+
+class LambdaContext:
+    """The attributes of the Lambda context object the handlers may use."""
+
+    def __init__(self, function_name: str, timeout_seconds: float = 300):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+def load_handler(code_dir: str, filename: str, function_name: str, emit_metrics: bool = False):
+    """
+    Import a Lambda handler from its code directory like the Lambda runtime does: the code directory
+    and the metrics layer on sys.path, the environment read at import time.
+
+    @param emit_metrics: Keep the EMF records of the handler on stdout (discarded otherwise).
+    @return: The handler function
+    """
+    code_dir = os.path.join(CUSTOM_RESOURCE_DIR, code_dir)
+    for path in (METRICS_LAYER_DIR, code_dir):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    spec = importlib.util.spec_from_file_location(f"emulated_{os.path.basename(code_dir)}",
+                                                  os.path.join(code_dir, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not emit_metrics and hasattr(module, 'metrics'):
+        module.metrics.stream = open(os.devnull, 'w')
+    return getattr(module, function_name)
+
+
+def client_cert_context(der: bytes) -> dict:
+    """requestContext.authentication.clientCert of API Gateway for a client certificate."""
+    certificate = x509.load_der_x509_certificate(der)
+
+    def dn(name):
+        # In certificate order (e.g. C=...,O=...,CN=...), as API Gateway formats it
+        return ",".join(attribute.rfc4514_string() for attribute in name)
+
+    serial = f"{certificate.serial_number:x}"
+    serial = serial.zfill(len(serial) + len(serial) % 2)
+    return {
+        'clientCertPem': ssl.DER_cert_to_PEM_cert(der),
+        'subjectDN': dn(certificate.subject),
+        'issuerDN': dn(certificate.issuer),
+        'serialNumber': ":".join(serial[i:i + 2] for i in range(0, len(serial), 2)),
+        'validity': {
+            'notBefore': certificate.not_valid_before_utc.strftime('%b %d %H:%M:%S %Y GMT'),
+            'notAfter': certificate.not_valid_after_utc.strftime('%b %d %H:%M:%S %Y GMT'),
+        },
+    }
+
+
+def match_route(routes: list, method: str, path: str):
+    """
+    The route of the route table that API Gateway selects for a request, or None for $default.
+    Literal segments take priority over path variables, path variables over a greedy {proxy+},
+    and a method over ANY.
+    """
+    segments = [segment for segment in path.split('?')[0].split('/') if segment]
+    best, best_rank = None, None
+    for route in routes:
+        if route.method not in (method, 'ANY'):
+            continue
+        route_segments = [segment for segment in route.path.split('/') if segment]
+        greedy = bool(route_segments) and route_segments[-1].endswith('+}')
+        if greedy:
+            if len(segments) < len(route_segments):
+                continue
+            compared = route_segments[:-1]
+        elif len(segments) != len(route_segments):
+            continue
+        else:
+            compared = route_segments
+        literal = 0
+        for route_segment, segment in zip(compared, segments):
+            if route_segment.startswith('{'):
+                continue
+            if route_segment != segment:
+                break
+            literal += 1
+        else:
+            variables = len(compared) - literal
+            rank = (not greedy, literal, -variables, route.method != 'ANY')
+            if best_rank is None or rank > best_rank:
+                best, best_rank = route, rank
+    return best
+
+
+class AuthorizerCache:
+    """Authorizer results by identity source values, expiring after the result cache TTL."""
+
+    def __init__(self, ttl_seconds: float, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple):
+        if self.ttl_seconds > 0:
+            entry = self._results.get(key)
+            if entry and entry[0] > self.clock():
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, result):
+        if self.ttl_seconds > 0:
+            self._results[key] = (self.clock() + self.ttl_seconds, result)
+
+
+class IngressEmulator:
+
+    def __init__(self, ssl_context: ssl.SSLContext, authorizer, routes: list, backend: str,
+                 health_handler=None, cache_ttl: float = authorizer_contract.RESULT_CACHE_TTL_SECONDS,
+                 source_ip: str = None, domain_name: str = 'ingress.localhost', clock=time.monotonic,
+                 backend_ssl_context: ssl.SSLContext = None):
+        """
+        @param ssl_context: Server context requiring client certificates from the truststore.
+        @param authorizer: Authorizer handler (event, context) -> simple response.
+        @param routes: Compiled route table (route_compiler.compile_routes(...).routes).
+        @param backend: http(s)://host:port of the backend the integration forwards to.
+        @param health_handler: Handler of GET /idmzhealth, forwarded to the backend when None.
+        @param cache_ttl: Authorizer result cache TTL in seconds (0 disables the cache).
+        @param source_ip: Source IP presented to the authorizer instead of the client's address.
+        @param clock: Monotonic clock of the authorizer cache, injectable for tests.
+        """
+        backend_url = urlsplit(backend)
+        if backend_url.scheme not in ('http', 'https') or not backend_url.hostname:
+            raise ValueError(f"backend must be http(s)://host:port, got '{backend}'")
+        self.backend_host = backend_url.hostname
+        self.backend_port = backend_url.port or (443 if backend_url.scheme == 'https' else 80)
+        self.backend_ssl = (backend_ssl_context or ssl.create_default_context()) \
+            if backend_url.scheme == 'https' else None
+        self.ssl_context = ssl_context
+        self.authorizer = authorizer
+        self.routes = routes
+        self.health_handler = health_handler
+        self.cache = AuthorizerCache(cache_ttl, clock)
+        self.source_ip = source_ip
+        self.domain_name = domain_name
+        self.hops = {hop: LatencyHistogram() for hop in HOPS}
+        self.statuses = {}
+        self._server = None
+        self._handlers = {}
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        """Start listening; returns the port (an ephemeral one when port is 0)."""
+        self._server = await asyncio.start_server(self._handle, host, port, ssl=self.ssl_context)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop listening, close the open connections and wait for their handlers to finish."""
+        self._server.close()
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def stats(self) -> dict:
+        return {
+            'hops_ms': {hop: histogram.summary() for hop, histogram in self.hops.items()},
+            'authorizer_cache': {'hits': self.cache.hits, 'misses': self.cache.misses},
+            'status': {str(status): count for status, count in sorted(self.statuses.items())},
+        }
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        client_cert = client_cert_context(writer.get_extra_info('ssl_object').getpeercert(binary_form=True))
+        source_ip = self.source_ip or writer.get_extra_info('peername')[0]
+        # One backend connection per client connection, opened on first use and kept alive
+        backend = [None, None]
+        try:
+            while True:
+                request = await http1.read_request(reader)
+                if request is None:
+                    break
+                status, headers, body = await self._serve(request, client_cert, source_ip, backend)
+                keep_alive = http1.keep_alive(request.headers)
+                headers['connection'] = 'keep-alive' if keep_alive else 'close'
+                writer.write(http1.format_response(status, '', headers, body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (http1.ProtocolError, ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            if backend[1]:
+                backend[1].close()
+            del self._handlers[task]
+
+    async def _serve(self, request, client_cert: dict, source_ip: str, backend: list):
+        start = time.perf_counter()
+        timings = {}
+        path, _, query = request.target.partition('?')
+        if path == STATS_PATH:
+            return 200, {'content-type': 'application/json'}, json.dumps(self.stats()).encode()
+
+        # The health check route is added next to the route table, behind the authorizer
+        route = None
+        if f"{request.method} {path}" == HEALTH_ROUTE_KEY:
+            route_key = HEALTH_ROUTE_KEY
+        else:
+            route = match_route(self.routes, request.method, path)
+            route_key = route.route_key if route else '$default'
+        timings['routing'] = time.perf_counter() - start
+
+        context, behind_authorizer = {}, route is None or route.authorization == 'lambda'
+        if behind_authorizer:
+            response = self._authorize(request, path, query, route_key, client_cert, source_ip, timings)
+            if isinstance(response, int):
+                return self._respond(response, {}, b'', start, timings)
+            context = response
+
+        integration_start = time.perf_counter()
+        if route_key == HEALTH_ROUTE_KEY and self.health_handler:
+            status, headers, body = self._invoke_health(request, path, query, source_ip)
+        else:
+            forwarded = {name: value for name, value in request.headers.items() if name not in HOP_BY_HOP_HEADERS}
+            for header, value in authorizer_contract.context_headers(context, behind_authorizer).items():
+                if value is None:
+                    forwarded.pop(header, None)
+                else:
+                    forwarded[header] = value
+            forwarded.update({'x-forwarded-for': source_ip, 'x-forwarded-proto': 'https'})
+            status, headers, body = await self._forward(request, forwarded, backend)
+        timings['integration'] = time.perf_counter() - integration_start
+        return self._respond(status, headers, body, start, timings)
+
+    def _authorize(self, request, path: str, query: str, route_key: str, client_cert: dict, source_ip: str,
+                   timings: dict):
+        """Authorizer context of an authorized request, or the status API Gateway answers with."""
+        identity = authorizer_contract.identity_source_values(source_ip, client_cert)
+        if None in identity:
+            return 401
+        authorizer_start = time.perf_counter()
+        result = self.cache.get(tuple(identity))
+        if result is None:
+            event = authorizer_contract.build_event(
+                request.method, path, query, request.headers, source_ip, client_cert, route_key,
+                api_id='emulator', domain_name=self.domain_name, request_id=str(uuid.uuid4()))
+            try:
+                result = authorizer_contract.simple_response(
+                    self.authorizer(event, LambdaContext('LambdaAuthorizer')))
+            except Exception as e:
+                print(f"Authorizer error: {e}")
+                return 500
+            self.cache.put(tuple(identity), result)
+        timings['authorizer'] = time.perf_counter() - authorizer_start
+        authorized, context = result
+        return context if authorized else 403
+
+    def _invoke_health(self, request, path: str, query: str, source_ip: str):
+        event = {'version': '2.0', 'routeKey': HEALTH_ROUTE_KEY, 'rawPath': path, 'rawQueryString': query,
+                 'headers': request.headers, 'requestContext': {'http': {'method': request.method, 'path': path,
+                                                                        'sourceIp': source_ip}}}
+        response = self.health_handler(event, LambdaContext('IdmzHealthFunction'))
+        body = response.get('body', '')
+        return response.get('statusCode', 200), dict(response.get('headers', {})), \
+            body.encode() if isinstance(body, str) else body
+
+    async def _forward(self, request, headers: dict, backend: list):
+        # A kept-alive backend connection may have been closed meanwhile; retry once on a new one
+        for attempt in range(2):
+            reused = backend[0] is not None
+            try:
+                if not reused:
+                    backend[0], backend[1] = await asyncio.open_connection(
+                        self.backend_host, self.backend_port, ssl=self.backend_ssl)
+                backend[1].write(http1.format_request(request.method, request.target, headers, request.body))
+                await backend[1].drain()
+                response = await http1.read_response(backend[0])
+                if not http1.keep_alive(response.headers):
+                    backend[1].close()
+                    backend[0] = backend[1] = None
+                return response.status, {name: value for name, value in response.headers.items()
+                                         if name not in HOP_BY_HOP_HEADERS}, response.body
+            except (OSError, http1.ProtocolError, asyncio.IncompleteReadError) as e:
+                if backend[1]:
+                    backend[1].close()
+                backend[0] = backend[1] = None
+                if not reused or attempt:
+                    print(f"Backend error: {e}")
+                    return 503, {}, b''
+
+    def _respond(self, status: int, headers: dict, body: bytes, start: float, timings: dict):
+        timings['total'] = time.perf_counter() - start
+        for hop, seconds in timings.items():
+            self.hops[hop].record(seconds * 1000)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status >= 400 and not body:
+            message = {401: 'Unauthorized', 403: 'Forbidden', 500: 'Internal Server Error',
+                       503: 'Service Unavailable'}.get(status, 'Error')
+            headers, body = {'content-type': 'application/json'}, json.dumps({'message': message}).encode()
+        headers['apigw-requestid'] = uuid.uuid4().hex[:16]
+        headers['server-timing'] = ", ".join(f"{hop};dur={seconds * 1000:.3f}" for hop, seconds in timings.items())
+        return status, headers, body
+
+
+def emulator_from_profile(profile: str, region: str, cert: str, key: str, backend: str, certs: str = None,
+                          source_ip: str = None, cache_ttl: float = None, emit_metrics: bool = False,
+                          backend_ssl_context: ssl.SSLContext = None) -> IngressEmulator:
+    """IngressEmulator configured like the stacks of a profile region (truststore, routes, authorizer)."""
+    all_props = Utility.load_properties(f"resources/application.{profile}.properties")
+    cdk_settings = all_props.get('cdk_settings', {})
+    region = region or cdk_settings.get('target_regions', '').split(',')[0].strip()
+    config = {**cdk_settings, **all_props.get(region, {})}
+
+    truststore = TruststoreBuilder.build(TruststoreBuilder.resolve_paths(certs or config['mtls_certs_path']),
+                                         os.path.join(tempfile.gettempdir(), 'idmz-emulator-truststore'))
+    for warning in truststore['warnings']:
+        print(f"WARNING mTLS truststore: {warning}")
+    if not truststore['certificates']:
+        raise ValueError("the mTLS truststore is empty, pass --certs with the CA certificates of the clients")
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_cert_chain(cert, key)
+    context.load_verify_locations(truststore['path'])
+    context.verify_mode = ssl.CERT_REQUIRED
+
+    # The authorizer reads its configuration from the environment at import time, like in Lambda
+    os.environ.update(authorizer_contract.authorizer_environment(config))
+    route_table = route_compiler.compile_routes(json.loads(config.get('routes', '[]')),
+                                                int(config.get('routes_collapse_threshold', '0')))
+    return IngressEmulator(
+        context, load_handler(*AUTHORIZER, emit_metrics=emit_metrics), route_table.routes, backend,
+        health_handler=load_handler(*HEALTH, emit_metrics=emit_metrics),
+        cache_ttl=authorizer_contract.RESULT_CACHE_TTL_SECONDS if cache_ttl is None else cache_ttl,
+        source_ip=source_ip,
+        domain_name=f"{config.get('ingress_name', 'ingress')}.{config.get('idmz_external_zone_name', 'localhost')}",
+        backend_ssl_context=backend_ssl_context)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--profile', default='develop')
+    parser.add_argument('--region', help="Region of the profile (default: first of target_regions)")
+    parser.add_argument('--cert', required=True, help="Server certificate of the custom domain stand-in (PEM)")
+    parser.add_argument('--key', required=True, help="Server private key (PEM)")
+    parser.add_argument('--backend', required=True, help="http(s)://host:port the integration forwards to")
+    parser.add_argument('--backend-insecure', action='store_true', help="Do not verify an https backend")
+    parser.add_argument('--certs', help="Truststore PEM files/directories (default: mtls_certs_path)")
+    parser.add_argument('--source-ip', help="Source IP presented to the authorizer (default: client address)")
+    parser.add_argument('--authorizer-cache-ttl', type=float,
+                        help=f"Seconds (default {authorizer_contract.RESULT_CACHE_TTL_SECONDS}, 0 disables)")
+    parser.add_argument('--lambda-metrics', action='store_true', help="Print the EMF records of the handlers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    args = parser.parse_args(argv)
+
+    backend_ssl_context = None
+    if args.backend_insecure:
+        backend_ssl_context = ssl.create_default_context()
+        backend_ssl_context.check_hostname = False
+        backend_ssl_context.verify_mode = ssl.CERT_NONE
+    try:
+        emulator = emulator_from_profile(args.profile, args.region, args.cert, args.key, args.backend,
+                                         args.certs, args.source_ip, args.authorizer_cache_ttl,
+                                         args.lambda_metrics, backend_ssl_context)
+    except ValueError as e:
+        parser.error(str(e))
+
+    async def serve():
+        port = await emulator.start(args.host, args.port)
+        print(f"Ingress emulator listening on https://{args.host}:{port}, stats at {STATS_PATH}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(json.dumps(emulator.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
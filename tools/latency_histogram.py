@@ -0,0 +1,101 @@
+import math
+
+
+class LatencyHistogram:
+    """Log-bucketed (HDR-style) latency histogram.
+
+    Every recorded value lands in a bucket whose width is a fixed fraction of the value, so the
+    memory used is bounded by the dynamic range of the data (about 1000 buckets between 1 microsecond
+    and 1000 seconds at 1% precision), not by the number of samples. Two histograms with the same
+    precision can be merged by adding their bucket counts, which makes it possible to aggregate
+    per-file or per-worker results without keeping raw samples around.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = {}
+        self._zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def record(self, value: float, count: int = 1):
+        if value < 0:
+            raise ValueError(f"Latency values must not be negative: {value}")
+        if value == 0:
+            self._zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge histograms with a different relative_accuracy")
+        for index, bucket_count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + bucket_count
+        self._zero_count += other._zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Return the value at quantile q (0..1), accurate to within relative_accuracy."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i], clamped to the observed range
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)) -> dict:
+        result = {"count": self.count}
+        if self.count:
+            result["mean"] = round(self.total / self.count, 3)
+            for q in quantiles:
+                result[f"p{q * 100:g}"] = round(self.quantile(q), 3)
+            result["max"] = round(self.max, 3)
+        return result
+
+    def to_dict(self) -> dict:
+        """Serialise the histogram so that partial results can be stored and merged later."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self._zero_count,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "buckets": {str(k): v for k, v in self._buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls(data["relative_accuracy"])
+        histogram._buckets = {int(k): v for k, v in data["buckets"].items()}
+        histogram._zero_count = data["zero_count"]
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        if data["count"]:
+            histogram.min = data["min"]
+            histogram.max = data["max"]
+        return histogram
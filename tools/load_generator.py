@@ -0,0 +1,374 @@
+"""Open-loop mTLS load generator for the iDMZ ingress.
+
+Sends requests with a client certificate to the custom domain (or to tools.tls_stand_in offline) at a
+fixed or Poisson arrival rate. Requests are started on schedule whether or not earlier ones completed
+(open loop), so a slow ingress shows up as latency and errors instead of as a lower request rate, and
+latency is measured from the scheduled start, including the wait for a pooled connection.
+
+Connections are kept alive and reused up to --requests-per-connection times, with at most --connections
+open at once; --requests-per-connection 1 opens a new TLS connection (full handshake) for every request.
+
+The report has latency histograms (overall and per route), TLS handshake times, status counts, an error
+taxonomy and the offered, achieved and sustained request rates:
+
+    tls_handshake  TLS failure, e.g. client certificate rejected by the truststore or untrusted server
+    connect        TCP connection refused or reset
+    timeout        no complete response within --timeout
+    forbidden      403, the authorizer denied the request
+    unauthorized   401
+    throttled      429, stage or route throttling
+    client_error   other 4xx
+    server_error   5xx
+    protocol       malformed or truncated response
+    dropped        not sent because --max-in-flight requests were outstanding
+
+Usage:
+
+    python -m tools.load_generator https://ingress.example.com --cert client.pem --key client.key \\
+        --rate 50 --duration 60 --route "GET /idmzhealth=1" --route "POST /orders=3" --payload-bytes 512
+    python -m tools.load_generator https://127.0.0.1:8443 --server-name localhost --ca ca.pem \\
+        --cert client.pem --key client.key --stages 20:10,100:30 --arrival constant --format json
+"""
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import time
+from typing import List
+from urllib.parse import urlsplit
+
+from tools import http1
+from tools.latency_histogram import LatencyHistogram
+
+ERROR_CLASSES = ['tls_handshake', 'connect', 'timeout', 'forbidden', 'unauthorized', 'throttled',
+                 'client_error', 'server_error', 'protocol', 'dropped']
+
+ARRIVALS = ['poisson', 'constant']
+
+
+def classify_status(status: int):
+    """Error class of an HTTP status, or None for a successful response."""
+    if status < 400:
+        return None
+    return {401: 'unauthorized', 403: 'forbidden', 429: 'throttled'}.get(
+        status, 'client_error' if status < 500 else 'server_error')
+
+
+def parse_routes(entries: List[str]) -> list:
+    """'METHOD /path=weight' entries (weight defaults to 1) -> list of (method, path, weight)."""
+    routes = []
+    for entry in entries:
+        spec, sep, weight = entry.rpartition('=')
+        if not sep or '/' in weight:
+            spec, weight = entry, '1'
+        method, _, path = spec.strip().partition(' ')
+        if not path.startswith('/') or not method.isalpha():
+            raise ValueError(f"route must be 'METHOD /path[=weight]', got '{entry}'")
+        if float(weight) <= 0:
+            raise ValueError(f"route weight must be positive, got '{entry}'")
+        routes.append((method.upper(), path.strip(), float(weight)))
+    return routes
+
+
+def parse_stages(spec: str) -> list:
+    """'rate:seconds,rate:seconds' -> list of (requests per second, duration in seconds)."""
+    stages = []
+    for stage in spec.split(','):
+        rate, sep, duration = stage.partition(':')
+        if not sep or float(rate) <= 0 or float(duration) <= 0:
+            raise ValueError(f"stage must be 'rate:seconds' with positive values, got '{stage}'")
+        stages.append((float(rate), float(duration)))
+    return stages
+
+
+def client_ssl_context(cert: str, key: str, ca: str = None, insecure: bool = False) -> ssl.SSLContext:
+    context = ssl.create_default_context(cafile=ca)
+    context.load_cert_chain(cert, key)
+    if insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class RequestFailed(Exception):
+
+    def __init__(self, error_class: str, detail: str = ''):
+        super().__init__(f"{error_class}: {detail}")
+        self.error_class = error_class
+
+
+class ConnectionPool:
+
+    def __init__(self, host: str, port: int, ssl_context: ssl.SSLContext, server_hostname: str,
+                 max_connections: int, requests_per_connection: int):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname
+        self.requests_per_connection = requests_per_connection
+        self.handshake = LatencyHistogram()
+        self.opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def acquire(self):
+        """A connection with requests left: an idle one if available, otherwise a new one.
+
+        @return: [reader, writer, requests sent] (a list, the caller counts its requests in it), new flag
+        """
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop(), False
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl_context, server_hostname=self.server_hostname)
+        except ssl.SSLError as e:
+            self._slots.release()
+            raise RequestFailed('tls_handshake', str(e))
+        except OSError as e:
+            self._slots.release()
+            raise RequestFailed('connect', str(e))
+        except BaseException:
+            self._slots.release()
+            raise
+        self.handshake.record((time.perf_counter() - start) * 1000)
+        self.opened += 1
+        return [reader, writer, 0], True
+
+    def release(self, connection, reusable: bool):
+        if reusable and connection[2] < self.requests_per_connection:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+        self._slots.release()
+
+    def close(self):
+        for connection in self._idle:
+            connection[1].close()
+        self._idle = []
+
+
+class LoadGenerator:
+
+    def __init__(self, endpoint: str, ssl_context: ssl.SSLContext, routes: list, server_name: str = None,
+                 connections: int = 16, requests_per_connection: int = 100, timeout: float = 10,
+                 max_in_flight: int = 1000, payload_bytes: int = 0, arrival: str = 'poisson', seed: int = None):
+        """
+        @param endpoint: https://host[:port] of the custom domain or the stand-in.
+        @param ssl_context: Client context with the client certificate, see client_ssl_context.
+        @param routes: (method, path, weight) tuples, see parse_routes.
+        @param server_name: SNI and Host header, defaults to the endpoint host.
+        @param connections: Maximum number of open connections.
+        @param requests_per_connection: Requests sent on a connection before it is closed (1 disables reuse).
+        @param timeout: Seconds for a request, including the wait for a connection.
+        @param max_in_flight: Outstanding requests above which scheduled requests are dropped.
+        @param payload_bytes: Body size of POST, PUT and PATCH requests.
+        @param arrival: 'poisson' (exponential inter-arrival times) or 'constant'.
+        @param seed: Seed of the route and arrival randomness, for reproducible runs.
+        """
+        url = urlsplit(endpoint)
+        if url.scheme != 'https' or not url.hostname:
+            raise ValueError(f"endpoint must be https://host[:port], got '{endpoint}'")
+        if arrival not in ARRIVALS:
+            raise ValueError(f"arrival must be one of {', '.join(ARRIVALS)}, got '{arrival}'")
+        self.host = url.hostname
+        self.port = url.port or 443
+        self.server_name = server_name or url.hostname
+        self.ssl_context = ssl_context
+        self.routes = routes
+        self.connections = connections
+        self.requests_per_connection = requests_per_connection
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.payload = b'x' * payload_bytes
+        self.arrival = arrival
+        self.random = random.Random(seed)
+        self._reset()
+
+    def _reset(self):
+        self.latency = LatencyHistogram()
+        self.route_latency = {}
+        self.statuses = {}
+        self.errors = dict.fromkeys(ERROR_CLASSES, 0)
+        self.scheduled = 0
+        self.completed = 0
+        self.succeeded_per_second = {}
+        self.duration = 0.0
+        self.pool = None
+
+    async def run(self, stages: list) -> dict:
+        """Run the load stages ((rate, seconds) tuples) and return the report."""
+        self._reset()
+        self.pool = ConnectionPool(self.host, self.port, self.ssl_context, self.server_name,
+                                   self.connections, self.requests_per_connection)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        in_flight = set()
+        stage_start = start
+        weights = [weight for _, _, weight in self.routes]
+        try:
+            for rate, duration in stages:
+                stage_end, next_at = stage_start + duration, stage_start
+                while True:
+                    next_at += self.random.expovariate(rate) if self.arrival == 'poisson' else 1 / rate
+                    if next_at >= stage_end:
+                        break
+                    delay = next_at - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    self.scheduled += 1
+                    if len(in_flight) >= self.max_in_flight:
+                        self.errors['dropped'] += 1
+                        continue
+                    method, path, _ = self.random.choices(self.routes, weights)[0]
+                    task = asyncio.ensure_future(self._timed_request(method, path, next_at, start))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                stage_start = stage_end
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            self.pool.close()
+        self.duration = stage_start - start
+        return self.report()
+
+    async def _timed_request(self, method: str, path: str, scheduled_at: float, start: float):
+        loop = asyncio.get_running_loop()
+        try:
+            status = await asyncio.wait_for(self._request(method, path), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors['timeout'] += 1
+            return
+        except RequestFailed as e:
+            self.errors[e.error_class] += 1
+            return
+        finished_at = loop.time()
+        self.completed += 1
+        latency_ms = (finished_at - scheduled_at) * 1000
+        self.latency.record(latency_ms)
+        self.route_latency.setdefault(f"{method} {path}", LatencyHistogram()).record(latency_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        error_class = classify_status(status)
+        if error_class:
+            self.errors[error_class] += 1
+        else:
+            second = int(finished_at - start)
+            self.succeeded_per_second[second] = self.succeeded_per_second.get(second, 0) + 1
+
+    async def _request(self, method: str, path: str) -> int:
+        body = self.payload if method in ('POST', 'PUT', 'PATCH') else b''
+        # A kept-alive connection may have been closed by the server meanwhile; retry such a request once
+        # on a new connection, like HTTP clients do
+        for attempt in range(2):
+            connection, new = await self.pool.acquire()
+            reader, writer, sent = connection
+            connection[2] += 1
+            last = connection[2] >= self.requests_per_connection
+            headers = {'host': self.server_name, 'user-agent': 'idmz-load-generator',
+                       'connection': 'close' if last else 'keep-alive'}
+            if body:
+                headers['content-type'] = 'application/octet-stream'
+            reusable = False
+            try:
+                writer.write(http1.format_request(method, path, headers, body))
+                await writer.drain()
+                response = await http1.read_response(reader)
+                reusable = not last and http1.keep_alive(response.headers)
+                return response.status
+            except ssl.SSLError as e:
+                # With TLS 1.3 a rejected client certificate is only reported after the handshake
+                raise RequestFailed('tls_handshake', str(e))
+            except (http1.ProtocolError, asyncio.IncompleteReadError, ConnectionError) as e:
+                if new and sent == 0 and isinstance(e, (http1.ConnectionClosed, ConnectionResetError)) \
+                        and writer.get_extra_info('ssl_object').version() == 'TLSv1.3':
+                    # The TLS 1.3 client handshake completes before the server has checked the client
+                    # certificate; a server that rejects it closes the connection instead of answering
+                    raise RequestFailed('tls_handshake', f"connection closed after the handshake ({e})")
+                if new or attempt:
+                    raise RequestFailed('connect' if isinstance(e, ConnectionError) else 'protocol', str(e))
+            finally:
+                self.pool.release(connection, reusable)
+
+    def report(self) -> dict:
+        succeeded = sum(self.succeeded_per_second.values())
+        full_seconds = int(self.duration)
+        return {
+            'duration_s': round(self.duration, 3),
+            'offered_rps': round(self.scheduled / self.duration, 2) if self.duration else 0.0,
+            'achieved_rps': round(succeeded / self.duration, 2) if self.duration else 0.0,
+            # Lowest number of successful responses in any full second of the run
+            'sustained_rps': min((self.succeeded_per_second.get(s, 0) for s in range(full_seconds)), default=0),
+            'requests': {'scheduled': self.scheduled, 'completed': self.completed, 'succeeded': succeeded},
+            'status': {str(status): count for status, count in sorted(self.statuses.items())},
+            'errors': {name: count for name, count in self.errors.items() if count},
+            'latency_ms': self.latency.summary(),
+            'routes': {route: histogram.summary() for route, histogram in sorted(self.route_latency.items())},
+            'connections': {'opened': self.pool.opened if self.pool else 0,
+                            'handshake_ms': self.pool.handshake.summary() if self.pool else {}},
+        }
+
+
+def format_text(report: dict) -> str:
+    def latency(summary):
+        if not summary.get('count'):
+            return "no responses"
+        return "  ".join(f"{key}={value}" for key, value in summary.items())
+
+    lines = [
+        f"duration {report['duration_s']} s  offered {report['offered_rps']} rps  achieved {report['achieved_rps']} "
+        f"rps  sustained {report['sustained_rps']} rps",
+        "requests " + "  ".join(f"{key}={value}" for key, value in report['requests'].items()),
+        "status   " + ("  ".join(f"{key}={value}" for key, value in report['status'].items()) or "-"),
+        "errors   " + ("  ".join(f"{key}={value}" for key, value in report['errors'].items()) or "-"),
+        f"latency  {latency(report['latency_ms'])}",
+        f"tls      {report['connections']['opened']} connections  handshake "
+        f"{latency(report['connections']['handshake_ms'])}",
+    ]
+    lines.extend(f"  {route:<30} {latency(summary)}" for route, summary in report['routes'].items())
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('endpoint', help="https://host[:port] of the custom domain or stand-in")
+    parser.add_argument('--cert', required=True, help="Client certificate (PEM)")
+    parser.add_argument('--key', required=True, help="Client private key (PEM)")
+    parser.add_argument('--ca', help="CA bundle to verify the server with (default: system trust store)")
+    parser.add_argument('--insecure', action='store_true', help="Do not verify the server certificate")
+    parser.add_argument('--server-name', help="SNI and Host header (default: endpoint host)")
+    parser.add_argument('--route', action='append', default=[], metavar='"METHOD /path=weight"',
+                        help="Route in the mix (repeatable, default 'GET /idmzhealth')")
+    parser.add_argument('--rate', type=float, default=10, help="Requests per second")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds")
+    parser.add_argument('--stages', help="rate:seconds,... instead of --rate/--duration, e.g. 20:10,100:30")
+    parser.add_argument('--arrival', choices=ARRIVALS, default='poisson')
+    parser.add_argument('--connections', type=int, default=16, help="Maximum open connections")
+    parser.add_argument('--requests-per-connection', type=int, default=100,
+                        help="Requests per kept-alive connection (1 opens a connection per request)")
+    parser.add_argument('--timeout', type=float, default=10, help="Seconds per request")
+    parser.add_argument('--max-in-flight', type=int, default=1000)
+    parser.add_argument('--payload-bytes', type=int, default=0, help="Body size of POST/PUT/PATCH requests")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    try:
+        routes = parse_routes(args.route or ['GET /idmzhealth'])
+        stages = parse_stages(args.stages) if args.stages else parse_stages(f"{args.rate}:{args.duration}")
+        generator = LoadGenerator(
+            args.endpoint, client_ssl_context(args.cert, args.key, args.ca, args.insecure), routes,
+            server_name=args.server_name, connections=args.connections,
+            requests_per_connection=args.requests_per_connection, timeout=args.timeout,
+            max_in_flight=args.max_in_flight, payload_bytes=args.payload_bytes, arrival=args.arrival,
+            seed=args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = asyncio.run(generator.run(stages))
+    print(json.dumps(report, indent=2) if args.format == 'json' else format_text(report))
+
+
+if __name__ == '__main__':
+    main()
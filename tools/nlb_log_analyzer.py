@@ -0,0 +1,240 @@
+"""Connection-level latency analysis of NLB access logs.
+
+Streams downloaded NLB access log files (plain or gzip, as delivered to the bucket configured with
+'nlb_access_logs_enabled') and reports TLS handshake time, connection duration and bytes per
+destination IP and per AZ, plus an imbalance report.
+
+The destination of an entry is the NLB node that accepted the connection, in one of the NLB subnets;
+its AZ is found from 'nlb_subnet_cidrs' of the profile (or --subnet). Cross-zone load balancing is
+disabled on the iDMZ NLB, so every node forwards only to the VPC endpoint ENI in its own AZ and the
+per-AZ shares are the shares of the endpoint ENIs.
+https://docs.aws.amazon.com/elasticloadbalancing/latest/network/load-balancer-access-logs.html
+
+Usage:
+
+    python -m tools.nlb_log_analyzer --profile develop --region eu-central-1 logs/*.log.gz
+    python -m tools.nlb_log_analyzer --subnet eu-central-1a=192.168.2.64/27 --format json logs/*.log.gz
+"""
+import argparse
+import ipaddress
+import json
+import sys
+from typing import Dict, Iterable
+
+from tools.access_log_analyzer import open_log_file
+from tools.latency_histogram import LatencyHistogram
+from utils.subnet_planner import SubnetPlanner
+from utils.utils import Utility
+
+# Positions of the fields used here in a (space-separated) NLB access log entry
+FIELD_DESTINATION = 6
+FIELD_CONNECTION_TIME = 7
+FIELD_TLS_HANDSHAKE_TIME = 8
+FIELD_RECEIVED_BYTES = 9
+FIELD_SENT_BYTES = 10
+FIELD_INCOMING_TLS_ALERT = 11
+
+# Connections above this multiple of the mean share of an AZ / destination are reported as imbalanced
+DEFAULT_IMBALANCE_THRESHOLD = 1.25
+
+
+def nlb_subnets_from_profile(profile: str, region: str) -> dict:
+    """nlb subnet CIDR -> AZ of a region of a profile, as planned by SubnetPlanner."""
+    all_props = Utility.load_properties(f"resources/application.{profile}.properties")
+    region_config = {**all_props.get('cdk_settings', {}), **all_props.get(region, {})}
+    azs = [az.strip() for az in region_config.get('azs', '').split(',') if az.strip()]
+    cidrs = SubnetPlanner.plan_region(region_config)['nlb_subnet_cidrs']
+    return dict(zip(cidrs, azs))
+
+
+class _Group:
+
+    def __init__(self, relative_accuracy: float):
+        self.connections = 0
+        self.failed_handshakes = 0
+        self.received_bytes = 0
+        self.sent_bytes = 0
+        self.handshake = LatencyHistogram(relative_accuracy)
+        self.duration = LatencyHistogram(relative_accuracy)
+
+    def add(self, connection_ms, handshake_ms, received, sent, failed):
+        self.connections += 1
+        self.received_bytes += received
+        self.sent_bytes += sent
+        if failed:
+            self.failed_handshakes += 1
+        if handshake_ms is not None:
+            self.handshake.record(handshake_ms)
+        if connection_ms is not None:
+            self.duration.record(connection_ms)
+
+    def report(self) -> dict:
+        return {
+            'connections': self.connections,
+            'failed_handshakes': self.failed_handshakes,
+            'received_bytes': self.received_bytes,
+            'sent_bytes': self.sent_bytes,
+            'tls_handshake_ms': self.handshake.summary(),
+            'connection_ms': self.duration.summary(),
+        }
+
+
+def _number(value: str):
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if number >= 0 else None
+
+
+class NlbLogAnalyzer:
+
+    def __init__(self, subnets: Dict[str, str] = None, relative_accuracy: float = 0.01):
+        """
+        @param subnets: NLB subnet CIDR -> AZ, used to place the destinations in their AZ.
+        """
+        self.subnets = [(ipaddress.ip_network(cidr), az) for cidr, az in (subnets or {}).items()]
+        self.relative_accuracy = relative_accuracy
+        self.overall = _Group(relative_accuracy)
+        self.destinations: Dict[str, _Group] = {}
+        self.azs: Dict[str, _Group] = {}
+        self._destination_azs: Dict[str, str] = {}
+        self.entries = 0
+        self.skipped = 0
+
+    def az_of(self, ip: str) -> str:
+        az = self._destination_azs.get(ip)
+        if az is None:
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                address = None
+            az = next((az for network, az in self.subnets if address in network), '-') if address else '-'
+            self._destination_azs[ip] = az
+        return az
+
+    def add_line(self, line: str):
+        fields = line.split()
+        if len(fields) <= FIELD_INCOMING_TLS_ALERT or fields[0] != 'tls':
+            if line.strip():
+                self.skipped += 1
+            return
+        self.entries += 1
+        destination = fields[FIELD_DESTINATION].rpartition(':')[0]
+        handshake_ms = _number(fields[FIELD_TLS_HANDSHAKE_TIME])
+        values = (
+            _number(fields[FIELD_CONNECTION_TIME]),
+            handshake_ms,
+            int(_number(fields[FIELD_RECEIVED_BYTES]) or 0),
+            int(_number(fields[FIELD_SENT_BYTES]) or 0),
+            # '-' handshake time: the handshake did not complete
+            handshake_ms is None or fields[FIELD_INCOMING_TLS_ALERT] != '-',
+        )
+        self.overall.add(*values)
+        for groups, key in ((self.destinations, destination), (self.azs, self.az_of(destination))):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group(self.relative_accuracy)
+            group.add(*values)
+
+    def add_lines(self, lines: Iterable[str]):
+        for line in lines:
+            self.add_line(line)
+
+    def add_file(self, path: str):
+        f = open_log_file(path)
+        try:
+            self.add_lines(f)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+    @staticmethod
+    def imbalance(groups: Dict[str, _Group], threshold: float) -> dict:
+        """Share of connections and bytes per key; keys above threshold x the mean share are flagged."""
+        connections = sum(group.connections for group in groups.values())
+        total_bytes = sum(group.received_bytes + group.sent_bytes for group in groups.values())
+        if not connections:
+            return {'max_over_mean': None, 'imbalanced': [], 'shares': {}}
+        shares = {key: {'connections': round(group.connections / connections, 4),
+                        'bytes': round((group.received_bytes + group.sent_bytes) / total_bytes, 4)
+                        if total_bytes else 0.0}
+                  for key, group in groups.items()}
+        mean = 1 / len(groups)
+        max_over_mean = max(share['connections'] for share in shares.values()) / mean
+        return {
+            'max_over_mean': round(max_over_mean, 3),
+            'imbalanced': sorted(key for key, share in shares.items() if share['connections'] > threshold * mean),
+            'shares': shares,
+        }
+
+    def report(self, threshold: float = DEFAULT_IMBALANCE_THRESHOLD) -> dict:
+        return {
+            'entries': self.entries,
+            'skipped': self.skipped,
+            'overall': self.overall.report(),
+            'destinations': {ip: {'az': self.az_of(ip), **group.report()}
+                             for ip, group in sorted(self.destinations.items())},
+            'azs': {az: group.report() for az, group in sorted(self.azs.items())},
+            'imbalance': {
+                'threshold': threshold,
+                'azs': self.imbalance(self.azs, threshold),
+                'destinations': self.imbalance(self.destinations, threshold),
+            },
+        }
+
+
+def format_text(report: dict) -> str:
+    lines = [f"{report['entries']} TLS connections, {report['skipped']} other lines skipped",
+             f"{'key':<18} {'az':<16} {'conns':>8} {'failed':>7} {'hs p50':>8} {'hs p99':>8} "
+             f"{'conn p50':>9} {'conn p99':>9} {'MB in':>9} {'MB out':>9}"]
+    rows = [('overall', '*', report['overall'])]
+    rows += [(az, az, group) for az, group in report['azs'].items()]
+    rows += [(ip, group['az'], group) for ip, group in report['destinations'].items()]
+    for key, az, group in rows:
+        lines.append(f"{key[:18]:<18} {az[:16]:<16} {group['connections']:>8} {group['failed_handshakes']:>7} "
+                     f"{group['tls_handshake_ms'].get('p50', '-'):>8} {group['tls_handshake_ms'].get('p99', '-'):>8} "
+                     f"{group['connection_ms'].get('p50', '-'):>9} {group['connection_ms'].get('p99', '-'):>9} "
+                     f"{group['received_bytes'] / 1e6:>9.2f} {group['sent_bytes'] / 1e6:>9.2f}")
+    imbalance = report['imbalance']
+    for dimension in ('azs', 'destinations'):
+        result = imbalance[dimension]
+        if result['max_over_mean'] is None:
+            continue
+        flagged = ', '.join(result['imbalanced']) or 'none'
+        lines.append(f"imbalance {dimension}: max/mean {result['max_over_mean']}, above "
+                     f"{imbalance['threshold']}x the mean share: {flagged}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='+', help="Downloaded NLB access log files ('-' for stdin)")
+    parser.add_argument('--profile', help="Profile whose nlb_subnet_cidrs map destinations to AZs")
+    parser.add_argument('--region', help="Region of the profile (with --profile)")
+    parser.add_argument('--subnet', action='append', default=[], metavar='AZ=CIDR',
+                        help="NLB subnet of an AZ (repeatable, instead of --profile)")
+    parser.add_argument('--imbalance-threshold', type=float, default=DEFAULT_IMBALANCE_THRESHOLD)
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    subnets = {}
+    if args.profile:
+        if not args.region:
+            parser.error("--profile requires --region")
+        subnets.update(nlb_subnets_from_profile(args.profile, args.region))
+    for entry in args.subnet:
+        az, sep, cidr = entry.partition('=')
+        if not sep:
+            parser.error(f"--subnet must be AZ=CIDR, got '{entry}'")
+        subnets[cidr] = az
+
+    analyzer = NlbLogAnalyzer(subnets)
+    for path in args.files:
+        analyzer.add_file(path)
+    report = analyzer.report(args.imbalance_threshold)
+    print(json.dumps(report, indent=2) if args.format == 'json' else format_text(report))
+
+
+if __name__ == '__main__':
+    main()
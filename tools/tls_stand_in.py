@@ -0,0 +1,128 @@
+"""Local mTLS stand-in for the iDMZ custom domain.
+
+Terminates TLS with a server certificate, requires a client certificate signed by the given CA (like the
+mTLS truststore of the custom domain) and answers every request itself. Paths can be mapped to a fixed
+status, e.g. 403 to mimic an authorizer denial, and a delay can be added to mimic the backend. Used to
+develop and test tools.load_generator offline.
+
+Usage:
+
+    python -m tools.tls_stand_in --cert server.pem --key server.key --client-ca ca.pem --port 8443 \\
+        --status /denied=403 --delay-ms 20
+"""
+import argparse
+import asyncio
+import json
+import ssl
+
+from tools import http1
+
+# Response bodies of API Gateway for the statuses the stand-in mimics
+API_GATEWAY_MESSAGES = {401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found', 429: 'Too Many Requests',
+                        500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def server_ssl_context(cert: str, key: str, client_ca: str) -> ssl.SSLContext:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_cert_chain(cert, key)
+    context.load_verify_locations(client_ca)
+    context.verify_mode = ssl.CERT_REQUIRED
+    return context
+
+
+class TlsStandInServer:
+
+    def __init__(self, ssl_context: ssl.SSLContext, statuses: dict = None, delay_ms: float = 0):
+        """
+        @param ssl_context: Server context, see server_ssl_context.
+        @param statuses: Path -> HTTP status returned for it; all other paths return 200.
+        @param delay_ms: Time to wait before answering, mimics the backend.
+        """
+        self.ssl_context = ssl_context
+        self.statuses = statuses or {}
+        self.delay_ms = delay_ms
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+        self._handlers = {}
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> int:
+        """Start listening; returns the port (an ephemeral one when port is 0)."""
+        self._server = await asyncio.start_server(self._handle, host, port, ssl=self.ssl_context)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop listening, close the open connections and wait for their handlers to finish."""
+        self._server.close()
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        subject = dict(item[0] for item in writer.get_extra_info('peercert', {}).get('subject', ()))
+        try:
+            while True:
+                request = await http1.read_request(reader)
+                if request is None:
+                    break
+                self.requests += 1
+                if self.delay_ms:
+                    await asyncio.sleep(self.delay_ms / 1000)
+                status = self.statuses.get(request.target.split('?')[0], 200)
+                if status == 200:
+                    body = {'path': request.target, 'clientCN': subject.get('commonName')}
+                else:
+                    body = {'message': API_GATEWAY_MESSAGES.get(status, 'Error')}
+                keep_alive = http1.keep_alive(request.headers)
+                writer.write(http1.format_response(
+                    status, API_GATEWAY_MESSAGES.get(status, 'OK'),
+                    {'content-type': 'application/json', 'connection': 'keep-alive' if keep_alive else 'close'},
+                    json.dumps(body).encode()))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (http1.ProtocolError, ConnectionError, ssl.SSLError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            del self._handlers[task]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cert', required=True, help="Server certificate (PEM)")
+    parser.add_argument('--key', required=True, help="Server private key (PEM)")
+    parser.add_argument('--client-ca', required=True, help="CA bundle that client certificates must chain to")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--status', action='append', default=[], metavar='PATH=STATUS',
+                        help="Fixed status for a path, e.g. /denied=403 (repeatable)")
+    parser.add_argument('--delay-ms', type=float, default=0)
+    args = parser.parse_args(argv)
+
+    statuses = {}
+    for entry in args.status:
+        path, sep, status = entry.rpartition('=')
+        if not sep or not status.isdigit():
+            parser.error(f"--status must be PATH=STATUS, got '{entry}'")
+        statuses[path] = int(status)
+
+    async def serve():
+        server = TlsStandInServer(server_ssl_context(args.cert, args.key, args.client_ca), statuses, args.delay_ms)
+        port = await server.start(args.host, args.port)
+        print(f"mTLS stand-in listening on https://{args.host}:{port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
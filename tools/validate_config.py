@@ -0,0 +1,75 @@
+"""Fast validation of the properties profiles, without starting the JSII runtime.
+
+Runs the checks of utils.config_validator.ConfigValidator (required keys, region consistency,
+boolean settings, subnet plan, routes) on one or more profiles in milliseconds, instead of the
+seconds a 'cdk synth' needs before reporting the first configuration error. Exits with status 1
+when a profile has errors; used as a pre-commit hook (.pre-commit-config.yaml).
+
+Usage:
+
+    python -m tools.validate_config                 # every resources/application.*.properties
+    python -m tools.validate_config develop live
+    python -m tools.validate_config --file /path/to/application.custom.properties
+"""
+import argparse
+import configparser
+import glob
+import os
+import sys
+import time
+
+from utils.config_validator import ConfigValidator
+from utils.utils import Utility
+
+PROFILE_PATTERN = "resources/application.{profile}.properties"
+# application.sample.properties documents the keys and has no sections
+DOCUMENTATION_PROFILES = ('sample',)
+
+
+def discover_profiles() -> list:
+    paths = []
+    for path in sorted(glob.glob(PROFILE_PATTERN.format(profile='*'))):
+        profile = os.path.basename(path)[len('application.'):-len('.properties')]
+        if profile not in DOCUMENTATION_PROFILES:
+            paths.append(path)
+    return paths
+
+
+def validate_file(path: str) -> list:
+    if not os.path.isfile(path):
+        return [f"Properties file not found: {path}"]
+    try:
+        all_props = Utility.load_properties(path)
+    except configparser.Error as e:
+        return [f"Properties file cannot be parsed: {e}"]
+    return ConfigValidator.validate_profile(all_props)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('profiles', nargs='*', help="Profiles to validate (default: all but the sample)")
+    parser.add_argument('--file', action='append', default=[], help="Properties file to validate (repeatable)")
+    args = parser.parse_args(argv)
+
+    paths = [PROFILE_PATTERN.format(profile=profile) for profile in args.profiles] + args.file
+    if not paths:
+        paths = discover_profiles()
+
+    start = time.perf_counter()
+    failed = 0
+    for path in paths:
+        errors = validate_file(path)
+        if errors:
+            failed += 1
+            print(f"{path}: {len(errors)} error(s)")
+            for error in errors:
+                print(f"  - {error}")
+        else:
+            print(f"{path}: OK")
+    print(f"Validated {len(paths)} profile(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import json
+
+from apigw_vpce_helpers import route_compiler
+from utils.subnet_planner import SubnetPlanner
+from utils.utils import Utility
+
+
+class ConfigValidator:
+    """Validation of a properties profile without building any construct.
+
+    Only pure modules are imported (no aws_cdk, so no JSII node runtime): the checks of
+    CustomSynthesizer.build_synthesizer, the subnet plan of SubnetPlanner (used by
+    IDMZNetworkStack._create_vpc), the route table of route_compiler and the boolean settings of
+    Utility.get_bool. A profile with two regions validates in a few milliseconds.
+    """
+
+    # Keys needed by CustomSynthesizer.build_synthesizer, with their description
+    SYNTHESIZER_KEYS = {
+        'stack_deploy_account': "Deployment account ID",
+        'stack_deploy_region': "Deployment AWS region",
+        'bootstrap_cloudformation_role_arn': "CloudFormation execution role ARN",
+        'bootstrap_deploy_role_arn': "Deployment action role ARN",
+        'bootstrap_file_asset_publishing_role_arn': "File asset publishing role ARN",
+        'bootstrap_lookup_role_arn': "Lookup role ARN",
+        'bootstrap_file_assets_bucket_name': "File assets S3 bucket name",
+    }
+
+    # Keys the stacks read without a default
+    REQUIRED_KEYS = (
+        'workload', 'appenvironment', 'vpc_instance', 'lzenv', 'idmzregion', 'ingress_name',
+        'vpce_service_name', 'vpce_service_tls_fqdn', 'integration_port', 'idmz_external_zone_name',
+        'mtls_certs_path', 'vpc_cidr_block', 'azs', 'az_ids', 'routes',
+    )
+
+    # Boolean settings read with Utility.get_bool -> default (None: required)
+    BOOLEAN_KEYS = {
+        'decouple_network_stack': False,
+        'strip_template_metadata': False,
+        'interface_vpce_policy_allowed': None,
+        'nw_targetgroup_connection_termination': None,
+        'nw_preserve_client_ip': None,
+        'authorizer_cert_pinning': False,
+        'r53_health_check_enabled': False,
+        'apigw_detailed_metrics': True,
+        'access_log_archive_enabled': False,
+        'nlb_access_logs_enabled': False,
+        'eni_reconciler_enabled': False,
+        'global_accelerator_enabled': False,
+    }
+
+    # Required when 'interface_vpce_policy_allowed' is True
+    INTERFACE_VPCE_POLICY_KEYS = (
+        'interface_vpce_policy_effect', 'interface_vpce_policy_action', 'interface_vpce_policy_principal',
+        'interface_vpce_policy_resource',
+    )
+
+    @staticmethod
+    def validate_profile(all_props: dict) -> list:
+        """
+        Validate every target region of a profile.
+
+        @param all_props: All sections of the properties file (Utility.load_properties).
+        @return: list of error messages, empty when the profile is valid
+        """
+        cdk_settings = all_props.get('cdk_settings')
+        if cdk_settings is None:
+            return ["Section [cdk_settings] is missing"]
+        target_regions = [region.strip() for region in cdk_settings.get('target_regions', '').split(',')
+                          if region.strip()]
+        if not target_regions:
+            return ["'target_regions' is empty or not defined in [cdk_settings]"]
+
+        errors = []
+        try:
+            SubnetPlanner.validate_profile(all_props, target_regions)
+        except ValueError as e:
+            errors.append(str(e))
+        for region in target_regions:
+            region_config = {**cdk_settings, **all_props.get(region, {})}
+            errors.extend(f"[{region}] {error}" for error in ConfigValidator.validate_region(region, region_config))
+        return errors
+
+    @staticmethod
+    def validate_region(region: str, region_config: dict) -> list:
+        """
+        Validate the merged configuration of one region (the subnet plan is checked per profile).
+
+        @param region: Target region.
+        @param region_config: Merged [cdk_settings] and region configuration.
+        @return: list of error messages
+        """
+        errors = []
+        missing = [f"'{key}' ({description})" for key, description in ConfigValidator.SYNTHESIZER_KEYS.items()
+                   if not region_config.get(key)]
+        missing += [f"'{key}'" for key in ConfigValidator.REQUIRED_KEYS if not region_config.get(key, '').strip()]
+        if missing:
+            errors.append(f"Missing required configuration values: {', '.join(missing)}")
+
+        # Region consistency: the stacks are deployed to and named after the target region
+        for key in ('stack_deploy_region', 'idmzregion'):
+            value = region_config.get(key)
+            if value and value != region:
+                errors.append(f"'{key}' is '{value}' but must match the target region '{region}'")
+        failover_region = region_config.get('r53_failover_region', '').strip()
+        target_regions = [target.strip() for target in region_config.get('target_regions', '').split(',')]
+        if failover_region and failover_region not in target_regions:
+            errors.append(f"'r53_failover_region' '{failover_region}' is not one of the target_regions")
+        check_type = region_config.get('r53_health_check_type', 'CALCULATED').strip().upper()
+        if check_type not in ('TCP', 'CALCULATED'):
+            errors.append(f"'r53_health_check_type' must be TCP or CALCULATED, got '{check_type}'")
+        azs = [az.strip() for az in region_config.get('azs', '').split(',') if az.strip()]
+        az_ids = [az_id.strip() for az_id in region_config.get('az_ids', '').split(',') if az_id.strip()]
+        foreign_azs = [az for az in azs if not az.startswith(region)]
+        if foreign_azs:
+            errors.append(f"'azs' contains AZs of another region: {', '.join(foreign_azs)}")
+        if len(azs) != len(az_ids):
+            errors.append(f"'azs' has {len(azs)} entries but 'az_ids' has {len(az_ids)}")
+
+        for key, default in ConfigValidator.BOOLEAN_KEYS.items():
+            try:
+                Utility.get_bool(region_config, key, default)
+            except ValueError as e:
+                errors.append(str(e))
+        try:
+            policy_allowed = Utility.get_bool(region_config, 'interface_vpce_policy_allowed', False)
+        except ValueError:
+            policy_allowed = False
+        if policy_allowed:
+            missing = [key for key in ConfigValidator.INTERFACE_VPCE_POLICY_KEYS if not region_config.get(key)]
+            if missing:
+                errors.append(f"'interface_vpce_policy_allowed' is True but {', '.join(missing)} not set")
+
+        try:
+            nlb_access_logs = Utility.get_bool(region_config, 'nlb_access_logs_enabled', False)
+        except ValueError:
+            nlb_access_logs = False
+        if nlb_access_logs and not region_config.get('nlb_tls_certificate_arn', '').strip():
+            errors.append("'nlb_access_logs_enabled' is True but 'nlb_tls_certificate_arn' is not set "
+                          "(NLB only logs TLS listeners)")
+
+        port = region_config.get('integration_port', '').strip()
+        if port and not (port.isdigit() and 1 <= int(port) <= 65535):
+            errors.append(f"'integration_port' must be a port number, got '{port}'")
+
+        if region_config.get('routes', '').strip():
+            try:
+                route_entries = json.loads(region_config['routes'])
+            except ValueError as e:
+                errors.append(f"'routes' is not valid JSON: {e}")
+            else:
+                try:
+                    route_compiler.compile_routes(
+                        route_entries, collapse_threshold=int(region_config.get('routes_collapse_threshold', '0')))
+                except ValueError as e:
+                    errors.append(str(e))
+        return errors
@@ -0,0 +1,88 @@
+import aws_cdk as cdk
+
+
+class StackTags:
+    """
+    Declarative tags of the iDMZ stacks, rendered from the region config and applied in one place.
+
+    TAG_RULES is keyed by the stack class and then by the ID of a top-level construct of that
+    stack; its tags apply to that construct and everything below it. Every ID must resolve in the
+    stack, so that a renamed construct fails the synth instead of silently losing its tags. The
+    global tags apply to the stack and every taggable construct in it (and become CloudFormation
+    stack tags).
+    """
+
+    # Tag templates per top-level construct ID, formatted with the region config ({id} is the construct ID)
+    SG_TAGS = {
+        "Name": "sw-{workload}-{appenvironment}-{id}-{vpc_instance}-{idmzregion}-{lzenv}-aws",
+        "sw:application": "{workload}",
+    }
+    TAG_RULES = {
+        "IDMZNetworkStack": {
+            "idmz-vpc-cfn": {
+                "Name": "sw-{workload}-{appenvironment}-vpc-{vpc_instance}-{idmzregion}-{lzenv}-aws",
+                "sw:application": "{workload}",
+                "swift:flow-log-to-cloudwatch": "enable",
+                "swift:flow-log-to-s3": "enable",
+                "swift:cw-flow-log-traffic-type": "reject",
+            },
+            # Reconstructed L2 VPC: tags the interface endpoint added to it
+            "idmz-vpc": {"Name": "idmz-vpc-{current_target_region}"},
+            "sg-ir": SG_TAGS,
+            "sg-vpce": SG_TAGS,
+            "sg-nlb": SG_TAGS,
+            "idmz-sg-vpcelink": SG_TAGS,
+        },
+        "GlobalAPIGWStack": {
+            "idmz-apicustomdomain": {"sw:application": "{workload}"},
+            "idmz-api-loggroup": {"sw:application": "{workload}"},
+            "idmz-httpapi-vpclink": {"sw:application": "{workload}"},
+            "idmz-nlb": {
+                "Name": "sw-{workload}-{appenvironment}-idmz-sg-nlb-{idmzregion}-{lzenv}-aws",
+                "sw:application": "{workload}",
+            },
+            "IdmzHealthFunction": {"sw:application": "idmz"},
+        },
+    }
+
+    @staticmethod
+    def render(cdk_custom_configs: dict, stack_type: str) -> dict:
+        """
+        Render the tag templates of one stack class for one region.
+
+        @param cdk_custom_configs: Merged [cdk_settings] and region configuration.
+        @param stack_type: Stack class name, e.g. "IDMZNetworkStack" (no rules: empty dict).
+        @return: dict of top-level construct ID -> {tag key: tag value}
+        """
+        return {
+            construct_id: {key: value.format_map({**cdk_custom_configs, 'id': construct_id})
+                           for key, value in tags.items()}
+            for construct_id, tags in StackTags.TAG_RULES.get(stack_type, {}).items()
+        }
+
+    @staticmethod
+    def apply(stack: cdk.Stack, cdk_custom_configs: dict, global_tags: dict) -> None:
+        """
+        Apply the global tags and the rendered TAG_RULES to a stack.
+
+        The tags are added with cdk.Tags, whose aspects run inside the JSII kernel during the single
+        aspect pass of synth. A Python IAspect would be called back from the kernel for every
+        construct of the tree, which measured slower than these few calls per stack.
+
+        @param stack: Stack to tag once all its constructs are created.
+        @param cdk_custom_configs: Merged [cdk_settings] and region configuration of the stack.
+        @param global_tags: Tags for every taggable construct of the stack; empty values are skipped.
+        @raise ValueError: when construct IDs of the TAG_RULES of the stack class are not in the stack
+        """
+        rendered = StackTags.render(cdk_custom_configs, type(stack).__name__)
+        missing = [construct_id for construct_id in rendered if stack.node.try_find_child(construct_id) is None]
+        if missing:
+            raise ValueError(f"StackTags: TAG_RULES construct IDs not found in stack '{stack.node.id}' "
+                             f"({type(stack).__name__}): {', '.join(missing)}")
+
+        for key, value in global_tags.items():
+            if value:
+                cdk.Tags.of(stack).add(key, value)
+        for construct_id, tags in rendered.items():
+            for key, value in tags.items():
+                cdk.Tags.of(stack.node.find_child(construct_id)).add(key, value)
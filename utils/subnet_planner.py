@@ -0,0 +1,184 @@
+import ipaddress
+import time
+
+
+class SubnetPlanner:
+    # Subnet tiers in allocation order: (tier, explicit CIDR list property, prefix length property)
+    TIERS = (
+        ('vpce1', 'vpce1_subnet_cidrs', 'vpce1_cidr_mask'),
+        ('nlb', 'nlb_subnet_cidrs', 'nlb_cidr_mask'),
+        ('vpclink', 'vpclink_subnet_cidrs', 'vpclink_cidr_mask'),
+    )
+
+    # Prefix length of a derived subnet when neither a CIDR list nor a mask is configured for its tier
+    DEFAULT_CIDR_MASK = 28
+
+    # Allowed IPv4 prefix lengths for VPCs and subnets
+    # https://docs.aws.amazon.com/vpc/latest/userguide/subnet-sizing.html
+    MIN_PREFIX_LENGTH = 16
+    MAX_PREFIX_LENGTH = 28
+
+    @staticmethod
+    def plan_region(region_config: dict) -> dict:
+        """
+        Plan the subnet CIDRs of one region.
+
+        A tier with an explicit comma-separated CIDR list ('vpce1_subnet_cidrs', 'nlb_subnet_cidrs',
+        'vpclink_subnet_cidrs') keeps it. Every other tier gets one subnet per AZ of prefix length
+        '<tier>_cidr_mask' (default /28), allocated from the lowest free, aligned block of
+        'vpc_cidr_block' after the explicit subnets. Larger subnets are allocated first so that
+        alignment does not waste address space; within a size, tiers and AZs keep their order.
+
+        @param region_config: Merged [cdk_settings] and region configuration.
+        @return: dict of tier CIDR list property -> list of CIDR strings in AZ order
+        @raise ValueError: when the region configuration cannot be planned
+        """
+        plan, errors = SubnetPlanner._plan_region(region_config)
+        if errors:
+            raise ValueError("Configuration error: " + "; ".join(errors))
+        return plan
+
+    @staticmethod
+    def validate_profile(all_props: dict, target_regions: list) -> dict:
+        """
+        Plan and validate the subnets of every target region of a profile at once, before any
+        construct is created. Besides the per-region checks of plan_region, VPC CIDRs that overlap
+        across regions are reported using a sorted interval index (subnets are inside their VPC, so
+        this also covers subnets of different regions).
+
+        @param all_props: All sections of the properties file.
+        @param target_regions: The target regions of the profile.
+        @return: dict of region -> plan (as returned by plan_region)
+        @raise ValueError: listing every problem found across all regions
+        """
+        start = time.perf_counter()
+        cdk_settings = all_props.get('cdk_settings', {})
+        plans, errors, vpc_intervals = {}, [], []
+
+        for region in target_regions:
+            region_config = {**cdk_settings, **all_props.get(region, {})}
+            plan, region_errors = SubnetPlanner._plan_region(region_config)
+            errors.extend(f"[{region}] {error}" for error in region_errors)
+            if region_errors:
+                continue
+            plans[region] = plan
+            vpc_cidr_block = region_config['vpc_cidr_block'].strip().strip('"')
+            vpc_intervals.append(SubnetPlanner._interval(vpc_cidr_block, region))
+
+        for first, second in SubnetPlanner.find_overlaps(vpc_intervals):
+            errors.append(f"vpc_cidr_block {first[2]} of {first[3]} overlaps {second[2]} of {second[3]}")
+
+        if errors:
+            raise ValueError("Configuration error: subnet plan is invalid:\n  " + "\n  ".join(errors))
+
+        print(f"Subnet plan validated for {len(plans)} region(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return plans
+
+    @staticmethod
+    def find_overlaps(intervals: list) -> list:
+        """
+        Find every pair of overlapping intervals with a sweep over the intervals sorted by start.
+        Runs in O(n log n + k) for n intervals and k overlapping pairs.
+
+        @param intervals: (first address, last address, cidr, label) tuples
+        @return: list of (interval, interval) pairs that overlap
+        """
+        overlaps, active = [], []
+        for interval in sorted(intervals):
+            # Intervals that end before this one starts cannot overlap it or any later interval
+            active = [other for other in active if other[1] >= interval[0]]
+            overlaps.extend((other, interval) for other in active)
+            active.append(interval)
+        return overlaps
+
+    @staticmethod
+    def _interval(cidr: str, label: str) -> tuple:
+        network = ipaddress.ip_network(cidr)
+        return int(network.network_address), int(network.broadcast_address), str(network), label
+
+    @staticmethod
+    def _parse_network(value: str, name: str, errors: list):
+        try:
+            network = ipaddress.IPv4Network(value.strip().strip('"'))
+        except ValueError as e:
+            errors.append(f"'{name}' is not a valid IPv4 network ({e})")
+            return None
+        if not SubnetPlanner.MIN_PREFIX_LENGTH <= network.prefixlen <= SubnetPlanner.MAX_PREFIX_LENGTH:
+            errors.append(f"'{name}' {network} must have a prefix length between "
+                          f"/{SubnetPlanner.MIN_PREFIX_LENGTH} and /{SubnetPlanner.MAX_PREFIX_LENGTH}")
+            return None
+        return network
+
+    @staticmethod
+    def _plan_region(region_config: dict):
+        errors = []
+        az_ids = [az for az in region_config.get('az_ids', '').split(',') if az.strip()]
+        az_names = [az for az in region_config.get('azs', '').split(',') if az.strip()]
+        if not az_ids or len(az_ids) != len(az_names):
+            errors.append("'az_ids' and 'azs' must list the same, non-zero number of AZs")
+        vpc = SubnetPlanner._parse_network(region_config.get('vpc_cidr_block', ''), 'vpc_cidr_block', errors)
+        if errors:
+            return {}, errors
+        num_azs = len(az_ids)
+
+        plan, requests = {}, []
+        for tier, cidr_key, mask_key in SubnetPlanner.TIERS:
+            explicit = region_config.get(cidr_key, '').strip()
+            if explicit:
+                cidrs = [c for c in explicit.split(',') if c.strip()]
+                if len(cidrs) != num_azs:
+                    errors.append(f"'{cidr_key}' has {len(cidrs)} entries for {num_azs} AZs")
+                networks = [SubnetPlanner._parse_network(c, cidr_key, errors) for c in cidrs]
+                for network in filter(None, networks):
+                    if not network.subnet_of(vpc):
+                        errors.append(f"'{cidr_key}' {network} is outside vpc_cidr_block {vpc}")
+                plan[cidr_key] = networks
+                continue
+
+            mask = region_config.get(mask_key) or SubnetPlanner.DEFAULT_CIDR_MASK
+            try:
+                prefix_length = int(mask)
+            except ValueError:
+                errors.append(f"'{mask_key}' must be a prefix length, got '{mask}'")
+                continue
+            if not max(vpc.prefixlen, SubnetPlanner.MIN_PREFIX_LENGTH) <= prefix_length <= SubnetPlanner.MAX_PREFIX_LENGTH:
+                errors.append(f"'{mask_key}' /{prefix_length} does not fit in vpc_cidr_block {vpc}")
+                continue
+            plan[cidr_key] = [None] * num_azs
+            requests.extend((prefix_length, cidr_key, az) for az in range(num_azs))
+        if errors:
+            return {}, errors
+
+        # Allocate the requested subnets around the explicit ones, largest first
+        used = sorted((int(n.network_address), int(n.broadcast_address)) for cidrs in plan.values()
+                      for n in cidrs if n is not None)
+        for prefix_length, cidr_key, az in sorted(requests, key=lambda r: r[0]):
+            network = SubnetPlanner._allocate(vpc, prefix_length, used)
+            if network is None:
+                errors.append(f"vpc_cidr_block {vpc} has no free /{prefix_length} left for {cidr_key}[{az}]")
+                break
+            plan[cidr_key][az] = network
+
+        overlaps = SubnetPlanner.find_overlaps([SubnetPlanner._interval(str(n), f"{key}[{az}]")
+                                                for key, cidrs in plan.items() for az, n in enumerate(cidrs) if n])
+        errors.extend(f"subnet {a[2]} ({a[3]}) overlaps {b[2]} ({b[3]})" for a, b in overlaps)
+        if errors:
+            return {}, errors
+        return {key: [str(n) for n in cidrs] for key, cidrs in plan.items()}, []
+
+    @staticmethod
+    def _allocate(vpc, prefix_length: int, used: list):
+        """First aligned block of the given size in the VPC that does not intersect a used range."""
+        size = 2 ** (32 - prefix_length)
+        candidate, last = int(vpc.network_address), int(vpc.broadcast_address)
+        for used_start, used_end in used + [(last + 1, last + 1)]:
+            if candidate + size - 1 < used_start:
+                break
+            if used_end >= candidate:
+                # Continue at the next aligned address after the used range
+                candidate = (used_end // size + 1) * size
+        if candidate + size - 1 > last:
+            return None
+        used.append((candidate, candidate + size - 1))
+        used.sort()
+        return ipaddress.IPv4Network((candidate, prefix_length))
@@ -0,0 +1,164 @@
+import datetime
+import glob
+import hashlib
+import os
+import re
+
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+
+PEM_CERTIFICATE = re.compile(rb"-----BEGIN CERTIFICATE-----\s+.+?\s+-----END CERTIFICATE-----", re.DOTALL)
+
+
+class TruststoreBuilder:
+    # Warn about certificates that expire within this many days when 'mtls_truststore_expiry_warning_days' is not set
+    DEFAULT_EXPIRY_WARNING_DAYS = 30
+
+    # Built truststores by (PEM files, output directory); all regions of an app share the same bundle
+    _built = {}
+
+    @staticmethod
+    def resolve_paths(mtls_certs_path: str) -> list:
+        """
+        Resolve 'mtls_certs_path': a comma-separated list of PEM files and/or directories, relative to the
+        repository root. A directory stands for all *.pem files in it.
+
+        @param mtls_certs_path: Value of 'mtls_certs_path'.
+        @return: Sorted list of PEM file paths
+        @raise ValueError: when a path does not exist
+        """
+        paths = set()
+        for entry in (p.strip().strip('"') for p in mtls_certs_path.split(',')):
+            if not entry:
+                continue
+            if os.path.isdir(entry):
+                paths.update(glob.glob(os.path.join(entry, "*.pem")))
+            elif os.path.isfile(entry):
+                paths.add(entry)
+            else:
+                raise ValueError(f"Configuration error: 'mtls_certs_path' entry '{entry}' does not exist")
+        if not paths:
+            raise ValueError("Configuration error: 'mtls_certs_path' does not name any PEM file")
+        return sorted(paths)
+
+    @staticmethod
+    def build(pem_paths: list, output_dir: str, expiry_warning_days: int = DEFAULT_EXPIRY_WARNING_DAYS,
+              now: datetime.datetime = None) -> dict:
+        """
+        Merge PEM files into one API Gateway mTLS truststore.
+
+        Every certificate is parsed once. Duplicates (same DER encoding) are dropped, and the bundle is written
+        in a canonical order: each chain from the deepest certificate up to its root, chains ordered by
+        fingerprint. Reordering or repeating the input files therefore does not change the bundle. The file is
+        named after the SHA-256 of its content, so an unchanged truststore keeps its asset hash and S3 key and
+        is not uploaded again.
+
+        @param pem_paths: PEM files to merge (see resolve_paths).
+        @param output_dir: Directory for the bundle.
+        @param expiry_warning_days: Certificates expiring within this many days are reported as warnings.
+        @param now: Reference time for the expiry checks (defaults to the current time).
+        @return: dict with 'path', 'sha256', 'certificates' (subjects in bundle order) and 'warnings'
+        @raise ValueError: for unparsable or expired certificates and certificates whose issuer is missing
+        """
+        key = (tuple((os.path.abspath(p), os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in pem_paths),
+               os.path.abspath(output_dir))
+        if key in TruststoreBuilder._built:
+            return TruststoreBuilder._built[key]
+
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        certificates, errors, warnings = {}, [], []
+
+        for path in pem_paths:
+            with open(path, "rb") as f:
+                blocks = PEM_CERTIFICATE.findall(f.read())
+            if not blocks:
+                warnings.append(f"{path} contains no certificate and is skipped")
+            for index, block in enumerate(blocks):
+                try:
+                    certificate = x509.load_pem_x509_certificate(block)
+                except ValueError as e:
+                    errors.append(f"{path} certificate #{index + 1} cannot be parsed ({e})")
+                    continue
+                der = certificate.public_bytes(serialization.Encoding.DER)
+                certificates.setdefault(hashlib.sha256(der).hexdigest(), (certificate, path))
+
+        by_subject = {}
+        for fingerprint, (certificate, _) in certificates.items():
+            by_subject.setdefault(certificate.subject.public_bytes(), []).append(fingerprint)
+
+        for fingerprint, (certificate, path) in certificates.items():
+            subject = certificate.subject.rfc4514_string()
+            if certificate.not_valid_after_utc < now:
+                errors.append(f"{subject} ({path}) expired on {certificate.not_valid_after_utc:%Y-%m-%d}")
+            elif certificate.not_valid_after_utc < now + datetime.timedelta(days=expiry_warning_days):
+                warnings.append(f"{subject} ({path}) expires on {certificate.not_valid_after_utc:%Y-%m-%d}")
+            if certificate.not_valid_before_utc > now:
+                warnings.append(f"{subject} ({path}) is not valid before {certificate.not_valid_before_utc:%Y-%m-%d}")
+            if certificate.issuer != certificate.subject and certificate.issuer.public_bytes() not in by_subject:
+                errors.append(f"{subject} ({path}): issuer {certificate.issuer.rfc4514_string()} is not in the "
+                              "truststore, API Gateway needs the complete chain up to the root CA")
+        if errors:
+            raise ValueError("Configuration error: invalid mTLS truststore:\n  " + "\n  ".join(errors))
+
+        ordered = TruststoreBuilder._chain_order(certificates, by_subject)
+        bundle = b"".join(certificates[fingerprint][0].public_bytes(serialization.Encoding.PEM)
+                          for fingerprint in ordered)
+        sha256 = hashlib.sha256(bundle).hexdigest()
+        if not bundle:
+            warnings.append("the truststore is empty, API Gateway rejects a custom domain without CA certificates")
+
+        os.makedirs(output_dir, exist_ok=True)
+        bundle_path = os.path.join(output_dir, f"truststore-{sha256}.pem")
+        if not os.path.exists(bundle_path):
+            with open(bundle_path, "wb") as f:
+                f.write(bundle)
+
+        result = {
+            'path': bundle_path,
+            'sha256': sha256,
+            'certificates': [certificates[fingerprint][0].subject.rfc4514_string() for fingerprint in ordered],
+            'warnings': warnings,
+        }
+        TruststoreBuilder._built[key] = result
+        return result
+
+    @staticmethod
+    def fingerprints(pem_paths: list) -> list:
+        """
+        SHA-256 fingerprints (hex of the DER encoding) of all certificates in the PEM files, as used by the
+        authorizer's certificate pinning.
+
+        @param pem_paths: PEM files (see resolve_paths).
+        @return: Sorted, deduplicated list of fingerprints
+        @raise ValueError: when the fingerprints exceed the 4 KB Lambda environment
+        """
+        fingerprints = set()
+        for path in pem_paths:
+            with open(path, "rb") as f:
+                for block in PEM_CERTIFICATE.findall(f.read()):
+                    der = x509.load_pem_x509_certificate(block).public_bytes(serialization.Encoding.DER)
+                    fingerprints.add(hashlib.sha256(der).hexdigest())
+        if len(fingerprints) * 65 > 4000:
+            raise ValueError(f"Configuration error: {len(fingerprints)} pinned certificates do not fit in the "
+                             "4 KB Lambda environment")
+        return sorted(fingerprints)
+
+    @staticmethod
+    def _chain_order(certificates: dict, by_subject: dict) -> list:
+        """Fingerprints ordered leaf/intermediate first and root last within each chain."""
+        def depth(fingerprint, seen=()):
+            # Number of issuers above the certificate; guards against issuer loops (cross-signing)
+            certificate = certificates[fingerprint][0]
+            if certificate.issuer == certificate.subject or fingerprint in seen:
+                return 0
+            issuers = by_subject.get(certificate.issuer.public_bytes(), [])
+            return 1 + max((depth(issuer, seen + (fingerprint,)) for issuer in issuers), default=-1)
+
+        def root_of(fingerprint, seen=()):
+            certificate = certificates[fingerprint][0]
+            issuers = sorted(by_subject.get(certificate.issuer.public_bytes(), []))
+            if certificate.issuer == certificate.subject or not issuers or fingerprint in seen:
+                return fingerprint
+            return root_of(issuers[0], seen + (fingerprint,))
+
+        return sorted(certificates, key=lambda fingerprint: (root_of(fingerprint), -depth(fingerprint), fingerprint))
@@ -19,6 +19,66 @@ class Utility:
             resource_name + "-" + \
             Utility.cdk_custom_configs.get("lzenv", "default_lzenv") + "-aws"
 
+    @staticmethod
+    def network_stack_id(region: str) -> str:
+        """
+        @param region: Target region
+
+        @return: ID of the iDMZ network stack for the region
+        """
+        return f"IDMZ-Network-Stack-{region}"
+
+    @staticmethod
+    def api_stack_id(region: str) -> str:
+        """
+        @param region: Target region
+
+        @return: ID of the API Gateway stack for the region
+        """
+        return f"iDMZ-APIGateway-HTTP-API-{region}"
+
+    @staticmethod
+    def accelerator_stack_id() -> str:
+        """
+        @return: ID of the (single, optional) Global Accelerator stack in front of all regions
+        """
+        return "iDMZ-GlobalAccelerator"
+
+    @staticmethod
+    def network_ssm_parameter_name(name: str) -> str:
+        """
+        Name of the SSM parameter through which the network stack publishes one of its IDs when
+        'decouple_network_stack' is enabled. SSM parameters are regional, so the region is implicit.
+
+        @param name: Short name of the value, e.g. "vpc-id"
+
+        @return: Fully qualified SSM parameter name
+        """
+        return "/sw/" + Utility.cdk_custom_configs.get("workload", "default_workload") + "/" + \
+            Utility.cdk_custom_configs.get("vpc_instance", "default_vpc_instance") + "/network/" + name
+
+    @staticmethod
+    def get_bool(configs: dict, key: str, default: bool = None) -> bool:
+        """
+        Read a boolean setting. Only True and False (in any case) are accepted; the properties used to
+        be parsed with eval, which runs whatever the value contains.
+
+        @param configs: Configuration dict, e.g. Utility.cdk_custom_configs or [cdk_settings].
+        @param key: Name of the setting.
+        @param default: Value of a missing or empty setting; None makes the setting required.
+
+        @return: The boolean value
+        @raise ValueError: when the setting is missing and required, or not a boolean
+        """
+        value = str(configs.get(key, '')).strip().strip('"\'')
+        if not value:
+            if default is None:
+                raise ValueError(f"Configuration error: '{key}' is required (True or False).")
+            return default
+        if value.lower() not in ('true', 'false'):
+            raise ValueError(f"Configuration error: '{key}' must be True or False, got '{value}'.")
+        return value.lower() == 'true'
+
     @staticmethod
     def load_properties(filepath): # Removed sep and comment_char as configparser handles them
         """